@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ctoken() + manual summing vs. accumulate(response, sink).
+
+Reports time per call and the transient memory allocated per call (the
+tracemalloc peak above the steady state while a single call runs).
+
+Usage:
+    python benchmarks/bench_accumulate.py
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ctoken.ledger import CostLedger, accumulate  # noqa: E402
+from ctoken.token_estimator import ctoken  # noqa: E402
+
+
+class _Struct:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def make_response():
+    usage = _Struct(
+        prompt_tokens=1_234,
+        completion_tokens=567,
+        prompt_tokens_details=_Struct(cached_tokens=256),
+    )
+    return _Struct(model="gpt-4o-mini-2024-07-18", usage=usage)
+
+
+def transient_bytes(fn, calls=1_000):
+    """Average tracemalloc peak above the steady state for one call."""
+    if not hasattr(tracemalloc, "reset_peak"):  # Python 3.8
+        return float("nan")
+    fn()  # Warm caches
+    tracemalloc.start()
+    total = 0
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        fn()
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total / calls
+
+
+def main():
+    response = make_response()
+    ledger = CostLedger()
+    running = {"total_cost": 0.0}
+
+    def via_ctoken():
+        running["total_cost"] += ctoken(response)["total_cost"]
+
+    def via_accumulate():
+        accumulate(response, ledger)
+
+    print(f"{'path':<12} {'ns/call':>10} {'transient B/call':>18}")
+    for name, fn in (("ctoken", via_ctoken), ("accumulate", via_accumulate)):
+        number = 50_000
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(
+            f"{name:<12} {seconds / number * 1e9:>10.0f} {transient_bytes(fn):>18.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
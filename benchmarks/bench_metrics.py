@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark: metering overhead of CostMetrics per request.
+
+Usage:
+    python benchmarks/bench_metrics.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ctoken.metrics import CostMetrics  # noqa: E402
+
+
+class _Struct:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def main():
+    usage = _Struct(
+        prompt_tokens=1_234,
+        completion_tokens=567,
+        prompt_tokens_details=_Struct(cached_tokens=256),
+    )
+    response = _Struct(model="gpt-4o-mini-2024-07-18", usage=usage)
+    metrics = CostMetrics()
+    number = 200_000
+
+    print(f"{'operation':<36} {'ns/call':>10}")
+    for name, fn in (
+        ("observe_response(response)", lambda: metrics.observe_response(response)),
+        (
+            "observe_response(response, latency)",
+            lambda: metrics.observe_response(response, latency=0.42),
+        ),
+        ("observe(model, tokens...)", lambda: metrics.observe("gpt-4o", 1_000, 200)),
+    ):
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"{name:<36} {seconds / number * 1e9:>10.0f}")
+
+    seconds = min(timeit.repeat(metrics.render, number=100, repeat=3))
+    print(f"{'render()':<36} {seconds / 100 * 1e9:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memoized cheapest-model queries against the bundled pricing.
+
+Usage:
+    python benchmarks/bench_routing.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ctoken.routing import ModelRouter, cheapest_model  # noqa: E402
+
+
+def main():
+    router = ModelRouter(2_000, 500)
+    allowed = frozenset({"gpt-4o", "gpt-4.1-mini", "o3"})
+    number = 100_000
+
+    print(f"{'query':<28} {'ns/call':>10}")
+    for name, fn in (
+        ("router.cheapest(allowed)", lambda: router.cheapest(allowed)),
+        ("cheapest_model(...)", lambda: cheapest_model(2_000, 500, allowed=allowed)),
+    ):
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"{name:<28} {seconds / number * 1e9:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SharedLedger update throughput across processes.
+
+Each worker process adds records straight into its own stripe of the shared
+block; the parent then takes one snapshot of every worker's subtotals.
+
+Usage:
+    python benchmarks/bench_shared_ledger.py [records per worker] [workers]
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ctoken.ledger import CostLedger  # noqa: E402
+from ctoken.shared_ledger import SharedLedger  # noqa: E402
+
+MODELS = ("gpt-4o", "gpt-4o-mini", "gpt-4.1", "o3")
+
+
+def _work(ledger, count):
+    for i in range(count):
+        ledger.add(MODELS[i & 3], 1_200, 300, 256)
+
+
+def _rate(ledger, count):
+    started = time.perf_counter()
+    _work(ledger, count)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    context = multiprocessing.get_context("spawn")
+
+    with SharedLedger(mp_context=context) as ledger:
+        print(f"{'CostLedger/s':<16} {_rate(CostLedger(), count):>12,.0f}")
+        print(f"{'SharedLedger/s':<16} {_rate(ledger, count):>12,.0f}")
+
+        processes = [
+            context.Process(target=_work, args=(ledger, count)) for _ in range(workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        report = ledger.snapshot().report()
+        snapshot = time.perf_counter() - started
+        print(f"{'workers':<16} {workers:>12}")
+        print(f"{'all workers/s':<16} {workers * count / elapsed:>12,.0f}")
+        print(f"{'snapshot ms':<16} {snapshot * 1e3:>12.2f}")
+        print(f"{'requests':<16} {report['requests']:>12,}")
+        print(f"{'total cost':<16} {report['total_cost']:>12}")
+
+
+if __name__ == "__main__":
+    main()
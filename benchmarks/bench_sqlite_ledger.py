@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SQLiteLedger write throughput.
+
+Records are queued from one thread and committed by the background writer;
+"queued" is the caller-side rate, "committed" includes the final flush.
+
+Usage:
+    python benchmarks/bench_sqlite_ledger.py [records]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ctoken.sqlite_ledger import SQLiteLedger  # noqa: E402
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    models = ("gpt-4o", "gpt-4o-mini", "gpt-4.1", "o3")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ledger.sqlite3")
+        with SQLiteLedger(path) as ledger:
+            now = time.time()
+            started = time.perf_counter()
+            for i in range(count):
+                ledger.record(models[i & 3], 1_200, 300, 256, now + i * 0.001)
+            queued = time.perf_counter()
+            ledger.flush()
+            committed = time.perf_counter()
+
+            print(f"{'records':<12} {count:>12,}")
+            print(f"{'queued/s':<12} {count / (queued - started):>12,.0f}")
+            print(f"{'committed/s':<12} {count / (committed - started):>12,.0f}")
+            report = ledger.totals_by_model().report()
+            print(f"{'total cost':<12} {report['total_cost']:>12}")
+
+
+if __name__ == "__main__":
+    main()
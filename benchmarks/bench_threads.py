@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ctoken() and shared-ledger throughput across threads.
+
+Every thread prices the same responses through `ctoken()` (resolution caches
+only read) and adds them to one shared CostLedger (per-thread rows). On a
+free-threaded build (e.g. python3.13t) throughput should scale near-linearly
+with the thread count; with the GIL it stays flat.
+
+Usage:
+    python benchmarks/bench_threads.py [calls per thread] [max threads]
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ctoken import ctoken  # noqa: E402
+from ctoken.ledger import CostLedger, accumulate  # noqa: E402
+
+MODELS = ("gpt-4o", "gpt-4o-mini", "gpt-4.1", "o3")
+
+
+class _Struct:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def _response(model):
+    usage = _Struct(
+        prompt_tokens=1_200,
+        completion_tokens=300,
+        prompt_tokens_details=_Struct(cached_tokens=256),
+    )
+    return _Struct(model=model, usage=usage)
+
+
+RESPONSES = [_response(model) for model in MODELS]
+
+
+def _price(count, ledger):
+    for i in range(count):
+        ctoken(RESPONSES[i & 3])
+
+
+def _add(count, ledger):
+    for i in range(count):
+        accumulate(RESPONSES[i & 3], ledger)
+
+
+def _rate(work, threads, count):
+    ledger = CostLedger()
+    start = threading.Barrier(threads + 1)
+
+    def run():
+        start.wait()
+        work(count, ledger)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return threads * count / (time.perf_counter() - started)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'enabled' if gil else 'disabled'}, {os.cpu_count()} CPUs")
+
+    counts = [1]
+    while counts[-1] * 2 <= max_threads:
+        counts.append(counts[-1] * 2)
+
+    print(
+        f"{'threads':>8} {'ctoken/s':>12} {'speedup':>8} {'add/s':>12} {'speedup':>8}"
+    )
+    base = None
+    for threads in counts:
+        rates = (_rate(_price, threads, count), _rate(_add, threads, count))
+        base = base or rates
+        print(
+            f"{threads:>8} {rates[0]:>12,.0f} {rates[0] / base[0]:>8.2f}"
+            f" {rates[1]:>12,.0f} {rates[1] / base[1]:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
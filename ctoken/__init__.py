@@ -2,9 +2,10 @@
 Claude Token Pricing Calculator
 
 A simple utility for calculating and estimating costs
-when using OpenAI's API with Claude models.
+when using OpenAI's and Anthropic's APIs, with pricing sharded by provider.
 """
 
+import importlib
 from datetime import datetime
 import re
 from typing import Dict, Any, Optional, List, Tuple, Union
@@ -14,10 +15,55 @@ from .pricing_data import (
     get_all_model_pricings,
     load_pricing,
     refresh_pricing,
+    set_price_sheet,
 )
 from .response_parser import extract_model_details
 from .calculation import calculate_cost
 from .token_estimator import estimate_openai_api_cost as estimate_api_cost
+from .token_estimator import estimate_many
+from .ledger import CostLedger, accumulate
+from .token_counter import count_tokens, set_token_counter, tiktoken_counter
+from .price_sheets import PriceSheet, pricing_source
+from .providers import Provider, register_provider
+
+# Optional subsystems, imported on first access so that ``import ctoken``
+# does not pull in asyncio, sqlite3, http.server or shared memory
+_LAZY = {
+    "ModelRouter": ".routing",
+    "cheapest_model": ".routing",
+    "PromptCacheSimulator": ".cache_simulator",
+    "aestimate_api_cost": ".async_estimator",
+    "set_default_executor": ".async_estimator",
+    "Conversation": ".conversation",
+    "StreamMeter": ".streaming",
+    "CostMetrics": ".metrics",
+    "CostCache": ".cost_cache",
+    "set_cost_cache": ".cost_cache",
+    "SQLiteLedger": ".sqlite_ledger",
+    "SharedLedger": ".shared_ledger",
+    "SpendTracker": ".spend_tracker",
+    "LogHistogram": ".histogram",
+    "UsageHistograms": ".histogram",
+    "BatchJoin": ".batch",
+    "batch_price_sheet": ".batch",
+    "Calibrator": ".calibration",
+    "set_calibrator": ".calibration",
+}
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY))
+
 
 # Create alias for the main function
 ctoken = estimate_api_cost
@@ -28,9 +74,39 @@ __all__ = [
     "calculate_cost",
     "extract_model_details",
     "estimate_api_cost",
+    "estimate_many",
     "get_model_pricing",
     "get_all_model_pricings",
     "load_pricing",
     "refresh_pricing",
     "ctoken",
+    "ModelRouter",
+    "cheapest_model",
+    "PromptCacheSimulator",
+    "CostLedger",
+    "accumulate",
+    "aestimate_api_cost",
+    "set_default_executor",
+    "count_tokens",
+    "set_token_counter",
+    "tiktoken_counter",
+    "Conversation",
+    "StreamMeter",
+    "CostMetrics",
+    "CostCache",
+    "set_cost_cache",
+    "SQLiteLedger",
+    "SharedLedger",
+    "SpendTracker",
+    "LogHistogram",
+    "UsageHistograms",
+    "set_price_sheet",
+    "PriceSheet",
+    "pricing_source",
+    "Provider",
+    "register_provider",
+    "BatchJoin",
+    "batch_price_sheet",
+    "Calibrator",
+    "set_calibrator",
 ]
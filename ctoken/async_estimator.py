@@ -0,0 +1,233 @@
+"""
+asyncio-friendly cost estimation.
+
+Pre-flight estimation of very large prompts is CPU-bound and would stall the
+event loop if run inline. `aestimate_api_cost` estimates small inputs inline
+and hands large ones to a shared executor (a thread pool by default, or any
+executor such as a ProcessPoolExecutor), bounds how many offloaded jobs are in
+flight and how many may wait for a slot, and lets concurrent identical requests
+share a single computation.
+"""
+
+import asyncio
+import os
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Hashable, List, Optional, Union
+
+from .token_estimator import estimate_openai_api_cost
+
+
+def _input_size(messages: Optional[List[Dict[str, str]]], prompt: Optional[str]) -> int:
+    """Get the number of characters that would be tokenized."""
+    if messages:
+        return sum(len(m.get("content") or "") for m in messages)
+    return len(prompt or "")
+
+
+def _request_key(
+    model: str,
+    messages: Optional[List[Dict[str, str]]],
+    prompt: Optional[str],
+    max_tokens: int,
+) -> Optional[Hashable]:
+    """Build a key identifying identical requests, or None if unhashable."""
+    content: Any = prompt
+    if messages:
+        content = tuple((m.get("role"), m.get("content")) for m in messages)
+    key = (model, content, max_tokens)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class _LoopState:
+    """Offloading state bound to one event loop."""
+
+    __slots__ = ("semaphore", "inflight", "queued")
+
+    def __init__(self, max_pending: int) -> None:
+        self.semaphore = asyncio.Semaphore(max_pending)
+        self.inflight: Dict[Hashable, "asyncio.Future[float]"] = {}
+        self.queued = 0
+
+
+class AsyncEstimator:
+    """
+    Estimate API costs from coroutines without blocking the event loop.
+
+    Args:
+        executor: Executor used for large inputs (defaults to a shared thread
+            pool created on first use)
+        inline_threshold: Inputs with fewer characters than this are
+            estimated inline on the event loop
+        max_pending: Maximum number of offloaded estimations in flight per
+            event loop; further callers wait for a free slot
+        max_queued: Maximum number of offloaded estimations per event loop,
+            running or waiting for a slot; beyond it new ones are rejected
+    """
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        inline_threshold: int = 100_000,
+        max_pending: int = 32,
+        max_queued: int = 256,
+    ) -> None:
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive")
+        if max_queued < max_pending:
+            raise ValueError("max_queued must be at least max_pending")
+
+        self.inline_threshold = inline_threshold
+        self.max_pending = max_pending
+        self.max_queued = max_queued
+        self._executor = executor
+        self._owns_executor = False
+        # Semaphores and futures are bound to an event loop, so keep them per loop
+        self._loops: "weakref.WeakKeyDictionary[Any, _LoopState]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=min(32, (os.cpu_count() or 1) + 4),
+                thread_name_prefix="ctoken-estimate",
+            )
+            self._owns_executor = True
+        return self._executor
+
+    def set_executor(self, executor: Executor) -> None:
+        """
+        Replace the executor used for offloaded estimations.
+
+        A thread pool the estimator created itself is shut down; jobs already
+        submitted to it still complete.
+
+        Args:
+            executor: The new executor
+        """
+        previous, owned = self._executor, self._owns_executor
+        self._executor = executor
+        self._owns_executor = False
+        if owned and previous is not None and previous is not executor:
+            previous.shutdown(wait=False)
+
+    def _loop_state(self, loop: asyncio.AbstractEventLoop) -> "_LoopState":
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = _LoopState(self.max_pending)
+        return state
+
+    async def _offload(self, state: "_LoopState", job: partial) -> float:
+        try:
+            async with state.semaphore:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, job)
+        finally:
+            state.queued -= 1
+
+    async def estimate(
+        self,
+        model: Union[str, Any],
+        messages: Optional[List[Dict[str, str]]] = None,
+        prompt: Optional[str] = None,
+        max_tokens: int = 0,
+    ) -> Union[float, Any]:
+        """
+        Estimate the cost of an OpenAI API call (see `estimate_openai_api_cost`).
+
+        Args:
+            model: The model identifier or a completed response object
+            messages: List of message dictionaries for chat completions
+            prompt: Text prompt for completions
+            max_tokens: Maximum number of tokens to generate in the output
+
+        Returns:
+            Estimated cost in USD as a float, or a CostResult for a completed
+            response object
+
+        Raises:
+            ValueError: If the model is not found or inputs are invalid
+            asyncio.QueueFull: If max_queued estimations are already offloaded
+        """
+        job = partial(estimate_openai_api_cost, model, messages, prompt, max_tokens)
+        if not isinstance(model, str) or (
+            _input_size(messages, prompt) < self.inline_threshold
+        ):
+            return job()
+
+        loop = asyncio.get_running_loop()
+        state = self._loop_state(loop)
+        inflight = state.inflight
+        key = _request_key(model, messages, prompt, max_tokens)
+
+        future = inflight.get(key) if key is not None else None
+        if future is None:
+            # Waiting callers hold their (large) inputs, so reject instead of
+            # letting the backlog grow without limit
+            if state.queued >= self.max_queued:
+                raise asyncio.QueueFull(
+                    f"{state.queued} estimations already queued "
+                    f"(max_queued={self.max_queued})"
+                )
+            state.queued += 1
+            future = loop.create_task(self._offload(state, job))
+            if key is not None:
+                inflight[key] = future
+                future.add_done_callback(lambda _: inflight.pop(key, None))
+
+        # A cancelled caller must not cancel the computation others share
+        return await asyncio.shield(future)
+
+
+# Shared estimator used by `aestimate_api_cost`
+_default_estimator = AsyncEstimator()
+
+
+def set_default_executor(executor: Executor) -> None:
+    """
+    Use the given executor (e.g. a ProcessPoolExecutor) for offloaded estimates.
+
+    The thread pool created by default, if any, is shut down.
+
+    Args:
+        executor: The executor `aestimate_api_cost` offloads large inputs to
+    """
+    _default_estimator.set_executor(executor)
+
+
+async def aestimate_api_cost(
+    model: Union[str, Any],
+    messages: Optional[List[Dict[str, str]]] = None,
+    prompt: Optional[str] = None,
+    max_tokens: int = 0,
+) -> Union[float, Any]:
+    """
+    Asynchronously estimate the cost of an OpenAI API call.
+
+    Small inputs are estimated inline; inputs above the size threshold are
+    offloaded to a shared executor with bounded queueing (raising
+    asyncio.QueueFull when the queue is full), and concurrent
+    identical requests share one computation.
+
+    Args:
+        model: The model identifier or a completed response object
+        messages: List of message dictionaries for chat completions
+        prompt: Text prompt for completions
+        max_tokens: Maximum number of tokens to generate in the output
+
+    Returns:
+        Estimated cost in USD as a float, or a CostResult for a completed
+        response object
+
+    Raises:
+        ValueError: If the model is not found or inputs are invalid
+        asyncio.QueueFull: If too many estimations are already queued
+    """
+    return await _default_estimator.estimate(model, messages, prompt, max_tokens)
@@ -0,0 +1,418 @@
+"""
+Estimate-vs-actual costing of OpenAI Batch API jobs.
+
+A batch job has an input JSONL of requests and an output JSONL of responses,
+correlated by ``custom_id``. `BatchJoin` estimates every request with
+`estimate_openai_api_cost`, prices every response exactly through the
+`ctoken()` engine, both at batch-tier prices (see `batch_price_sheet`), and
+joins the two files on ``custom_id``.
+
+The join is a hash join: estimates are kept in a dictionary while it stays
+under ``max_rows`` entries and probed by the output file. Past that, both
+files are partitioned by a hash of ``custom_id`` into temporary files and
+the partitions are joined one at a time, so memory stays bounded for files
+with millions of lines.
+
+Example:
+    job = BatchJoin("batch_input.jsonl", "batch_output.jsonl")
+    for row in job:
+        print(row["custom_id"], row["estimated_cost"], row["total_cost"])
+    print(job.summary()["total_cost"])
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from decimal import Decimal
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from . import engine, pricing_data
+from .calculation import format_usd
+from .engine import PICODOLLARS_PER_USD
+from .ledger import _PICO, CostLedger
+from .price_sheets import PriceSheet, Sheet, as_price_sheet
+from .response_parser import extract_usage_from_dict
+from .token_estimator import CostEstimateError, estimate_openai_api_cost
+
+# Batch API prices are half the standard prices
+BATCH_DISCOUNT = 0.5
+
+# Pricing layer name of batch-tier prices (see `price_sheets.pricing_source`)
+BATCH = "batch"
+
+# Estimates held in memory before both files are partitioned to disk
+DEFAULT_MAX_ROWS = 1_000_000
+DEFAULT_PARTITIONS = 64
+
+# Token and cost fields of each joined row, after custom_id and model
+BATCH_FIELDS = (
+    "status",
+    "estimated_cost",
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "total_cost",
+    "error",
+)
+
+_SIX_PLACES = Decimal("0.000001")
+
+# (model, estimated cost in picodollars, or None with an error message)
+_Estimate = Tuple[Optional[str], Optional[int], Optional[str]]
+# (model, prompt, completion, cached tokens, uncached, cached and output
+# costs in picodollars), or an error message
+_Actual = Union[Tuple[str, int, int, int, int, int, int], str]
+
+
+def batch_price_sheet(discount: float = BATCH_DISCOUNT) -> PriceSheet:
+    """
+    Build a price sheet of batch-tier prices from the current pricing data.
+
+    Every price (including org price sheet entries) is multiplied by the
+    discount and rounded to 6 decimal places in USD per 1M tokens.
+
+    Args:
+        discount: Batch price as a fraction of the standard price
+
+    Returns:
+        A PriceSheet whose entries report the "batch" pricing layer
+    """
+    factor = Decimal(str(discount))
+    table = {
+        key: {
+            field: float((Decimal(str(price)) * factor).quantize(_SIX_PLACES))
+            for field, price in rates.items()
+        }
+        for key, rates in pricing_data.load_pricing().items()
+    }
+    return PriceSheet(table, layer=BATCH)
+
+
+def _text(content: Any) -> str:
+    """Flatten message content (a string or a list of parts) to its text."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(
+            part if isinstance(part, str) else str(part.get("text") or "")
+            for part in content
+            if isinstance(part, (str, dict))
+        )
+    return ""
+
+
+def _request_text(body: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Get the (messages, prompt) to estimate a request body from."""
+    messages = body.get("messages")
+    if isinstance(messages, list):
+        return [
+            {"content": _text(m.get("content"))}
+            for m in messages
+            if isinstance(m, dict)
+        ], None
+
+    prompt = body.get("input", body.get("prompt"))
+    if isinstance(prompt, list):
+        # Responses API input items, or a list of completion/embedding inputs
+        prompt = " ".join(
+            _text(item.get("content")) if isinstance(item, dict) else _text(item)
+            for item in prompt
+        )
+    return None, prompt if isinstance(prompt, str) else None
+
+
+def _max_tokens(body: Dict[str, Any]) -> int:
+    for field in ("max_completion_tokens", "max_output_tokens", "max_tokens"):
+        value = body.get(field)
+        if value:
+            return int(value)
+    return 0
+
+
+def _read_lines(path: str) -> Iterator[Tuple[int, str]]:
+    with open(path, encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, 1):
+            if line.strip():
+                yield line_no, line
+
+
+def _custom_id(record: Any) -> str:
+    if not isinstance(record, dict) or not isinstance(record.get("custom_id"), str):
+        raise ValueError("Line has no 'custom_id'")
+    return record["custom_id"]
+
+
+class BatchJoin:
+    """
+    Join a Batch API input file and output file on ``custom_id``.
+
+    Iterating yields one row per request: matched requests, requests missing
+    from the output file (status "missing"), failed requests and responses
+    whose request is not in the input file (status "unmatched"). Rows come in
+    output file order, or partition by partition once the join spills.
+    Costs are USD floats at batch-tier prices; `summary` totals the
+    completed requests exactly. A custom_id repeated in the input file is
+    recorded in `errors` and its later requests are ignored.
+
+    Args:
+        input_path: Path of the batch input JSONL
+        output_path: Path of the batch output JSONL
+        pricing: Price sheet for the requests (defaults to
+            `batch_price_sheet()`)
+        max_rows: Estimates held in memory before spilling to disk
+        partitions: Number of partition files per side when spilling
+        tmp_dir: Directory of the partition files (defaults to the system
+            temporary directory)
+
+    Raises:
+        ValueError: If max_rows or partitions is not positive
+    """
+
+    def __init__(
+        self,
+        input_path: str,
+        output_path: str,
+        pricing: Optional[Union[PriceSheet, Sheet]] = None,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        partitions: int = DEFAULT_PARTITIONS,
+        tmp_dir: Optional[str] = None,
+    ) -> None:
+        if max_rows < 1 or partitions < 1:
+            raise ValueError("max_rows and partitions must be positive")
+        self.input_path = input_path
+        self.output_path = output_path
+        self.pricing = (
+            as_price_sheet(pricing) if pricing is not None else batch_price_sheet()
+        )
+        self.max_rows = max_rows
+        self.partitions = partitions
+        self.tmp_dir = tmp_dir
+
+        self.ledger = CostLedger()
+        self.estimated_picodollars = 0
+        self.counts = {"requests": 0, "missing": 0, "failed": 0, "unmatched": 0}
+        self.errors: List[str] = []
+        self.spilled = False
+
+    # Build side: estimates of the input file
+
+    def _estimate(self, line: str) -> Tuple[str, _Estimate]:
+        record = json.loads(line)
+        custom_id = _custom_id(record)
+        body = record.get("body")
+        model = body.get("model") if isinstance(body, dict) else None
+        if not model:
+            return custom_id, (None, None, "Request body has no 'model'")
+        messages, prompt = _request_text(body)
+        try:
+            usd = estimate_openai_api_cost(
+                model,
+                messages=messages,
+                prompt=prompt,
+                max_tokens=_max_tokens(body),
+                pricing=self.pricing,
+            )
+        except (ValueError, TypeError, CostEstimateError) as e:
+            return custom_id, (model, None, str(e))
+        return custom_id, (model, round(usd * PICODOLLARS_PER_USD), None)
+
+    def _estimates(self) -> Iterator[Tuple[str, _Estimate]]:
+        for line_no, line in _read_lines(self.input_path):
+            try:
+                yield self._estimate(line)
+            except ValueError as e:
+                self.errors.append(f"{self.input_path}:{line_no}: {e}")
+
+    # Probe side: exact costs of the output file
+
+    def _actual(self, line: str) -> Tuple[str, _Actual]:
+        record = json.loads(line)
+        custom_id = _custom_id(record)
+        response = record.get("response")
+        error = record.get("error")
+        if error or not isinstance(response, dict):
+            message = error.get("message") if isinstance(error, dict) else error
+            return custom_id, str(message or "Request failed")
+        body = response.get("body")
+        if response.get("status_code", 200) != 200 or not isinstance(body, dict):
+            return (
+                custom_id,
+                f"Request failed with status {response.get('status_code')}",
+            )
+        model = body.get("model")
+        if not model:
+            return custom_id, "Response body has no 'model'"
+        try:
+            usage = extract_usage_from_dict(body)
+            rates = self.pricing.rates(model, fuzzy=True)
+        except (ValueError, TypeError) as e:
+            return custom_id, str(e)
+        if rates is None:
+            return custom_id, f"No pricing data found for model '{model}'"
+        prompt, completion, cached = (
+            usage["prompt_tokens"],
+            usage["completion_tokens"],
+            usage["cached_tokens"],
+        )
+        return custom_id, (
+            model,
+            prompt,
+            completion,
+            cached,
+            *engine.price(
+                rates,
+                prompt,
+                completion,
+                cached,
+                usage.get("cache_write_tokens", 0),
+                usage.get("cache_write_1h_tokens", 0),
+            ),
+        )
+
+    def _actuals(self) -> Iterator[Tuple[str, _Actual]]:
+        for line_no, line in _read_lines(self.output_path):
+            try:
+                yield self._actual(line)
+            except ValueError as e:
+                self.errors.append(f"{self.output_path}:{line_no}: {e}")
+
+    # Join
+
+    def _row(
+        self, custom_id: str, estimate: Optional[_Estimate], actual: Optional[_Actual]
+    ) -> Dict[str, Any]:
+        row: Dict[str, Any] = dict.fromkeys(("custom_id", "model", *BATCH_FIELDS))
+        row["custom_id"] = custom_id
+        errors = []
+        if estimate is not None:
+            model, picodollars, error = estimate
+            row["model"] = model
+            if picodollars is not None:
+                self.estimated_picodollars += picodollars
+                row["estimated_cost"] = picodollars / PICODOLLARS_PER_USD
+            if error:
+                errors.append(f"estimate: {error}")
+
+        if isinstance(actual, str):
+            errors.append(actual)
+        elif actual is not None:
+            model, prompt, completion, cached, uncached_cost, cached_cost, out = actual
+            row["model"] = model
+            row["prompt_tokens"] = prompt
+            row["completion_tokens"] = completion
+            row["cached_tokens"] = cached
+            row["total_cost"] = (
+                uncached_cost + cached_cost + out
+            ) / PICODOLLARS_PER_USD
+
+        # Each row has exactly one status: requests (input lines) are
+        # completed, missing or failed, responses without one are unmatched
+        if estimate is None:
+            row["status"] = "unmatched"
+        elif actual is None:
+            row["status"] = "missing"
+        elif isinstance(actual, str):
+            row["status"] = "failed"
+        else:
+            self.ledger.add_subtotal(
+                model, 1, prompt, completion, cached, uncached_cost, cached_cost, out
+            )
+            row["status"] = "completed"
+        if estimate is not None:
+            self.counts["requests"] += 1
+        if row["status"] in self.counts:
+            self.counts[row["status"]] += 1
+        row["error"] = "; ".join(errors) or None
+        return row
+
+    def _keep(
+        self, table: Dict[str, _Estimate], custom_id: str, estimate: _Estimate
+    ) -> bool:
+        """Add an estimate unless its custom_id was seen (the first wins)."""
+        if custom_id in table:
+            self.errors.append(
+                f"{self.input_path}: duplicate custom_id {custom_id!r} ignored"
+            )
+            return False
+        table[custom_id] = estimate
+        return True
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        table: Dict[str, _Estimate] = {}
+        estimates = self._estimates()
+        for custom_id, estimate in estimates:
+            if not self._keep(table, custom_id, estimate):
+                continue
+            if len(table) > self.max_rows:
+                self.spilled = True
+                yield from self._spilled_join(table, estimates)
+                return
+
+        for custom_id, actual in self._actuals():
+            yield self._row(custom_id, table.pop(custom_id, None), actual)
+        for custom_id, estimate in table.items():
+            yield self._row(custom_id, estimate, None)
+
+    def _spilled_join(
+        self,
+        table: Dict[str, _Estimate],
+        estimates: Iterator[Tuple[str, _Estimate]],
+    ) -> Iterator[Dict[str, Any]]:
+        """Partition both sides to disk and join one partition at a time."""
+        directory = tempfile.mkdtemp(prefix="ctoken-batch-", dir=self.tmp_dir)
+        try:
+            build = self._partition(directory, "input", table.items(), estimates)
+            table.clear()
+            probe = self._partition(directory, "output", self._actuals())
+            for build_path, probe_path in zip(build, probe):
+                part: Dict[str, _Estimate] = {}
+                with open(build_path, encoding="utf-8") as handle:
+                    for custom_id, estimate in map(json.loads, handle):
+                        self._keep(part, custom_id, tuple(estimate))
+                os.remove(build_path)
+                with open(probe_path, encoding="utf-8") as handle:
+                    for custom_id, actual in map(json.loads, handle):
+                        if isinstance(actual, list):
+                            actual = tuple(actual)
+                        yield self._row(custom_id, part.pop(custom_id, None), actual)
+                os.remove(probe_path)
+                for custom_id, estimate in part.items():
+                    yield self._row(custom_id, estimate, None)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _partition(self, directory: str, side: str, *sources: Any) -> List[str]:
+        paths = [
+            os.path.join(directory, f"{side}-{i:04d}.jsonl")
+            for i in range(self.partitions)
+        ]
+        handles: List[IO[str]] = [open(path, "w", encoding="utf-8") for path in paths]
+        try:
+            for source in sources:
+                for custom_id, value in source:
+                    index = zlib.crc32(custom_id.encode("utf-8")) % self.partitions
+                    handles[index].write(json.dumps([custom_id, value]))
+                    handles[index].write("\n")
+        finally:
+            for handle in handles:
+                handle.close()
+        return paths
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the totals of the rows iterated so far.
+
+        Returns:
+            Dict with the request counts, "estimated_cost" (USD string), the
+            exact actual token and cost totals of `CostLedger.report`
+            (including per-model subtotals under "models") and "errors"
+            (unreadable lines)
+        """
+        report = self.ledger.report()
+        report["completed"] = report.pop("requests")
+        report.update(self.counts)
+        report["estimated_cost"] = format_usd(self.estimated_picodollars * _PICO)
+        report["errors"] = list(self.errors)
+        return report
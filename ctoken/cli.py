@@ -0,0 +1,547 @@
+"""
+Command-line interface for re-costing usage logs.
+
+Provides the ``ctoken`` console entry point with subcommands to cost JSONL
+response logs and CSV usage exports. Work is split into chunks of records
+that can be costed across several worker processes, results are streamed to
+stdout (JSONL) or written to a Parquet file, and an exact per-model summary
+is printed when the run completes.
+
+Usage:
+    ctoken jsonl logs/*.jsonl --workers 8 --progress > costs.jsonl
+    ctoken csv usage.csv --output costs.parquet
+    ctoken batch batch_input.jsonl batch_output.jsonl > requests.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+
+from .batch import DEFAULT_MAX_ROWS, BatchJoin
+from .ledger import _PICO, CostLedger
+from .response_parser import extract_usage_from_dict
+from .token_estimator import CostEstimateError
+
+# Token and cost fields of each output row
+COST_FIELDS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "cached_tokens",
+    "prompt_cost_uncached",
+    "prompt_cost_cached",
+    "completion_cost",
+    "total_cost",
+)
+
+# A chunk is (format, source path, first line number, raw records)
+Chunk = Tuple[str, str, int, List[Any]]
+
+
+def _parse_record(fmt: str, raw: Any) -> Dict[str, Any]:
+    """
+    Turn a raw JSONL line or CSV row into a response dictionary.
+
+    Args:
+        fmt: Input format, either "jsonl" or "csv"
+        raw: The raw line (jsonl) or row dictionary (csv)
+
+    Returns:
+        The parsed record dictionary
+
+    Raises:
+        ValueError: If the line is not a JSON object
+    """
+    if fmt == "csv":
+        return raw
+
+    record = json.loads(raw)
+    if not isinstance(record, dict):
+        raise ValueError("Line is not a JSON object")
+    # Batch API output lines wrap the response body
+    body = record.get("response", {})
+    if isinstance(body, dict) and isinstance(body.get("body"), dict):
+        record = body["body"]
+    return record
+
+
+def cost_chunk(
+    chunk: Chunk, materialize: bool = True
+) -> Tuple[List[Dict[str, Any]], List[str], CostLedger]:
+    """
+    Cost every record of a chunk.
+
+    Every record is added to an exact per-chunk `CostLedger`, which resolves
+    pricing rates once per distinct model string in the chunk. Row costs are
+    derived from the same integer amounts the ledger adds up, so rows and the
+    summary always agree.
+
+    Args:
+        chunk: Tuple of (format, source path, first line number, raw records)
+        materialize: Whether to build a result row per record; summary-only
+            runs skip this and only update the ledger
+
+    Returns:
+        Tuple of (result rows, error messages, chunk ledger)
+    """
+    fmt, source, first_line, raws = chunk
+    rows: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    ledger = CostLedger()
+
+    for offset, raw in enumerate(raws):
+        line_no = first_line + offset
+        if fmt == "jsonl" and not raw.strip():
+            continue
+        try:
+            record = _parse_record(fmt, raw)
+            model = record.get("model")
+            if not model:
+                raise ValueError("Record missing 'model' field")
+            usage = extract_usage_from_dict(record)
+            ledger.add_usage(model, usage)
+            if materialize:
+                costs = ledger.price(
+                    model,
+                    usage["prompt_tokens"],
+                    usage["completion_tokens"],
+                    usage["cached_tokens"],
+                    usage.get("cache_write_tokens", 0),
+                    usage.get("cache_write_1h_tokens", 0),
+                )
+        except (ValueError, TypeError, KeyError, CostEstimateError) as e:
+            errors.append(f"{source}:{line_no}: {e}")
+            continue
+
+        if materialize:
+            uncached_cost, cached_cost, output_cost = costs
+            rows.append(
+                {
+                    "source": source,
+                    "line": line_no,
+                    "model": model,
+                    "prompt_tokens": usage["prompt_tokens"],
+                    "completion_tokens": usage["completion_tokens"],
+                    "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"],
+                    "cached_tokens": usage["cached_tokens"],
+                    "prompt_cost_uncached": float(uncached_cost * _PICO),
+                    "prompt_cost_cached": float(cached_cost * _PICO),
+                    "completion_cost": float(output_cost * _PICO),
+                    "total_cost": float(
+                        (uncached_cost + cached_cost + output_cost) * _PICO
+                    ),
+                }
+            )
+
+    return rows, errors, ledger
+
+
+def _read_chunks(fmt: str, paths: Sequence[str], chunk_size: int) -> Iterator[Chunk]:
+    """
+    Lazily split input files into chunks of records.
+
+    Args:
+        fmt: Input format, either "jsonl" or "csv"
+        paths: Input file paths ("-" reads stdin)
+        chunk_size: Maximum number of records per chunk
+
+    Yields:
+        Chunks ready to be passed to `cost_chunk`
+    """
+    for path in paths:
+        if path == "-":
+            handle = sys.stdin
+        else:
+            handle = open(path, newline="", encoding="utf-8")
+        try:
+            if fmt == "csv":
+                records: Iterable[Any] = csv.DictReader(handle)
+                first_line = 2  # Account for the header row
+            else:
+                records = handle
+                first_line = 1
+
+            batch: List[Any] = []
+            for raw in records:
+                batch.append(raw)
+                if len(batch) >= chunk_size:
+                    yield fmt, path, first_line, batch
+                    first_line += len(batch)
+                    batch = []
+            if batch:
+                yield fmt, path, first_line, batch
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+def _bounded_map(
+    executor: Executor, fn: Any, items: Iterable[Any], window: int
+) -> Iterator[Any]:
+    """
+    Like ``executor.map`` but with at most `window` items submitted at once.
+
+    ``Executor.map`` submits every item up front, which would read and pickle
+    the entire input before the first result is written. Results are yielded
+    in input order.
+
+    Args:
+        executor: The executor running `fn`
+        fn: Function applied to every item
+        items: Lazily produced items
+        window: Maximum number of submitted, unconsumed items
+
+    Yields:
+        ``fn(item)`` for every item, in order
+    """
+    pending: deque = deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+class _Summary:
+    """Exact per-model totals and throughput for a CLI run."""
+
+    def __init__(self) -> None:
+        self.ledger = CostLedger()
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    def add(self, ledger: CostLedger, error_count: int) -> None:
+        self.ledger.merge(ledger)
+        self.errors += error_count
+
+    @property
+    def records(self) -> int:
+        return len(self.ledger)
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.records / elapsed if elapsed > 0 else 0.0
+
+    def render(self) -> str:
+        header = (
+            f"{'model':<32} {'requests':>10} {'prompt':>14} "
+            f"{'completion':>14} {'cached':>14} {'cost (USD)':>18}"
+        )
+        lines = [header, "-" * len(header)]
+        report = self.ledger.report()
+        for model, t in sorted(report["models"].items()):
+            lines.append(
+                f"{model:<32} {t['requests']:>10} {t['prompt_tokens']:>14} "
+                f"{t['completion_tokens']:>14} {t['cached_tokens']:>14} "
+                f"{t['total_cost']:>18}"
+            )
+        lines.append("-" * len(header))
+        lines.append(
+            f"{'total':<32} {report['requests']:>10} {report['prompt_tokens']:>14} "
+            f"{report['completion_tokens']:>14} {report['cached_tokens']:>14} "
+            f"{report['total_cost']:>18}"
+        )
+        lines.append(
+            f"{self.records} records, {self.errors} errors, {self.rate:,.0f} records/s"
+        )
+        return "\n".join(lines)
+
+
+class _ParquetWriter:
+    """Incremental Parquet writer (requires pyarrow)."""
+
+    def __init__(self, path: str) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise SystemExit(
+                "Parquet output requires pyarrow: pip install pyarrow"
+            ) from e
+        self._pa = pa
+        self._schema = pa.schema(
+            [("source", pa.string()), ("line", pa.int64()), ("model", pa.string())]
+            + [
+                (f, pa.int64() if f.endswith("tokens") else pa.float64())
+                for f in COST_FIELDS
+            ]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        if rows:
+            self._writer.write_table(
+                self._pa.Table.from_pylist(rows, schema=self._schema)
+            )
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class _JsonlWriter:
+    """Streams result rows as JSON lines."""
+
+    def __init__(self, stream: TextIO) -> None:
+        self._stream = stream
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._stream.write(json.dumps(row))
+            self._stream.write("\n")
+
+    def close(self) -> None:
+        self._stream.flush()
+
+
+def run(
+    fmt: str,
+    paths: Sequence[str],
+    workers: int = 1,
+    chunk_size: int = 10_000,
+    output: Optional[str] = "-",
+    summary: bool = True,
+    progress: bool = False,
+    stdout: Optional[TextIO] = None,
+    stderr: Optional[TextIO] = None,
+) -> int:
+    """
+    Cost one or more usage logs and stream the results.
+
+    Args:
+        fmt: Input format, either "jsonl" or "csv"
+        paths: Input file paths ("-" reads stdin)
+        workers: Number of worker processes (1 runs inline)
+        chunk_size: Number of records handed to a worker at a time
+        output: "-" for JSONL on stdout, a ``.parquet`` path, or None to
+            only print the summary
+        summary: Whether to print the per-model summary
+        progress: Whether to report progress and throughput on stderr
+        stdout: Stream for JSONL results and the summary (default: sys.stdout)
+        stderr: Stream for errors and progress (default: sys.stderr)
+
+    Returns:
+        Process exit code (0 on success, 1 if any record failed)
+
+    Raises:
+        ValueError: If output is a path without the ``.parquet`` suffix
+    """
+    if output and output != "-" and not output.lower().endswith(".parquet"):
+        raise ValueError(f"Output must be '-' or a .parquet file, not {output!r}")
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+
+    writer: Any = None
+    if output == "-":
+        writer = _JsonlWriter(stdout)
+    elif output:
+        writer = _ParquetWriter(output)
+
+    # When results stream to stdout, keep it machine-readable
+    report = stderr if output == "-" else stdout
+    totals = _Summary()
+    chunks = _read_chunks(fmt, paths, chunk_size)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        worker = partial(cost_chunk, materialize=writer is not None)
+        if executor is not None:
+            # Keep reading ahead bounded; results stay in input order
+            results: Iterable[Any] = _bounded_map(
+                executor, worker, chunks, window=2 * workers
+            )
+        else:
+            results = map(worker, chunks)
+
+        for rows, errors, ledger in results:
+            for message in errors:
+                stderr.write(f"error: {message}\n")
+            if writer is not None:
+                writer.write(rows)
+            totals.add(ledger, len(errors))
+            if progress:
+                stderr.write(
+                    f"\r{totals.records:,} records, {totals.rate:,.0f} records/s"
+                )
+                stderr.flush()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if writer is not None:
+            writer.close()
+
+    if progress:
+        stderr.write("\n")
+    if summary:
+        report.write(totals.render() + "\n")
+
+    return 1 if totals.errors else 0
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    output: Optional[str] = "-",
+    summary: bool = True,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    stdout: Optional[TextIO] = None,
+    stderr: Optional[TextIO] = None,
+) -> int:
+    """
+    Join a Batch API job's input and output files and compare costs.
+
+    Args:
+        input_path: Path of the batch input JSONL
+        output_path: Path of the batch output JSONL
+        output: "-" for per-request JSONL rows on stdout, or None to only
+            print the summary
+        summary: Whether to print the per-model summary with the estimate
+        max_rows: Estimates held in memory before the join spills to disk
+        stdout: Stream for JSONL results and the summary (default: sys.stdout)
+        stderr: Stream for errors (default: sys.stderr)
+
+    Returns:
+        Process exit code (0 on success, 1 if any line or request failed)
+    """
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    writer = _JsonlWriter(stdout) if output == "-" else None
+    report = stderr if writer is not None else stdout
+
+    job = BatchJoin(input_path, output_path, max_rows=max_rows)
+    batch: List[Dict[str, Any]] = []
+    for row in job:
+        if writer is not None:
+            batch.append(row)
+            if len(batch) >= 10_000:
+                writer.write(batch)
+                batch.clear()
+    if writer is not None:
+        writer.write(batch)
+        writer.close()
+
+    totals = job.summary()
+    for message in totals["errors"]:
+        stderr.write(f"error: {message}\n")
+    if summary:
+        rendered = _Summary()
+        rendered.ledger = job.ledger
+        rendered.errors = len(totals["errors"]) + totals["failed"]
+        report.write(rendered.render() + "\n")
+        report.write(
+            f"{totals['requests']} requests, {totals['completed']} completed, "
+            f"{totals['failed']} failed, {totals['missing']} missing, "
+            f"{totals['unmatched']} unmatched\n"
+            f"estimated {totals['estimated_cost']} USD, "
+            f"actual {totals['total_cost']} USD\n"
+        )
+
+    return 1 if totals["errors"] or totals["failed"] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the ``ctoken`` command."""
+    parser = argparse.ArgumentParser(
+        prog="ctoken", description="Re-cost OpenAI usage logs."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (
+        ("jsonl", "cost a JSONL log of API responses"),
+        ("csv", "cost a CSV usage export (model, prompt_tokens, ...)"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("paths", nargs="+", help="input files ('-' for stdin)")
+        sub.add_argument(
+            "-w", "--workers", type=int, default=1, help="worker processes"
+        )
+        sub.add_argument(
+            "--chunk-size", type=int, default=10_000, help="records per work chunk"
+        )
+        sub.add_argument(
+            "-o",
+            "--output",
+            default="-",
+            help="'-' for JSONL on stdout, a .parquet file, or 'none'",
+        )
+        sub.add_argument(
+            "--no-summary", action="store_true", help="skip the per-model summary"
+        )
+        sub.add_argument(
+            "--progress", action="store_true", help="show progress on stderr"
+        )
+
+    sub = subparsers.add_parser(
+        "batch", help="compare estimated and actual costs of a Batch API job"
+    )
+    sub.add_argument("input", help="batch input JSONL (requests)")
+    sub.add_argument("output_file", help="batch output JSONL (responses)")
+    sub.add_argument(
+        "-o", "--output", default="-", help="'-' for JSONL on stdout, or 'none'"
+    )
+    sub.add_argument(
+        "--max-rows",
+        type=int,
+        default=DEFAULT_MAX_ROWS,
+        help="requests held in memory before joining on disk",
+    )
+    sub.add_argument(
+        "--no-summary", action="store_true", help="skip the per-model summary"
+    )
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Entry point for the ``ctoken`` console script."""
+    args = build_parser().parse_args(argv)
+    if args.command == "batch":
+        if args.max_rows < 1:
+            raise SystemExit("--max-rows must be positive")
+        if args.output.lower() not in ("-", "none"):
+            raise SystemExit("batch output must be '-' or 'none'")
+        return run_batch(
+            args.input,
+            args.output_file,
+            output=None if args.output.lower() == "none" else "-",
+            summary=not args.no_summary,
+            max_rows=args.max_rows,
+        )
+    if args.workers < 1 or args.chunk_size < 1:
+        raise SystemExit("--workers and --chunk-size must be positive")
+    output = args.output
+    if output.lower() not in ("-", "none") and not output.lower().endswith(".parquet"):
+        raise SystemExit("--output must be '-', 'none' or a .parquet file")
+
+    return run(
+        args.command,
+        args.paths,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        output=None if output.lower() == "none" else output,
+        summary=not args.no_summary,
+        progress=args.progress,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Incremental cost tracking for multi-turn conversations.
+
+Re-estimating the full, growing history on every turn is quadratic over a
+conversation. `Conversation` counts each message's tokens once, when it is
+added, and keeps a running total, so projecting the next turn's cost,
+recording a response's actual cost, truncating history and editing the system
+prompt are all O(1) per message touched.
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from . import engine
+from .calculation import CostResult
+from .calibration import Tally, language_bucket
+from .ledger import CostLedger
+from .token_estimator import (
+    _calibrator,
+    _compiled_rates,
+    _text_counter,
+    _with_overhead,
+    ctoken,
+)
+
+# A message's (token count, language bucket, characters)
+_Measure = Tuple[int, str, int]
+
+
+def _reply_content(response: Any) -> Optional[str]:
+    """Get the assistant text of a Chat Completions or Responses API object."""
+    choices = getattr(response, "choices", None)
+    if choices:
+        message = getattr(choices[0], "message", None)
+        return getattr(message, "content", None)
+    return getattr(response, "output_text", None)
+
+
+class Conversation:
+    """
+    Track the projected and actual cost of a chat conversation.
+
+    Token counts use the same estimator as `estimate_openai_api_cost` (the
+    registered exact counter, the calibrated ratio, or 4 characters per
+    token) and are taken once per message, so `projected_cost()` equals
+    ``estimate_openai_api_cost(model, conversation.messages, max_tokens=...)``
+    without re-reading the history.
+
+    Example:
+        chat = Conversation("gpt-4o", system="You are a helpful assistant.")
+        chat.append("user", "What is the capital of France?")
+        print(chat.projected_cost(max_tokens=100))
+        response = client.chat.completions.create(
+            model="gpt-4o", messages=chat.messages
+        )
+        chat.record(response)  # Records the cost and appends the reply
+
+    Args:
+        model: The model identifier used for projections
+        system: Optional system prompt, kept ahead of the history
+        max_tokens: Default maximum number of output tokens per turn
+
+    Raises:
+        ValueError: If the model is not found in pricing data
+    """
+
+    def __init__(
+        self, model: str, system: Optional[str] = None, max_tokens: int = 0
+    ) -> None:
+        if not model:
+            raise ValueError("Model identifier is required")
+
+        self.model = model
+        self.max_tokens = max_tokens
+        self.ledger = CostLedger()
+
+        self._history: Deque[Dict[str, Any]] = deque()
+        self._counts: Deque[_Measure] = deque()
+        # Tokens of the system prompt and history, before the overhead margin
+        self._tokens = 0
+        self._system: Optional[str] = None
+        self._system_count: _Measure = (0, "", 0)
+        # Characters by language bucket, for calibrated projections
+        self._tally: Tally = {}
+
+        _compiled_rates(model)  # Fail early on unknown models
+
+        if system is not None:
+            self.set_system(system)
+
+    def _count(self, content: Any) -> _Measure:
+        if not content:
+            return (0, "", 0)
+        tokens = _text_counter()(content)
+        if not isinstance(content, str):
+            return (tokens, "", 0)
+        return (tokens, language_bucket(content), len(content))
+
+    def _add(self, count: _Measure, sign: int) -> None:
+        tokens, bucket, chars = count
+        self._tokens += sign * tokens
+        if chars:
+            total, quarters = self._tally.get(bucket, (0, 0))
+            self._tally[bucket] = (total + sign * chars, quarters + sign * (chars // 4))
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    @property
+    def messages(self) -> List[Dict[str, Any]]:
+        """The messages to send, system prompt first."""
+        history = list(self._history)
+        if self._system is not None:
+            history.insert(0, {"role": "system", "content": self._system})
+        return history
+
+    @property
+    def system(self) -> Optional[str]:
+        """The current system prompt, if any."""
+        return self._system
+
+    def set_system(self, content: Optional[str]) -> None:
+        """
+        Replace (or with None, remove) the system prompt.
+
+        Only the new prompt is counted; the history is left untouched.
+
+        Args:
+            content: The new system prompt
+        """
+        self._system = content
+        self._add(self._system_count, -1)
+        self._system_count = self._count(content)
+        self._add(self._system_count, 1)
+
+    def append(self, role: str, content: Optional[str], **fields: Any) -> None:
+        """
+        Add a message to the end of the history.
+
+        Args:
+            role: The message role (e.g., "user", "assistant", "tool")
+            content: The message text
+            **fields: Extra message fields (e.g., name, tool_call_id)
+        """
+        message = {"role": role, "content": content, **fields}
+        count = self._count(content)
+        self._history.append(message)
+        self._counts.append(count)
+        self._add(count, 1)
+
+    def extend(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Add several message dictionaries to the history.
+
+        A leading system message becomes the system prompt.
+
+        Args:
+            messages: Message dictionaries with role and content
+        """
+        for message in messages:
+            fields = dict(message)
+            role = fields.pop("role")
+            content = fields.pop("content", None)
+            if role == "system" and not self._history and not fields:
+                self.set_system(content)
+            else:
+                self.append(role, content, **fields)
+
+    def drop_oldest(self, count: int = 1) -> int:
+        """
+        Remove the oldest history messages (the system prompt is kept).
+
+        Args:
+            count: Number of messages to remove
+
+        Returns:
+            The number of messages removed
+        """
+        removed = 0
+        while removed < count and self._history:
+            self._history.popleft()
+            self._add(self._counts.popleft(), -1)
+            removed += 1
+        return removed
+
+    def truncate(self, max_input_tokens: int) -> int:
+        """
+        Drop the oldest messages until the projected input fits a budget.
+
+        Args:
+            max_input_tokens: Maximum projected input tokens, overhead included
+
+        Returns:
+            The number of messages removed
+        """
+        removed = 0
+        while self._history and self.projected_input_tokens > max_input_tokens:
+            removed += self.drop_oldest()
+        return removed
+
+    @property
+    def projected_input_tokens(self) -> int:
+        """Estimated input tokens of the next request, overhead included."""
+        calibrator = _calibrator(self.model)
+        if calibrator is not None:
+            return calibrator.tokens(self.model, self._tally)
+        return _with_overhead(self._tokens)
+
+    def projected_cost(self, max_tokens: Optional[int] = None) -> float:
+        """
+        Estimate the cost of sending the current messages.
+
+        Args:
+            max_tokens: Maximum number of output tokens (defaults to the
+                conversation's max_tokens)
+
+        Returns:
+            Estimated cost in USD as a float
+        """
+        if max_tokens is None:
+            max_tokens = self.max_tokens
+        return engine.estimate_usd(
+            _compiled_rates(self.model), self.projected_input_tokens, max_tokens
+        )
+
+    def record(self, response: Any, append_reply: bool = True) -> CostResult:
+        """
+        Record the actual cost of a completed response.
+
+        Args:
+            response: The Chat Completions or Responses API object of this turn
+            append_reply: Whether to append the assistant reply to the history
+
+        Returns:
+            The response's cost breakdown, as returned by `ctoken`
+
+        Raises:
+            CostEstimateError: If the response cannot be costed
+        """
+        result = ctoken(response)
+        self.ledger.add(
+            response.model,
+            result.prompt_tokens,
+            result.completion_tokens,
+            result.cached_tokens,
+        )
+        if append_reply:
+            content = _reply_content(response)
+            if content is not None:
+                self.append("assistant", content)
+        return result
+
+    @property
+    def actual_cost(self) -> float:
+        """The exact cost of every recorded response, in USD."""
+        return float(self.ledger.total())
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Get the projection and the recorded totals.
+
+        Returns:
+            Dict with the message count, projected input tokens and the
+            `CostLedger.report()` of recorded responses
+        """
+        return {
+            "messages": len(self._history) + (self._system is not None),
+            "projected_input_tokens": self.projected_input_tokens,
+            "recorded": self.ledger.report(),
+        }
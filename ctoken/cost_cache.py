@@ -0,0 +1,217 @@
+"""
+Persistent cost cache keyed by response id.
+
+Re-costing the same responses (retried log shippers, replayed queues,
+overlapping exports) repeats the same work and, worse, double counts spend.
+`CostCache` stores each costed response in SQLite under its ``response.id``
+and a hash of the pricing table of the provider shard that prices it, so
+costing an already-seen response is a single primary-key read and callers are
+told it is a duplicate.
+
+Register a cache with `set_cost_cache` to have `ctoken()` use it:
+
+    set_cost_cache(CostCache("costs.sqlite3"))
+    ctoken(response)  # Priced and stored
+    ctoken(response)  # One indexed read
+"""
+
+import os
+import threading
+from typing import Any, Optional, Tuple, Union
+
+from . import engine
+from .calculation import CostResult
+from .providers import provider_of
+from .response_parser import extract_usage
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS costs (
+    response_id TEXT NOT NULL,
+    pricing TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    uncached_cost INTEGER NOT NULL,
+    cached_cost INTEGER NOT NULL,
+    output_cost INTEGER NOT NULL,
+    PRIMARY KEY (response_id, pricing)
+) WITHOUT ROWID
+"""
+
+# Every stored pricing of one response: a prefix scan of the primary key
+_SELECT = (
+    "SELECT pricing, prompt_tokens, completion_tokens, cached_tokens,"
+    " uncached_cost, cached_cost, output_cost"
+    " FROM costs WHERE response_id = ?"
+)
+
+_INSERT = "INSERT OR IGNORE INTO costs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+_cost_cache: Optional["CostCache"] = None
+
+
+class CostCache:
+    """
+    SQLite-backed store of response costs, keyed by response id.
+
+    Costs are stored as exact picodollar amounts, so a cached result is
+    identical to pricing the response again. Entries are keyed by the hash of
+    the table that prices the response's model as well (the OpenAI table, the
+    Anthropic shard's, ...): after prices change, responses are priced afresh,
+    but a response seen under earlier prices is still reported as a duplicate.
+
+    Args:
+        path: Database file, or ":memory:" for a process-local cache
+
+    Attributes:
+        duplicates: Number of responses answered from the cache because
+            they were seen before
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"] = ":memory:") -> None:
+        self.path = os.fspath(path)
+        self.duplicates = 0
+
+        # Imported here so that importing ctoken does not pull in sqlite3
+        import sqlite3
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+
+    def cost(self, response: Any) -> Tuple[CostResult, bool]:
+        """
+        Get the cost of a response, from the cache when it was seen before.
+
+        Responses without an ``id`` are priced but not stored.
+
+        Args:
+            response: The OpenAI API response object
+
+        Returns:
+            Tuple of (cost breakdown, whether the response was seen before)
+
+        Raises:
+            AttributeError: If the response has no usage information
+            ValueError: If the model is not found in pricing data
+        """
+        response_id = getattr(response, "id", None)
+        if not isinstance(response_id, str) or not response_id:
+            return self._price(response)[0], False
+
+        pricing = provider_of(response.model).pricing_hash()
+        with self._lock:
+            rows = self._conn.execute(_SELECT, (response_id,)).fetchall()
+            for row in rows:
+                if row[0] == pricing:
+                    self.duplicates += 1
+                    return engine.result_from_picodollars(*row[1:]), True
+
+        result, amounts = self._price(response)
+        with self._lock:
+            inserted = self._conn.execute(
+                _INSERT,
+                (
+                    response_id,
+                    pricing,
+                    response.model,
+                    result.prompt_tokens,
+                    result.completion_tokens,
+                    result.cached_tokens,
+                    *amounts,
+                ),
+            ).rowcount
+            # Seen under other prices, or stored by another thread meanwhile
+            duplicate = bool(rows) or not inserted
+            if duplicate:
+                self.duplicates += 1
+        return result, duplicate
+
+    @staticmethod
+    def _price(response: Any) -> Tuple[CostResult, Tuple[int, int, int]]:
+        usage = extract_usage(response)
+        # Stands in for ctoken(), so it resolves models the same way
+        rates = engine.model_rates(response.model, fuzzy=True)
+        if rates is None:
+            raise ValueError(f"Model '{response.model}' not found in pricing data")
+        prompt, completion, cached = (
+            usage["prompt_tokens"],
+            usage["completion_tokens"],
+            usage["cached_tokens"],
+        )
+        amounts = engine.price(
+            rates,
+            prompt,
+            completion,
+            cached,
+            usage.get("cache_write_tokens", 0),
+            usage.get("cache_write_1h_tokens", 0),
+        )
+        result = engine.result_from_picodollars(prompt, completion, cached, *amounts)
+        return result, amounts
+
+    def accumulate(self, response: Any, sink: Any) -> bool:
+        """
+        Add a response's cost to a ledger unless it was already seen.
+
+        Args:
+            response: The OpenAI API response object
+            sink: The `CostLedger` receiving the costs
+
+        Returns:
+            True if the response was added, False if it was a duplicate
+        """
+        duplicate = self.cost(response)[1]
+        if duplicate:
+            return False
+        # The usage rather than the result, which does not keep cache writes
+        sink.add_usage(response.model, extract_usage(response))
+        return True
+
+    def __contains__(self, response_id: object) -> bool:
+        """Whether a response id was seen, under any pricing data."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM costs WHERE response_id = ? LIMIT 1", (response_id,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(DISTINCT response_id) FROM costs"
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "CostCache":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def set_cost_cache(cache: Optional[CostCache]) -> None:
+    """
+    Register the cost cache used by `ctoken()`.
+
+    Args:
+        cache: The cache to consult and fill, or None to price every
+            response afresh
+    """
+    global _cost_cache
+    _cost_cache = cache
+
+
+def get_cost_cache() -> Optional[CostCache]:
+    """Get the registered cost cache, if any."""
+    return _cost_cache
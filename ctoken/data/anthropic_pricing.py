@@ -0,0 +1,94 @@
+"""
+Pricing data for Anthropic models.
+
+This module contains the pricing data for Anthropic's Claude models in the
+same format as pricing_data.py. It is imported by the provider registry the
+first time a Claude model is priced, not when ctoken is imported.
+
+Cache reads use cached_input_price. Cache writes are billed at
+cache_write_price (5-minute writes, 1.25 times the input price) and
+cache_write_1h_price (1-hour writes, twice the input price).
+"""
+
+# Pricing data in dollars per 1M tokens
+# (input/cached_input/output/cache_write/cache_write_1h)
+PRICING_DATA = {
+    # Format: (model_name, version): {"input_price": float, ...}
+    ("claude-opus-4-5", "latest"): {
+        "input_price": 5.0000,
+        "cached_input_price": 0.5000,
+        "output_price": 25.0000,
+        "cache_write_price": 6.2500,
+        "cache_write_1h_price": 10.0000,
+    },
+    ("claude-opus-4-1", "latest"): {
+        "input_price": 15.0000,
+        "cached_input_price": 1.5000,
+        "output_price": 75.0000,
+        "cache_write_price": 18.7500,
+        "cache_write_1h_price": 30.0000,
+    },
+    ("claude-opus-4", "latest"): {
+        "input_price": 15.0000,
+        "cached_input_price": 1.5000,
+        "output_price": 75.0000,
+        "cache_write_price": 18.7500,
+        "cache_write_1h_price": 30.0000,
+    },
+    ("claude-sonnet-4-5", "latest"): {
+        "input_price": 3.0000,
+        "cached_input_price": 0.3000,
+        "output_price": 15.0000,
+        "cache_write_price": 3.7500,
+        "cache_write_1h_price": 6.0000,
+    },
+    ("claude-sonnet-4", "latest"): {
+        "input_price": 3.0000,
+        "cached_input_price": 0.3000,
+        "output_price": 15.0000,
+        "cache_write_price": 3.7500,
+        "cache_write_1h_price": 6.0000,
+    },
+    ("claude-haiku-4-5", "latest"): {
+        "input_price": 1.0000,
+        "cached_input_price": 0.1000,
+        "output_price": 5.0000,
+        "cache_write_price": 1.2500,
+        "cache_write_1h_price": 2.0000,
+    },
+    ("claude-3-7-sonnet", "latest"): {
+        "input_price": 3.0000,
+        "cached_input_price": 0.3000,
+        "output_price": 15.0000,
+        "cache_write_price": 3.7500,
+        "cache_write_1h_price": 6.0000,
+    },
+    ("claude-3-5-sonnet", "latest"): {
+        "input_price": 3.0000,
+        "cached_input_price": 0.3000,
+        "output_price": 15.0000,
+        "cache_write_price": 3.7500,
+        "cache_write_1h_price": 6.0000,
+    },
+    ("claude-3-5-haiku", "latest"): {
+        "input_price": 0.8000,
+        "cached_input_price": 0.0800,
+        "output_price": 4.0000,
+        "cache_write_price": 1.0000,
+        "cache_write_1h_price": 1.6000,
+    },
+    ("claude-3-opus", "latest"): {
+        "input_price": 15.0000,
+        "cached_input_price": 1.5000,
+        "output_price": 75.0000,
+        "cache_write_price": 18.7500,
+        "cache_write_1h_price": 30.0000,
+    },
+    ("claude-3-haiku", "latest"): {
+        "input_price": 0.2500,
+        "cached_input_price": 0.0300,
+        "output_price": 1.2500,
+        "cache_write_price": 0.3000,
+        "cache_write_1h_price": 0.5000,
+    },
+}
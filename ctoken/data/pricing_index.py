@@ -0,0 +1,58 @@
+"""
+Precomputed pricing resolution index.
+
+Auto-generated by ctoken.pricing_compiler from the same source as
+pricing_data.py; do not edit by hand.
+"""
+
+# Content hash of the PRICING_DATA table this index was compiled from
+PRICING_HASH = "2913ffa1576af17c"
+
+# Normalized full model string -> PRICING_DATA key
+ALIASES = {
+    "codex-mini-latest": ("codex-mini-latest", "latest"),
+    "computer-use-preview": ("computer-use-preview", "latest"),
+    "gpt-4.1": ("gpt-4.1", "latest"),
+    "gpt-4.1-mini": ("gpt-4.1-mini", "latest"),
+    "gpt-4.1-nano": ("gpt-4.1-nano", "latest"),
+    "gpt-4o": ("gpt-4o", "latest"),
+    "gpt-4o-2024-05-13": ("gpt-4o-2024-05-13", "latest"),
+    "gpt-4o-audio-preview": ("gpt-4o-audio-preview", "latest"),
+    "gpt-4o-mini": ("gpt-4o-mini", "latest"),
+    "gpt-4o-mini-audio-preview": ("gpt-4o-mini-audio-preview", "latest"),
+    "gpt-4o-mini-realtime-preview": ("gpt-4o-mini-realtime-preview", "latest"),
+    "gpt-4o-mini-search-preview": ("gpt-4o-mini-search-preview", "latest"),
+    "gpt-4o-realtime-preview": ("gpt-4o-realtime-preview", "latest"),
+    "gpt-4o-search-preview": ("gpt-4o-search-preview", "latest"),
+    "gpt-5": ("gpt-5", "latest"),
+    "gpt-5-chat-latest": ("gpt-5-chat-latest", "latest"),
+    "gpt-5-codex": ("gpt-5-codex", "latest"),
+    "gpt-5-mini": ("gpt-5-mini", "latest"),
+    "gpt-5-nano": ("gpt-5-nano", "latest"),
+    "gpt-5-pro": ("gpt-5-pro", "latest"),
+    "gpt-5-search-api": ("gpt-5-search-api", "latest"),
+    "gpt-5.1": ("gpt-5.1", "latest"),
+    "gpt-5.1-chat-latest": ("gpt-5.1-chat-latest", "latest"),
+    "gpt-5.1-codex": ("gpt-5.1-codex", "latest"),
+    "gpt-5.1-codex-mini": ("gpt-5.1-codex-mini", "latest"),
+    "gpt-audio": ("gpt-audio", "latest"),
+    "gpt-audio-mini": ("gpt-audio-mini", "latest"),
+    "gpt-image-1": ("gpt-image-1", "latest"),
+    "gpt-image-1-mini": ("gpt-image-1-mini", "latest"),
+    "gpt-realtime": ("gpt-realtime", "latest"),
+    "gpt-realtime-mini": ("gpt-realtime-mini", "latest"),
+    "o1": ("o1", "latest"),
+    "o1-mini": ("o1-mini", "latest"),
+    "o1-pro": ("o1-pro", "latest"),
+    "o3": ("o3", "latest"),
+    "o3-deep-research": ("o3-deep-research", "latest"),
+    "o3-mini": ("o3-mini", "latest"),
+    "o3-pro": ("o3-pro", "latest"),
+    "o4-mini": ("o4-mini", "latest"),
+    "o4-mini-deep-research": ("o4-mini-deep-research", "latest"),
+}
+
+# Base model name -> date-sorted ((date, PRICING_DATA key), ...)
+VERSIONS = {
+    "gpt-4o": (("2024-05-13", ("gpt-4o-2024-05-13", "latest")),),
+}
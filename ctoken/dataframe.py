@@ -0,0 +1,233 @@
+"""
+Vectorized costing of pandas DataFrames.
+
+Importing this module registers a ``df.ctoken`` accessor (requires pandas:
+``pip install ctoken[pandas]``). Instead of calling a cost function per row
+through ``df.apply``, the accessor maps the model column to categorical codes,
+resolves each distinct model's compiled rates once, gathers them per row with
+one NumPy indexing pass and prices every column in integer picodollars, so
+the results are exactly those of `ctoken()`.
+
+Example:
+    import ctoken.dataframe  # noqa: F401 (registers df.ctoken)
+
+    costs = df.ctoken.costs()  # prompt_cost_uncached ... total_cost columns
+    df = df.join(costs)
+    print(df.ctoken.ledger().report()["total_cost"])
+"""
+
+from typing import Any, List, Optional, Tuple
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError as e:  # pragma: no cover - depends on the environment
+    raise ImportError(
+        "The DataFrame accessor requires pandas: pip install ctoken[pandas]"
+    ) from e
+
+from . import engine
+from .engine import PICODOLLARS_PER_USD
+from .ledger import CostLedger
+from .token_estimator import CostEstimateError
+
+# Cost columns returned by `costs`, in USD
+COST_COLUMNS = (
+    "prompt_cost_uncached",
+    "prompt_cost_cached",
+    "completion_cost",
+    "total_cost",
+)
+
+ERRORS = ("raise", "coerce")
+
+
+@pd.api.extensions.register_dataframe_accessor("ctoken")
+class CostAccessor:
+    """
+    ``df.ctoken``: exact, vectorized costs of a usage DataFrame.
+
+    The frame needs a model column and prompt and completion token columns;
+    a cached token column is optional. Missing token counts are treated as 0.
+    Picodollar products are int64, which holds any single request's cost
+    (up to about 9.2 million USD).
+    """
+
+    def __init__(self, df: "pd.DataFrame") -> None:
+        self._df = df
+
+    def _models(self, column: str) -> Tuple["np.ndarray", List[Any]]:
+        """Map the model column to codes (-1 for missing) and distinct models."""
+        series = self._df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.cat.codes.to_numpy(), list(series.cat.categories)
+        codes, uniques = pd.factorize(series)
+        return codes, list(uniques)
+
+    @staticmethod
+    def _rate_table(
+        models: List[Any], errors: str
+    ) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Resolve every distinct model once.
+
+        Returns (rates, priced) arrays with one row per model plus a last
+        row, reached by code -1, for missing models.
+        """
+        rates = np.zeros((len(models) + 1, 3), dtype=np.int64)
+        priced = np.zeros(len(models) + 1, dtype=bool)
+        unknown = []
+        for index, model in enumerate(models):
+            try:
+                model_rates = engine.model_rates(str(model))
+            except ValueError:
+                model_rates = None
+            if model_rates is None:
+                unknown.append(str(model))
+                continue
+            rates[index] = model_rates[:3]
+            priced[index] = True
+
+        if unknown and errors == "raise":
+            raise CostEstimateError(
+                f"No pricing data found for models: {', '.join(sorted(unknown))}"
+            )
+        return rates, priced
+
+    def _tokens(self, column: Optional[str]) -> "np.ndarray":
+        if column is None or column not in self._df:
+            return np.zeros(len(self._df), dtype=np.int64)
+        return self._df[column].to_numpy(dtype=np.int64, na_value=0)
+
+    def _picodollars(
+        self,
+        model: str,
+        prompt_tokens: str,
+        completion_tokens: str,
+        cached_tokens: Optional[str],
+        errors: str,
+    ) -> Tuple[Any, ...]:
+        if errors not in ERRORS:
+            raise ValueError(f"errors must be one of {ERRORS}, got {errors!r}")
+        for column in (model, prompt_tokens, completion_tokens):
+            if column not in self._df:
+                raise KeyError(f"DataFrame has no {column!r} column")
+
+        codes, models = self._models(model)
+        table, priced = self._rate_table(models, errors)
+        if errors == "raise" and (codes < 0).any():
+            raise CostEstimateError(f"Column {model!r} has missing models")
+
+        prompt = self._tokens(prompt_tokens)
+        completion = self._tokens(completion_tokens)
+        cached = self._tokens(cached_tokens)
+        rates = table[codes]  # One gather of (input, cached, output) rates
+
+        uncached_cost = np.maximum(prompt - cached, 0) * rates[:, 0]
+        cached_cost = cached * rates[:, 1]
+        output_cost = completion * rates[:, 2]
+        return (
+            codes,
+            models,
+            priced[codes],
+            prompt,
+            completion,
+            cached,
+            uncached_cost,
+            cached_cost,
+            output_cost,
+        )
+
+    def costs(
+        self,
+        model: str = "model",
+        prompt_tokens: str = "prompt_tokens",
+        completion_tokens: str = "completion_tokens",
+        cached_tokens: Optional[str] = "cached_tokens",
+        errors: str = "raise",
+    ) -> "pd.DataFrame":
+        """
+        Price every row.
+
+        Args:
+            model: Name of the model column
+            prompt_tokens: Name of the input token column (including cached
+                tokens)
+            completion_tokens: Name of the output token column
+            cached_tokens: Name of the cached input token column (optional)
+            errors: "raise" to raise on unknown or missing models, "coerce"
+                to leave their costs NaN
+
+        Returns:
+            DataFrame with the same index and one float USD column per entry
+            of COST_COLUMNS
+
+        Raises:
+            CostEstimateError: If a model cannot be priced and errors="raise"
+            KeyError: If a required column is missing
+        """
+        _, _, priced, _, _, _, uncached_cost, cached_cost, output_cost = (
+            self._picodollars(
+                model, prompt_tokens, completion_tokens, cached_tokens, errors
+            )
+        )
+        total_cost = uncached_cost + cached_cost + output_cost
+
+        columns = {}
+        for name, picodollars in zip(
+            COST_COLUMNS, (uncached_cost, cached_cost, output_cost, total_cost)
+        ):
+            # Exact int64 amounts divided once, like the scalar engine
+            usd = picodollars / PICODOLLARS_PER_USD
+            usd[~priced] = np.nan
+            columns[name] = usd
+        return pd.DataFrame(columns, index=self._df.index)
+
+    def ledger(
+        self,
+        model: str = "model",
+        prompt_tokens: str = "prompt_tokens",
+        completion_tokens: str = "completion_tokens",
+        cached_tokens: Optional[str] = "cached_tokens",
+        errors: str = "raise",
+    ) -> CostLedger:
+        """
+        Sum the rows into an exact per-model CostLedger.
+
+        Takes the same arguments as `costs`; with errors="coerce", rows that
+        cannot be priced are left out.
+
+        Returns:
+            A CostLedger holding one subtotal per model
+        """
+        (
+            codes,
+            models,
+            priced,
+            prompt,
+            completion,
+            cached,
+            uncached_cost,
+            cached_cost,
+            output_cost,
+        ) = self._picodollars(
+            model, prompt_tokens, completion_tokens, cached_tokens, errors
+        )
+
+        frame = pd.DataFrame(
+            {
+                "requests": np.ones(len(codes), dtype=np.int64),
+                "prompt": prompt,
+                "completion": completion,
+                "cached": cached,
+                "uncached_cost": uncached_cost,
+                "cached_cost": cached_cost,
+                "output_cost": output_cost,
+            }
+        )[priced]
+        totals = frame.groupby(codes[priced]).sum()
+
+        ledger = CostLedger()
+        for code, row in zip(totals.index, totals.itertuples(index=False)):
+            ledger.add_subtotal(str(models[code]), *(int(value) for value in row))
+        return ledger
@@ -0,0 +1,396 @@
+"""
+Unified cost engine.
+
+Every cost entry point (`ctoken`, `estimate_api_cost`, `estimate_many`,
+`estimate_openai_api_cost_from_response`, `pricing_data.calculate_cost`,
+`calculate_total_cost`, the ledger and the stream meter) prices tokens here.
+A model string is resolved once per pricing table, in its provider's shard
+(see `providers`), into exact integer picodollar rates per token, and every
+call then makes one integer arithmetic pass, so the same usage costs exactly
+the same whichever function is asked.
+
+Model strings resolve strictly, through the precompiled alias and version
+index: an unknown or mistyped model has no rates. Only `ctoken()` (and the
+cost cache and stream meter that stand in for it) also tries the fuzzy
+prefix/substring match, as it always has.
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple, Type
+
+from . import pricing_data, providers
+from .calculation import CostResult
+from .response_parser import extract_model_details
+
+# Integer accounting unit: 1 picodollar (1e-12 USD)
+PICODOLLARS_PER_USD = 10**12
+
+# (input, cached input, output, 5-minute cache write, 1-hour cache write)
+# rates in picodollars per token
+Rates = Tuple[int, int, int, int, int]
+
+PricingKey = Tuple[str, str]
+
+# Resolved model strings are dropped when this many accumulate, so arbitrary
+# unknown names cannot grow the cache without bound
+_MAX_MODELS = 4096
+
+# (pricing version, pricing table, model string -> strictly resolved rates,
+# model string -> rates with the fuzzy fallback; None if unpriced), replaced
+# as a whole when the pricing data changes
+_Resolved = Dict[str, Optional[Rates]]
+_compiled: Tuple[int, Any, _Resolved, _Resolved] = (-1, None, {}, {})
+
+
+def to_picodollar_rates(rates: Dict[str, float]) -> Rates:
+    """
+    Convert per-million-token prices into exact integer picodollars per token.
+
+    Args:
+        rates: Dict containing input_price, cached_input_price and output_price
+            in USD per million tokens, and optionally cache_write_price and
+            cache_write_1h_price (both default to the input price)
+
+    Returns:
+        Tuple of (input, cached input, output, cache write, 1-hour cache
+        write) rates in picodollars per token
+
+    Raises:
+        ValueError: If a price has more than 6 decimal places
+    """
+    input_price = rates["input_price"]
+    prices = (
+        input_price,
+        rates.get("cached_input_price") or input_price,
+        rates["output_price"],
+        rates.get("cache_write_price") or input_price,
+        rates.get("cache_write_1h_price") or input_price,
+    )
+
+    result = []
+    for price in prices:
+        # USD per 1M tokens -> picodollars per token is a factor of 1e6
+        scaled = Decimal(str(price)) * 1_000_000
+        if scaled != scaled.to_integral_value():
+            raise ValueError(f"Price {price!r} cannot be represented exactly")
+        result.append(int(scaled))
+    return result[0], result[1], result[2], result[3], result[4]
+
+
+def lookup_key(
+    model_name: str,
+    model_date: str,
+    pricing: Optional[Dict[PricingKey, Dict[str, float]]] = None,
+    index: Optional[Tuple[Dict[str, PricingKey], Dict[str, Tuple]]] = None,
+    fuzzy: bool = False,
+) -> Optional[PricingKey]:
+    """
+    Find the pricing key of a parsed model name.
+
+    Uses a multi-stage lookup strategy:
+    1. Precompiled index: full versioned model name, then base model name,
+       then the newest older version of that model (see `resolve_key`)
+    2. With fuzzy, a match based on model name prefix/substring
+
+    Args:
+        model_name: Base model name (e.g., "gpt-4o-mini")
+        model_date: Version date or "latest"
+        pricing: Pricing table to search (defaults to `load_pricing()`)
+        index: The table's (aliases, versions) index (defaults to
+            `get_pricing_index(pricing)`)
+        fuzzy: Whether to fall back to the fuzzy match, which prices unknown
+            names like a neighbouring model
+
+    Returns:
+        The pricing key, or None if no pricing data matches
+    """
+    if pricing is None:
+        pricing = pricing_data.load_pricing()
+    if index is None:
+        index = pricing_data.get_pricing_index(pricing)
+
+    # Strategy 1: Indexed lookup
+    key = pricing_data.resolve_key(model_name, model_date, index)
+    if key is not None or not fuzzy:
+        return key
+
+    # Strategy 2: Fuzzy match based on prefix/substring
+    for key in pricing:
+        # Get first part of multiline model names
+        name_first_part = key[0].split("\n")[0].strip()
+
+        # Check if our model name is in the name or vice versa
+        if model_name in name_first_part or name_first_part in model_name:
+            return key
+
+    return None
+
+
+def lookup_model(
+    model: str,
+    pricing: Optional[Dict[PricingKey, Dict[str, float]]] = None,
+    index: Optional[Tuple[Dict[str, PricingKey], Dict[str, Tuple]]] = None,
+    fuzzy: bool = False,
+) -> Tuple[Optional[PricingKey], Optional[Dict[str, float]]]:
+    """
+    Find the pricing rates of a model string in its provider's shard.
+
+    Model strings of the default provider are looked up in the layered
+    pricing table (see `lookup_key`). Those of other providers (see
+    `providers.split_model`) are looked up in the provider's shard, unless
+    the layered table prices them exactly: org and per-call price sheets
+    override every provider.
+
+    Args:
+        model: The model identifier, optionally provider-prefixed
+        pricing: Layered pricing table (defaults to `load_pricing()`)
+        index: The table's (aliases, versions) index (defaults to
+            `get_pricing_index(pricing)`)
+        fuzzy: Whether to fall back to the fuzzy match (see `lookup_key`)
+
+    Returns:
+        Tuple of (key, rates): the key of the rates in the layered table, or
+        None if a provider shard priced the model; rates is None if nothing
+        matches
+
+    Raises:
+        ValueError: If the model is not a non-empty string
+    """
+    model_info = extract_model_details(model)
+    provider = providers.provider_of(model.split("\n")[0].strip())
+    return _lookup_in_shard(
+        provider,
+        model_info["model_name"],
+        model_info["model_date"],
+        pricing,
+        index,
+        fuzzy,
+    )
+
+
+def _lookup_in_shard(
+    provider: providers.Provider,
+    model_name: str,
+    model_date: str,
+    pricing: Optional[Dict[PricingKey, Dict[str, float]]] = None,
+    index: Optional[Tuple[Dict[str, PricingKey], Dict[str, Tuple]]] = None,
+    fuzzy: bool = False,
+) -> Tuple[Optional[PricingKey], Optional[Dict[str, float]]]:
+    if pricing is None:
+        pricing = pricing_data.load_pricing()
+    if provider.name == providers.DEFAULT_PROVIDER:
+        key = lookup_key(model_name, model_date, pricing, index, fuzzy)
+        return key, pricing[key] if key is not None else None
+
+    if index is None:
+        index = pricing_data.get_pricing_index(pricing)
+    key = pricing_data.resolve_key(model_name, model_date, index)
+    if key is not None:
+        return key, pricing[key]
+
+    table, shard_index = provider.load()
+    shard_key = lookup_key(model_name, model_date, table, shard_index, fuzzy)
+    return None, table[shard_key] if shard_key is not None else None
+
+
+def lookup_rates(
+    model_name: str, model_date: str, fuzzy: bool = False
+) -> Optional[Dict[str, float]]:
+    """
+    Find the pricing rates of a parsed model name (see `lookup_model`).
+
+    Args:
+        model_name: Base model name (e.g., "gpt-4o-mini")
+        model_date: Version date or "latest"
+        fuzzy: Whether to fall back to the fuzzy match (see `lookup_key`)
+
+    Returns:
+        Dict containing input_price, cached_input_price, and output_price,
+        or None if no pricing data matches
+    """
+    provider = providers.provider_of(model_name)
+    return _lookup_in_shard(provider, model_name, model_date, fuzzy=fuzzy)[1]
+
+
+def model_rates(model: str, fuzzy: bool = False) -> Optional[Rates]:
+    """
+    Get the compiled picodollar rates of a model string.
+
+    Each distinct string is parsed and resolved once; the result is reused
+    until `refresh_pricing()` runs or a different pricing table is loaded.
+    Lookups take no lock: the cache is replaced, never reset in place, so a
+    thread still resolving against an older table writes to a discarded
+    cache.
+
+    Args:
+        model: The model identifier (e.g., "gpt-4o-2024-08-06")
+        fuzzy: Whether to fall back to the fuzzy match (see `lookup_key`);
+            only `ctoken()` and its stand-ins do
+
+    Returns:
+        Tuple of (input, cached input, output) rates in picodollars per
+        token, or None if no pricing data matches the model
+
+    Raises:
+        ValueError: If the model is not a non-empty string
+    """
+    global _compiled
+
+    # Version before table (see `pricing_data.pricing_snapshot`)
+    current = pricing_data._pricing_version
+    table = pricing_data.load_pricing()
+    version, compiled_table, strict, fuzzy_matched = _compiled
+    if version != current or compiled_table is not table:
+        strict, fuzzy_matched = {}, {}
+        if current >= version:  # Never replace a newer cache with an older one
+            _compiled = (current, table, strict, fuzzy_matched)
+
+    compiled = fuzzy_matched if fuzzy else strict
+    try:
+        return compiled[model]
+    except KeyError:
+        pass
+
+    _, rates = lookup_model(model, table, fuzzy=fuzzy)
+    result = to_picodollar_rates(rates) if rates is not None else None
+
+    if len(compiled) >= _MAX_MODELS:
+        compiled.clear()
+    compiled[model] = result
+    return result
+
+
+def price(
+    rates: Rates,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    cache_write_tokens: int = 0,
+    cache_write_1h_tokens: int = 0,
+) -> Tuple[int, int, int]:
+    """
+    Price one request's token usage exactly.
+
+    Args:
+        rates: Compiled rates, as returned by `model_rates`
+        prompt_tokens: Number of input tokens (including cached ones and
+            cache writes)
+        completion_tokens: Number of output tokens
+        cached_tokens: Number of cached input tokens
+        cache_write_tokens: Number of uncached input tokens written to a
+            5-minute cache
+        cache_write_1h_tokens: Number of uncached input tokens written to a
+            1-hour cache
+
+    Returns:
+        Tuple of (uncached input, cached input, output) costs in picodollars;
+        cache writes are part of the uncached input cost
+    """
+    uncached = prompt_tokens - cached_tokens
+    uncached_cost = uncached * rates[0] if uncached > 0 else 0
+    if cache_write_tokens or cache_write_1h_tokens:
+        uncached_cost += write_premium(rates, cache_write_tokens, cache_write_1h_tokens)
+    return (
+        uncached_cost,
+        cached_tokens * rates[1],
+        completion_tokens * rates[2],
+    )
+
+
+def write_premium(
+    rates: Rates, cache_write_tokens: int, cache_write_1h_tokens: int = 0
+) -> int:
+    """
+    Get what cache writes cost beyond the input rate, in picodollars.
+
+    Cache writes are counted as uncached input tokens; this is the amount to
+    add to their cost at the input rate.
+    """
+    return cache_write_tokens * (rates[3] - rates[0]) + cache_write_1h_tokens * (
+        rates[4] - rates[0]
+    )
+
+
+def cost_result(
+    rates: Rates,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    result_type: Type[CostResult] = CostResult,
+    cache_write_tokens: int = 0,
+    cache_write_1h_tokens: int = 0,
+) -> CostResult:
+    """
+    Build the cost breakdown of one request's token usage.
+
+    Args:
+        rates: Compiled rates, as returned by `model_rates`
+        prompt_tokens: Number of input tokens (including cached ones)
+        completion_tokens: Number of output tokens
+        cached_tokens: Number of cached input tokens
+        result_type: CostResult subclass to build (e.g. EstimatedCostResult)
+        cache_write_tokens: Number of input tokens written to a 5-minute cache
+        cache_write_1h_tokens: Number of input tokens written to a 1-hour cache
+
+    Returns:
+        The cost breakdown
+    """
+    return result_from_picodollars(
+        prompt_tokens,
+        completion_tokens,
+        cached_tokens,
+        *price(
+            rates,
+            prompt_tokens,
+            completion_tokens,
+            cached_tokens,
+            cache_write_tokens,
+            cache_write_1h_tokens,
+        ),
+        result_type=result_type,
+    )
+
+
+def result_from_picodollars(
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int,
+    uncached_cost: int,
+    cached_cost: int,
+    output_cost: int,
+    result_type: Type[CostResult] = CostResult,
+) -> CostResult:
+    """
+    Build a cost breakdown from token counts and exact picodollar amounts.
+
+    Amounts stay integers until this final division, so every field is the
+    float nearest to its exact USD value.
+
+    Returns:
+        The cost breakdown
+    """
+    return result_type(
+        prompt_tokens,
+        completion_tokens,
+        prompt_tokens + completion_tokens,
+        cached_tokens,
+        uncached_cost / PICODOLLARS_PER_USD,
+        cached_cost / PICODOLLARS_PER_USD,
+        output_cost / PICODOLLARS_PER_USD,
+        (uncached_cost + cached_cost + output_cost) / PICODOLLARS_PER_USD,
+    )
+
+
+def estimate_usd(rates: Rates, input_tokens: int, output_tokens: int) -> float:
+    """
+    Get the cost in USD of uncached input and output tokens.
+
+    Args:
+        rates: Compiled rates, as returned by `model_rates`
+        input_tokens: Number of input tokens, all priced at the input rate
+        output_tokens: Number of output tokens
+
+    Returns:
+        The cost in USD as a float
+    """
+    return (input_tokens * rates[0] + output_tokens * rates[2]) / PICODOLLARS_PER_USD
@@ -0,0 +1,529 @@
+"""
+Log-bucketed histograms of per-request costs and token counts.
+
+`LogHistogram` is an HDR-style histogram of non-negative integers: values
+below 2**(precision_bits + 1) get a bucket each, and every power-of-two range
+above that is split into 2**precision_bits equal buckets. Memory is fixed by
+the precision and the largest trackable value, every recorded value is
+reported within a relative error of 2**-(precision_bits + 1), and histograms
+with the same layout merge by adding bucket counts, so per-worker histograms
+can be serialized with `to_bytes` and combined anywhere.
+
+`UsageHistograms` keeps one histogram per model for the cost (in exact
+picodollars), prompt tokens and completion tokens of each request.
+
+Example:
+    histograms = UsageHistograms()
+    for response in responses:
+        histograms.record_response(response)
+    histograms.quantiles("cost", model="gpt-4o")  # {0.5: ..., 0.99: ..., 0.999: ...}
+"""
+
+import math
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .engine import PICODOLLARS_PER_USD
+from .ledger import CostLedger
+from .response_parser import extract_usage
+
+DEFAULT_QUANTILES = (0.5, 0.99, 0.999)
+
+_MAGIC = b"CTKH"
+_VERSION = 1
+# magic, version, precision_bits, max_value, count, min, max, nonzero buckets
+_HEADER = struct.Struct("<4sBB2xQQQQQ")
+# The sum of all values can exceed 64 bits
+_TOTAL_BYTES = 16
+
+
+def _little_endian(values: "array[int]") -> "array[int]":
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class LogHistogram:
+    """
+    Fixed-memory, mergeable histogram of non-negative integers.
+
+    Not thread-safe: use one histogram per thread or process and `merge`.
+
+    Args:
+        precision_bits: Number of mantissa bits per bucket; 7 (the default)
+            bounds the relative error at 0.39%
+        max_value: Largest value that can be recorded
+
+    Raises:
+        ValueError: If precision_bits is not between 1 and 16 or max_value is
+            not positive
+    """
+
+    def __init__(self, precision_bits: int = 7, max_value: int = 2**63 - 1) -> None:
+        if not 1 <= precision_bits <= 16:
+            raise ValueError("precision_bits must be between 1 and 16")
+        if max_value < 1 or max_value >= 2**64:
+            raise ValueError("max_value must be between 1 and 2**64 - 1")
+
+        self.precision_bits = precision_bits
+        self.max_value = max_value
+        self._half = 1 << precision_bits
+        # Values below this have a bucket of their own
+        self._exact = 1 << (precision_bits + 1)
+        self._counts = array("Q", bytes(8 * (self._index(max_value) + 1)))
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self._exact:
+            return value
+        shift = value.bit_length() - self.precision_bits - 1
+        return ((shift + 1) << self.precision_bits) + (value >> shift) - self._half
+
+    def _bounds(self, index: int) -> Tuple[int, int]:
+        """Lowest and highest value of a bucket."""
+        if index < self._exact:
+            return index, index
+        shift = (index >> self.precision_bits) - 1
+        low = ((index & (self._half - 1)) + self._half) << shift
+        return low, low + (1 << shift) - 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, value: int, count: int = 1) -> None:
+        """
+        Record a value `count` times.
+
+        Raises:
+            ValueError: If the value is negative or above max_value
+        """
+        if value < 0 or value > self.max_value:
+            raise ValueError(f"Value {value} is outside [0, {self.max_value}]")
+        if value < self._exact:
+            index = value
+        else:
+            shift = value.bit_length() - self.precision_bits - 1
+            index = ((shift + 1) << self.precision_bits) + (value >> shift) - self._half
+        self._counts[index] += count
+
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += count
+        self.total += value * count
+
+    def mean(self) -> float:
+        """Exact mean of the recorded values (0.0 if empty)."""
+        return self.total / self.count if self.count else 0.0
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> List[float]:
+        """
+        Estimate several quantiles in one pass over the buckets.
+
+        Each estimate is the middle of the bucket holding the quantile's rank,
+        clamped to the recorded min and max; the lowest and highest ranks
+        return the exact min and max.
+
+        Args:
+            qs: Quantiles between 0 and 1
+
+        Returns:
+            One value per quantile (all 0.0 if the histogram is empty)
+
+        Raises:
+            ValueError: If a quantile is outside [0, 1]
+        """
+        for q in qs:
+            if not 0 <= q <= 1:
+                raise ValueError(f"Quantile {q} is outside [0, 1]")
+        if not self.count:
+            return [0.0] * len(qs)
+
+        # Only scan up to the largest recorded value
+        cumulative = list(accumulate(self._counts[: self._index(self.max) + 1]))
+        values = []
+        for q in qs:
+            rank = max(1, math.ceil(q * self.count))
+            if rank >= self.count:
+                values.append(self.max)
+            elif rank == 1:
+                values.append(self.min)
+            else:
+                low, high = self._bounds(bisect_left(cumulative, rank))
+                values.append(min(max((low + high) / 2, self.min), self.max))
+        return values
+
+    def quantile(self, q: float) -> float:
+        """Estimate one quantile; see `quantiles`."""
+        return self.quantiles((q,))[0]
+
+    def _check_layout(self, other: "LogHistogram") -> None:
+        if (other.precision_bits, other.max_value) != (
+            self.precision_bits,
+            self.max_value,
+        ):
+            raise ValueError("Histograms with different layouts cannot be merged")
+
+    def merge(self, other: "LogHistogram") -> None:
+        """
+        Add another histogram's counts to this one.
+
+        Raises:
+            ValueError: If the histograms have different precision or max_value
+        """
+        self._check_layout(other)
+        if not other.count:
+            return
+        counts = self._counts
+        for index, count in enumerate(other._counts[: other._index(other.max) + 1]):
+            if count:
+                counts[index] += count
+        self.min = min(self.min, other.min) if self.count else other.min
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def to_bytes(self) -> bytes:
+        """Serialize the histogram; only non-empty buckets are stored."""
+        indexes = array("Q")
+        counts = array("Q")
+        for index, count in enumerate(self._counts):
+            if count:
+                indexes.append(index)
+                counts.append(count)
+        header = _HEADER.pack(
+            _MAGIC,
+            _VERSION,
+            self.precision_bits,
+            self.max_value,
+            self.count,
+            self.min,
+            self.max,
+            len(indexes),
+        )
+        return b"".join(
+            (
+                header,
+                self.total.to_bytes(_TOTAL_BYTES, "little"),
+                _little_endian(indexes).tobytes(),
+                _little_endian(counts).tobytes(),
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LogHistogram":
+        """
+        Rebuild a histogram serialized with `to_bytes`.
+
+        Raises:
+            ValueError: If the data is not a serialized histogram
+        """
+        try:
+            magic, version, bits, max_value, count, low, high, buckets = (
+                _HEADER.unpack_from(data)
+            )
+        except struct.error as e:
+            raise ValueError("Data is too short for a histogram") from e
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Data is not a serialized histogram")
+        offset = _HEADER.size + _TOTAL_BYTES
+        if len(data) != offset + 16 * buckets:
+            raise ValueError("Serialized histogram has the wrong length")
+
+        histogram = cls(bits, max_value)
+        indexes = array("Q", data[offset : offset + 8 * buckets])
+        counts = array("Q", data[offset + 8 * buckets :])
+        try:
+            for index, bucket_count in zip(
+                _little_endian(indexes), _little_endian(counts)
+            ):
+                histogram._counts[index] = bucket_count
+        except IndexError as e:
+            raise ValueError("Serialized histogram has an invalid bucket") from e
+        histogram.count, histogram.min, histogram.max = count, low, high
+        histogram.total = int.from_bytes(data[_HEADER.size : offset], "little")
+        return histogram
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LogHistogram):
+            return NotImplemented
+        return (
+            self.precision_bits == other.precision_bits
+            and self.max_value == other.max_value
+            and self.count == other.count
+            and self.total == other.total
+            and self.min == other.min
+            and self.max == other.max
+            and self._counts == other._counts
+        )
+
+
+# Metrics kept per model, in the order of each model's histograms
+METRICS = ("cost", "prompt_tokens", "completion_tokens")
+
+_NAME = struct.Struct("<H")
+_BLOB = struct.Struct("<I")
+
+
+def _label(q: float) -> str:
+    """Name a quantile like "p50", "p99" or "p999"."""
+    return "p" + f"{q * 100:g}".replace(".", "")
+
+
+class UsageHistograms:
+    """
+    Per-model histograms of request cost, prompt tokens and completion tokens.
+
+    Costs are recorded in exact integer picodollars and reported in USD.
+
+    Args:
+        precision_bits: Histogram precision (see `LogHistogram`)
+    """
+
+    def __init__(self, precision_bits: int = 7) -> None:
+        self.precision_bits = precision_bits
+        self._models: Dict[str, Tuple[LogHistogram, ...]] = {}
+        self._pricer = CostLedger()
+
+    def _histograms(self, model: str) -> Tuple[LogHistogram, ...]:
+        histograms = self._models.get(model)
+        if histograms is None:
+            histograms = self._models[model] = tuple(
+                LogHistogram(self.precision_bits) for _ in METRICS
+            )
+        return histograms
+
+    def _record(
+        self, model: str, cost: int, prompt_tokens: int, completion_tokens: int
+    ) -> None:
+        cost_histogram, prompt, completion = self._histograms(model)
+        cost_histogram.record(cost)
+        prompt.record(prompt_tokens)
+        completion.record(completion_tokens)
+
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        cache_write_1h_tokens: int = 0,
+    ) -> None:
+        """
+        Record one request's token usage and its exact cost.
+
+        Args:
+            model: The model identifier
+            prompt_tokens: Number of input tokens (including cached ones)
+            completion_tokens: Number of output tokens
+            cached_tokens: Number of cached input tokens
+            cache_write_tokens: Number of input tokens written to a 5-minute
+                prompt cache
+            cache_write_1h_tokens: Number of input tokens written to a 1-hour
+                prompt cache
+
+        Raises:
+            CostEstimateError: If no pricing data can be found for the model
+        """
+        cost = sum(
+            self._pricer.price(
+                model,
+                prompt_tokens,
+                completion_tokens,
+                cached_tokens,
+                cache_write_tokens,
+                cache_write_1h_tokens,
+            )
+        )
+        self._record(model, cost, prompt_tokens, completion_tokens)
+
+    def record_response(self, response: Any) -> None:
+        """
+        Record an OpenAI API response (Chat Completions or Responses API).
+
+        Args:
+            response: The OpenAI API response object
+        """
+        usage = extract_usage(response)
+        self.record(
+            response.model,
+            usage["prompt_tokens"],
+            usage["completion_tokens"],
+            usage["cached_tokens"],
+            usage.get("cache_write_tokens", 0),
+            usage.get("cache_write_1h_tokens", 0),
+        )
+
+    def record_result(self, model: str, result: Mapping[str, Any]) -> None:
+        """
+        Record a `ctoken()` result.
+
+        Args:
+            model: The model identifier
+            result: Mapping with total_cost, prompt_tokens and completion_tokens
+        """
+        self._record(
+            model,
+            round(result["total_cost"] * PICODOLLARS_PER_USD),
+            result["prompt_tokens"],
+            result["completion_tokens"],
+        )
+
+    def models(self) -> List[str]:
+        """Models with recorded requests."""
+        return list(self._models)
+
+    def histogram(self, metric: str, model: Optional[str] = None) -> LogHistogram:
+        """
+        Get the histogram of a metric for one model, or merged over all models.
+
+        Args:
+            metric: One of "cost" (picodollars), "prompt_tokens" or
+                "completion_tokens"
+            model: The model identifier (all models if None)
+
+        Raises:
+            ValueError: If the metric is unknown
+        """
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}, got {metric!r}")
+        position = METRICS.index(metric)
+        if model is not None:
+            histograms = self._models.get(model)
+            if histograms is None:
+                return LogHistogram(self.precision_bits)
+            return histograms[position]
+
+        merged = LogHistogram(self.precision_bits)
+        for histograms in self._models.values():
+            merged.merge(histograms[position])
+        return merged
+
+    def quantiles(
+        self,
+        metric: str,
+        qs: Sequence[float] = DEFAULT_QUANTILES,
+        model: Optional[str] = None,
+    ) -> Dict[float, float]:
+        """
+        Estimate quantiles of a metric; costs are returned in USD.
+
+        Args:
+            metric: One of "cost", "prompt_tokens" or "completion_tokens"
+            qs: Quantiles between 0 and 1
+            model: The model identifier (all models if None)
+
+        Returns:
+            Dict mapping each quantile to its estimate
+        """
+        values = self.histogram(metric, model).quantiles(qs)
+        if metric == "cost":
+            values = [value / PICODOLLARS_PER_USD for value in values]
+        return dict(zip(qs, values))
+
+    def report(
+        self, qs: Sequence[float] = DEFAULT_QUANTILES
+    ) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Get quantiles of every metric for every model.
+
+        Returns:
+            Dict mapping model to metric to {"p50": ..., "p99": ..., ...}
+        """
+        return {
+            model: {
+                metric: {
+                    _label(q): value
+                    for q, value in self.quantiles(metric, qs, model).items()
+                }
+                for metric in METRICS
+            }
+            for model in self._models
+        }
+
+    def merge(self, other: "UsageHistograms") -> None:
+        """
+        Add another set of histograms (e.g. from another worker) to this one.
+
+        Raises:
+            ValueError: If the histograms have different precision
+        """
+        for model, histograms in other._models.items():
+            for mine, theirs in zip(self._histograms(model), histograms):
+                mine.merge(theirs)
+
+    def to_bytes(self) -> bytes:
+        """Serialize every model's histograms."""
+        parts = [_BLOB.pack(len(self._models))]
+        for model, histograms in self._models.items():
+            name = model.encode("utf-8")
+            parts.append(_NAME.pack(len(name)))
+            parts.append(name)
+            for histogram in histograms:
+                blob = histogram.to_bytes()
+                parts.append(_BLOB.pack(len(blob)))
+                parts.append(blob)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "UsageHistograms":
+        """
+        Rebuild histograms serialized with `to_bytes`.
+
+        Raises:
+            ValueError: If the data is not serialized histograms
+        """
+        try:
+            (models,) = _BLOB.unpack_from(data)
+            offset = _BLOB.size
+            result: Optional[UsageHistograms] = None
+            for _ in range(models):
+                (size,) = _NAME.unpack_from(data, offset)
+                offset += _NAME.size
+                model = data[offset : offset + size].decode("utf-8")
+                offset += size
+                histograms = []
+                for _ in METRICS:
+                    (size,) = _BLOB.unpack_from(data, offset)
+                    offset += _BLOB.size
+                    histograms.append(
+                        LogHistogram.from_bytes(data[offset : offset + size])
+                    )
+                    offset += size
+                if result is None:
+                    result = cls(histograms[0].precision_bits)
+                result._models[model] = tuple(histograms)
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError("Data is not serialized usage histograms") from e
+        if offset != len(data):
+            raise ValueError("Serialized usage histograms have trailing data")
+        return result if result is not None else cls()
+
+    @classmethod
+    def merged(cls, blobs: Iterable[bytes]) -> "UsageHistograms":
+        """
+        Merge histograms serialized by several workers.
+
+        Args:
+            blobs: Outputs of `to_bytes`
+
+        Returns:
+            The combined histograms
+        """
+        result: Optional[UsageHistograms] = None
+        for blob in blobs:
+            histograms = cls.from_bytes(blob)
+            if result is None:
+                result = histograms
+            else:
+                result.merge(histograms)
+        return result if result is not None else cls()
@@ -0,0 +1,429 @@
+"""
+Exact cost accumulation.
+
+This module provides an accumulator whose running totals never drift from
+provider invoices. Rates are converted once per model to integer picodollars
+per token, every record adds plain integers, and amounts are only converted
+to Decimal and rounded when a report is produced.
+"""
+
+import threading
+import weakref
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+from . import engine, pricing_data
+from .calculation import format_usd
+from .engine import PICODOLLARS_PER_USD, to_picodollar_rates  # noqa: F401 (re-export)
+from .providers import provider_of
+from .response_parser import extract_usage
+from .token_estimator import CostEstimateError
+
+_PICO = Decimal(1) / PICODOLLARS_PER_USD
+
+# Indexes into a per-model subtotal row
+_REQUESTS = 0
+_PROMPT = 1
+_COMPLETION = 2
+_CACHED = 3
+_UNCACHED_COST = 4
+_CACHED_COST = 5
+_OUTPUT_COST = 6
+_ROW_SIZE = 7
+
+
+class _Owner:
+    """Dies with the thread-local storage of the thread it is stored in."""
+
+    __slots__ = ("__weakref__",)
+
+
+def _add_rows(into: Dict[str, List[int]], rows: Dict[str, List[int]]) -> None:
+    """Add per-model rows into others, copying the rows new to ``into``."""
+    # Copy the items: the owning thread may still be adding models
+    for model, row in list(rows.items()):
+        merged = into.get(model)
+        if merged is None:
+            into[model] = list(row)
+        else:
+            for i, value in enumerate(row):
+                merged[i] += value
+
+
+def _retire(ref: "weakref.ref[CostLedger]", rows: Dict[str, List[int]]) -> None:
+    """Fold the rows of an exited thread into its ledger's retired rows."""
+    ledger = ref()
+    if ledger is None:
+        return
+    retired: Dict[str, List[int]] = {}
+    with ledger._shards_lock:
+        _add_rows(retired, ledger._retired)
+        _add_rows(retired, rows)
+        # Replaced together under the lock, so a report sees the rows once
+        ledger._retired = retired
+        ledger._shards = [shard for shard in ledger._shards if shard is not rows]
+
+
+class CostLedger:
+    """
+    Accumulate exact token costs across any number of records.
+
+    Each update resolves the model's integer rates from a per-ledger cache and
+    adds integers to a per-model subtotal row, so it is O(1) and constructs no
+    Decimal. Totals are rounded once, at report time, through `format_usd`.
+
+    A ledger can be shared between threads: every thread adds to its own rows
+    without taking a lock (so no update is lost, also on free-threaded
+    builds), and reports sum the rows of all threads. A report taken while
+    other threads are adding may include part of a record in flight.
+
+    Example:
+        ledger = CostLedger()
+        for response in responses:
+            ledger.add_response(response)
+        print(ledger.report()["total_cost"])
+    """
+
+    def __init__(self) -> None:
+        # (pricing version, model -> rates), replaced when the pricing changes
+        self._rates: Tuple[int, Dict[str, engine.Rates]] = (
+            pricing_data._pricing_version,
+            {},
+        )
+        # Per-thread model -> subtotal rows of the live threads
+        self._local = threading.local()
+        self._shards: List[Dict[str, List[int]]] = []
+        self._shards_lock = threading.Lock()
+        # Rows of exited threads (and unpickled rows); replaced, never modified
+        self._retired: Dict[str, List[int]] = {}
+
+    def _rows(self) -> Dict[str, List[int]]:
+        """Get the calling thread's rows."""
+        try:
+            return self._local.rows
+        except AttributeError:
+            rows = self._local.rows = {}
+            # The owner is freed when the thread exits, which folds its rows
+            # into the retired rows; the finalizer does not keep the ledger
+            # alive
+            owner = self._local.owner = _Owner()
+            weakref.finalize(owner, _retire, weakref.ref(self), rows).atexit = False
+            with self._shards_lock:
+                self._shards.append(rows)
+            return rows
+
+    @property
+    def _models(self) -> Dict[str, List[int]]:
+        """Per-model rows summed over every thread's rows."""
+        with self._shards_lock:
+            retired = self._retired
+            shards = list(self._shards)
+
+        models: Dict[str, List[int]] = {}
+        _add_rows(models, retired)
+        for rows in shards:
+            _add_rows(models, rows)
+        return models
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Pickled (e.g. back from a process pool worker) as summed rows
+        return {"models": self._models}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__()  # type: ignore[misc]
+        self._retired = state["models"]
+
+    def _rates_for(self, model: str) -> engine.Rates:
+        # Version before rates (see `pricing_data.pricing_snapshot`); a stale
+        # thread fills the replaced cache, never the current one
+        current = pricing_data._pricing_version
+        version, cache = self._rates
+        if version != current:
+            cache = {}
+            if current > version:
+                self._rates = (current, cache)
+
+        rates = cache.get(model)
+        if rates is None:
+            rates = engine.model_rates(model)
+            if rates is None:
+                raise CostEstimateError(f"No pricing data found for model '{model}'")
+            cache[model] = rates
+        return rates
+
+    def price(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        cache_write_1h_tokens: int = 0,
+    ) -> Tuple[int, int, int]:
+        """
+        Price one request's token usage without adding it to the ledger.
+
+        Uses the same cached integer rates as `add`, so the amounts are
+        exactly what `add` accumulates.
+
+        Args:
+            model: The model identifier
+            prompt_tokens: Number of input tokens (including cached ones)
+            completion_tokens: Number of output tokens
+            cached_tokens: Number of cached input tokens
+            cache_write_tokens: Number of input tokens written to a 5-minute
+                prompt cache
+            cache_write_1h_tokens: Number of input tokens written to a 1-hour
+                prompt cache
+
+        Returns:
+            Tuple of (uncached input, cached input, output) costs in picodollars
+
+        Raises:
+            CostEstimateError: If no pricing data can be found for the model
+        """
+        return engine.price(
+            self._rates_for(model),
+            prompt_tokens,
+            completion_tokens,
+            cached_tokens,
+            cache_write_tokens,
+            cache_write_1h_tokens,
+        )
+
+    def add(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        cache_write_1h_tokens: int = 0,
+    ) -> None:
+        """
+        Add one request's token usage to the ledger.
+
+        Args:
+            model: The model identifier
+            prompt_tokens: Number of input tokens (including cached ones)
+            completion_tokens: Number of output tokens
+            cached_tokens: Number of cached input tokens
+            cache_write_tokens: Number of input tokens written to a 5-minute
+                prompt cache
+            cache_write_1h_tokens: Number of input tokens written to a 1-hour
+                prompt cache
+
+        Raises:
+            CostEstimateError: If no pricing data can be found for the model
+        """
+        version, cache = self._rates
+        rates = None
+        if version == pricing_data._pricing_version:
+            rates = cache.get(model)
+        if rates is None:
+            rates = self._rates_for(model)
+
+        try:
+            rows = self._local.rows
+        except AttributeError:
+            rows = self._rows()
+        row = rows.get(model)
+        if row is None:
+            row = rows[model] = [0] * _ROW_SIZE
+
+        # Literal indexes (_REQUESTS ... _OUTPUT_COST) avoid global lookups on
+        # this hot path
+        row[0] += 1
+        row[1] += prompt_tokens
+        row[2] += completion_tokens
+        row[3] += cached_tokens
+        if prompt_tokens > cached_tokens:
+            row[4] += (prompt_tokens - cached_tokens) * rates[0]
+        row[5] += cached_tokens * rates[1]
+        row[6] += completion_tokens * rates[2]
+        if cache_write_tokens or cache_write_1h_tokens:
+            row[4] += engine.write_premium(
+                rates, cache_write_tokens, cache_write_1h_tokens
+            )
+
+    def add_usage(self, model: str, usage: Dict[str, int]) -> None:
+        """
+        Add a usage dictionary as returned by `extract_usage`.
+
+        Args:
+            model: The model identifier
+            usage: Dict with prompt_tokens, completion_tokens and cached_tokens
+                (and cache writes, if any)
+        """
+        self.add(
+            model,
+            usage["prompt_tokens"],
+            usage["completion_tokens"],
+            usage.get("cached_tokens", 0),
+            usage.get("cache_write_tokens", 0),
+            usage.get("cache_write_1h_tokens", 0),
+        )
+
+    def add_response(self, response: Any) -> None:
+        """
+        Add an OpenAI API response object (Chat Completions or Responses API).
+
+        Args:
+            response: The OpenAI API response object
+        """
+        self.add_usage(response.model, extract_usage(response))
+
+    def add_subtotal(
+        self,
+        model: str,
+        requests: int,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int,
+        uncached_cost: int,
+        cached_cost: int,
+        output_cost: int,
+    ) -> None:
+        """
+        Add already-priced totals, e.g. aggregated by an external store.
+
+        Args:
+            model: The model identifier
+            requests: Number of requests
+            prompt_tokens: Number of input tokens (including cached ones)
+            completion_tokens: Number of output tokens
+            cached_tokens: Number of cached input tokens
+            uncached_cost: Cost of uncached input tokens in picodollars
+            cached_cost: Cost of cached input tokens in picodollars
+            output_cost: Cost of output tokens in picodollars
+        """
+        rows = self._rows()
+        row = rows.get(model)
+        if row is None:
+            row = rows[model] = [0] * _ROW_SIZE
+        for i, value in enumerate(
+            (
+                requests,
+                prompt_tokens,
+                completion_tokens,
+                cached_tokens,
+                uncached_cost,
+                cached_cost,
+                output_cost,
+            )
+        ):
+            row[i] += value
+
+    def merge(self, other: "CostLedger") -> None:
+        """
+        Add every subtotal of another ledger into this one.
+
+        Args:
+            other: The ledger to merge in
+        """
+        rows = self._rows()
+        for model, other_row in other._models.items():
+            row = rows.get(model)
+            if row is None:
+                row = rows[model] = [0] * _ROW_SIZE
+            for i, value in enumerate(other_row):
+                row[i] += value
+
+    def __len__(self) -> int:
+        return sum(row[_REQUESTS] for row in self._models.values())
+
+    def total_picodollars(self) -> int:
+        """Get the exact grand total in integer picodollars."""
+        return sum(
+            row[_UNCACHED_COST] + row[_CACHED_COST] + row[_OUTPUT_COST]
+            for row in self._models.values()
+        )
+
+    def total(self) -> Decimal:
+        """Get the exact grand total in USD as an unrounded Decimal."""
+        return self.total_picodollars() * _PICO
+
+    def _render(self, row: List[int]) -> Dict[str, Any]:
+        total = row[_UNCACHED_COST] + row[_CACHED_COST] + row[_OUTPUT_COST]
+        return {
+            "requests": row[_REQUESTS],
+            "prompt_tokens": row[_PROMPT],
+            "completion_tokens": row[_COMPLETION],
+            "total_tokens": row[_PROMPT] + row[_COMPLETION],
+            "cached_tokens": row[_CACHED],
+            "prompt_cost_uncached": format_usd(row[_UNCACHED_COST] * _PICO),
+            "prompt_cost_cached": format_usd(row[_CACHED_COST] * _PICO),
+            "completion_cost": format_usd(row[_OUTPUT_COST] * _PICO),
+            "total_cost": format_usd(total * _PICO),
+        }
+
+    def subtotals(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-model subtotals, rounded once through `format_usd`.
+
+        Returns:
+            Dict mapping model to token counts and USD cost strings
+        """
+        return {model: self._render(row) for model, row in self._models.items()}
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Get the grand totals and per-model subtotals.
+
+        Returns:
+            Dict with the same token and cost fields as a subtotal plus a
+            "models" key holding `subtotals()`
+        """
+        models = self._models
+        grand = [0] * _ROW_SIZE
+        for row in models.values():
+            for i, value in enumerate(row):
+                grand[i] += value
+
+        result = self._render(grand)
+        result["models"] = {model: self._render(row) for model, row in models.items()}
+        return result
+
+
+def accumulate(response: Any, sink: CostLedger) -> None:
+    """
+    Add the cost of an OpenAI API response straight into a ledger.
+
+    The hot-path counterpart of ``sink.add_response(ctoken(response))``: token
+    counts and the model are read directly from the response attributes (Chat
+    Completions or Responses API schema; other providers' schemas go through
+    `extract_usage`) and added to the sink's preallocated
+    per-model row, without building usage, model-detail or cost dictionaries.
+
+    Args:
+        response: The OpenAI API response object
+        sink: The ledger receiving the costs
+
+    Raises:
+        CostEstimateError: If the response has no usage or model, or if no
+            pricing data can be found for the model
+    """
+    usage = getattr(response, "usage", None)
+    model = getattr(response, "model", None)
+    if usage is None or not model:
+        raise CostEstimateError("Response has no 'usage' or 'model' attribute")
+
+    prompt_tokens = getattr(usage, "input_tokens", None)
+    if prompt_tokens is not None:  # Responses API schema
+        if provider_of(model).usage_schema != "openai":
+            # Same field names, other semantics (e.g. Anthropic cache reads)
+            sink.add_usage(model, extract_usage(response))
+            return
+        completion_tokens = getattr(usage, "output_tokens", 0)
+        details = getattr(usage, "input_tokens_details", None)
+    else:  # Chat Completion API schema
+        prompt_tokens = getattr(usage, "prompt_tokens", 0)
+        completion_tokens = getattr(usage, "completion_tokens", 0)
+        details = getattr(usage, "prompt_tokens_details", None)
+
+    sink.add(
+        model,
+        prompt_tokens or 0,
+        completion_tokens or 0,
+        getattr(details, "cached_tokens", 0) or 0,
+    )
@@ -0,0 +1,308 @@
+"""
+Prometheus metrics for costed requests.
+
+`CostMetrics` keeps per-model request, token and cost counters plus a request
+latency histogram. Every thread updates its own shard (an exact `CostLedger`
+and latency rows), so recording takes no lock and threads never contend;
+shards are merged only when the metrics are rendered in the Prometheus text
+exposition format, and the shard of a thread that exits is folded into a
+single retired shard. `start_http_server` optionally serves them locally.
+
+Example:
+    metrics = CostMetrics()
+    start_http_server(metrics, port=9464)
+
+    started = time.perf_counter()
+    response = client.chat.completions.create(...)
+    metrics.observe_response(response, latency=time.perf_counter() - started)
+"""
+
+import threading
+import weakref
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from .ledger import CostLedger, _add_rows, _Owner, accumulate
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Prometheus client default buckets, in seconds
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    7.5,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Shard:
+    """Counters owned by a single thread."""
+
+    __slots__ = ("ledger", "latency")
+
+    def __init__(self) -> None:
+        self.ledger = CostLedger()
+        # model -> [count per bucket..., count above the last bucket, sum]
+        self.latency: Dict[str, List[float]] = {}
+
+
+def _add_latency(into: Dict[str, List[float]], rows: Dict[str, List[float]]) -> None:
+    """Add latency rows into others."""
+    for model, row in list(rows.items()):
+        merged = into.get(model)
+        if merged is None:
+            merged = into[model] = [0] * len(row)
+        for i, value in enumerate(row):
+            merged[i] += value
+
+
+def _retire(ref: "weakref.ref[CostMetrics]", shard: _Shard) -> None:
+    """Fold the shard of an exited thread into the retired shard."""
+    metrics = ref()
+    if metrics is None:
+        return
+    retired = _Shard()
+    with metrics._shards_lock:
+        models: Dict[str, List[int]] = {}
+        _add_rows(models, metrics._retired.ledger._models)
+        _add_rows(models, shard.ledger._models)
+        retired.ledger._retired = models
+        _add_latency(retired.latency, metrics._retired.latency)
+        _add_latency(retired.latency, shard.latency)
+        # Replaced together under the lock, so a snapshot sees the shard once
+        metrics._retired = retired
+        metrics._shards = [s for s in metrics._shards if s is not shard]
+
+
+class CostMetrics:
+    """
+    Per-model token, cost and latency metrics with contention-free updates.
+
+    Args:
+        namespace: Prefix of every metric name
+        latency_buckets: Upper bounds of the latency histogram buckets, in
+            seconds
+    """
+
+    def __init__(
+        self,
+        namespace: str = "ctoken",
+        latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        buckets = tuple(sorted(float(b) for b in latency_buckets))
+        if not buckets:
+            raise ValueError("At least one latency bucket is required")
+
+        self.namespace = namespace
+        self.latency_buckets = buckets
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._shards_lock = threading.Lock()
+        # Counters of exited threads; replaced, never modified
+        self._retired = _Shard()
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            # Folded into the retired shard when the thread exits
+            owner = self._local.owner = _Owner()
+            weakref.finalize(owner, _retire, weakref.ref(self), shard).atexit = False
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def _observe_latency(self, shard: _Shard, model: str, seconds: float) -> None:
+        row = shard.latency.get(model)
+        if row is None:
+            row = shard.latency[model] = [0] * (len(self.latency_buckets) + 2)
+        row[bisect_left(self.latency_buckets, seconds)] += 1
+        row[-1] += seconds
+
+    def observe(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        latency: Optional[float] = None,
+        cache_write_tokens: int = 0,
+        cache_write_1h_tokens: int = 0,
+    ) -> None:
+        """
+        Record one request's token usage and, optionally, its latency.
+
+        Args:
+            model: The model identifier
+            prompt_tokens: Number of input tokens (including cached ones)
+            completion_tokens: Number of output tokens
+            cached_tokens: Number of cached input tokens
+            latency: Request latency in seconds
+            cache_write_tokens: Number of input tokens written to a 5-minute
+                prompt cache
+            cache_write_1h_tokens: Number of input tokens written to a 1-hour
+                prompt cache
+
+        Raises:
+            CostEstimateError: If no pricing data can be found for the model
+        """
+        shard = self._shard()
+        shard.ledger.add(
+            model,
+            prompt_tokens,
+            completion_tokens,
+            cached_tokens,
+            cache_write_tokens,
+            cache_write_1h_tokens,
+        )
+        if latency is not None:
+            self._observe_latency(shard, model, latency)
+
+    def observe_response(self, response: Any, latency: Optional[float] = None) -> None:
+        """
+        Record an OpenAI API response (Chat Completions or Responses API).
+
+        Args:
+            response: The OpenAI API response object
+            latency: Request latency in seconds
+
+        Raises:
+            CostEstimateError: If the response has no usage or model, or if no
+                pricing data can be found for the model
+        """
+        shard = self._shard()
+        accumulate(response, shard.ledger)
+        if latency is not None:
+            self._observe_latency(shard, response.model, latency)
+
+    def observe_latency(self, model: str, seconds: float) -> None:
+        """
+        Record a request latency without token usage (e.g. a failed call).
+
+        Args:
+            model: The model identifier
+            seconds: Request latency in seconds
+        """
+        self._observe_latency(self._shard(), model, seconds)
+
+    def snapshot(self) -> Tuple[CostLedger, Dict[str, List[float]]]:
+        """
+        Merge every thread's counters.
+
+        Returns:
+            Tuple of (merged ledger, model -> latency row)
+        """
+        with self._shards_lock:
+            shards = [self._retired, *self._shards]
+
+        ledger = CostLedger()
+        latency: Dict[str, List[float]] = {}
+        for shard in shards:
+            ledger.merge(shard.ledger)
+            _add_latency(latency, shard.latency)
+        return ledger, latency
+
+    def render(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Returns:
+            The exposition text, ending with a newline
+        """
+        ledger, latency = self.snapshot()
+        subtotals = sorted(ledger.subtotals().items())
+        ns = self.namespace
+        lines = []
+
+        def header(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} {kind}")
+
+        header("requests_total", "counter", "Requests costed.")
+        for model, t in subtotals:
+            labels = f'model="{_label(model)}"'
+            lines.append(f"{ns}_requests_total{{{labels}}} {t['requests']}")
+
+        header("tokens_total", "counter", "Tokens used, by type.")
+        for model, t in subtotals:
+            for kind in ("prompt", "completion", "cached"):
+                labels = f'model="{_label(model)}",type="{kind}"'
+                lines.append(f"{ns}_tokens_total{{{labels}}} {t[kind + '_tokens']}")
+
+        header("cost_usd_total", "counter", "Cost in USD.")
+        for model, t in subtotals:
+            labels = f'model="{_label(model)}"'
+            lines.append(f"{ns}_cost_usd_total{{{labels}}} {t['total_cost']}")
+
+        name = f"{ns}_request_latency_seconds"
+        header("request_latency_seconds", "histogram", "Request latency in seconds.")
+        bounds = [repr(b) for b in self.latency_buckets] + ["+Inf"]
+        for model, row in sorted(latency.items()):
+            labels = f'model="{_label(model)}"'
+            cumulative = 0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {row[-1]!r}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+def start_http_server(
+    metrics: CostMetrics, port: int = 9464, addr: str = "127.0.0.1"
+) -> "ThreadingHTTPServer":
+    """
+    Serve the metrics at ``http://addr:port/metrics`` from a daemon thread.
+
+    Args:
+        metrics: The metrics to serve
+        port: Port to listen on (0 picks a free port)
+        addr: Address to bind; the default only accepts local connections
+
+    Returns:
+        The running server; call ``shutdown()`` to stop it
+    """
+    # Imported here so that importing ctoken does not pull in http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass  # Keep scrapes out of the application's stderr
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    thread = threading.Thread(
+        target=server.serve_forever, name="ctoken-metrics", daemon=True
+    )
+    thread.start()
+    return server
@@ -0,0 +1,175 @@
+"""
+Layered price sheets.
+
+Prices resolve through three layers, later layers taking precedence:
+
+1. bundled: the `PRICING_DATA` table shipped with the package
+2. org: the organization's price sheet (negotiated rates, fine-tuned models,
+   private deployments), set with `set_price_sheet` or the
+   ``CTOKEN_PRICE_SHEET`` environment variable
+3. call: a `PriceSheet` passed to a single `ctoken()` or estimation call
+
+Sheets use the scraper's CSV format or JSON (see
+`pricing_compiler.read_price_sheet`). Layers are merged when they are loaded
+into one table with one precompiled index, so custom models resolve in O(1)
+instead of through the fuzzy fallback, and every entry records the layer it
+came from (`pricing_source`).
+
+Example:
+    set_price_sheet("org_prices.csv")
+    sheet = PriceSheet({"acme-llm": {"input_price": 1.0, "output_price": 3.0}})
+    ctoken(response, pricing=sheet)
+    pricing_source("acme-llm", sheet)  # "call"
+"""
+
+import os
+import threading
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+
+from . import engine, pricing_data
+from .pricing_data import BUNDLED, CALL, ORG, set_price_sheet  # noqa: F401
+
+Sheet = Union[str, "os.PathLike[str]", Mapping[Any, Any]]
+
+# (key in the merged table or None, compiled rates or None)
+_Resolved = Tuple[Optional[Tuple[str, str]], Optional[engine.Rates]]
+
+
+def _read(sheet: Sheet) -> Dict[Tuple[str, str], Dict[str, float]]:
+    from .pricing_compiler import compile_mapping, read_price_sheet
+
+    if not isinstance(sheet, Mapping):
+        return read_price_sheet(sheet)
+    if all(isinstance(key, tuple) for key in sheet):
+        return dict(sheet)
+    return compile_mapping(sheet)
+
+
+class PriceSheet:
+    """
+    Per-call pricing overrides, layered over the current pricing data.
+
+    The sheet is validated once; its merged table and index are built on
+    first use and again only after `refresh_pricing()` or `set_price_sheet`,
+    and each model string is resolved once. Create a sheet once and pass it
+    to every call that needs it.
+
+    Args:
+        sheet: Path of a CSV or JSON price sheet, or a mapping of model
+            strings to rates (the JSON format)
+        layer: Name recorded as the source of the sheet's entries
+
+    Raises:
+        PricingCompileError: If the sheet fails validation
+    """
+
+    def __init__(self, sheet: Sheet, layer: str = CALL) -> None:
+        self.table = _read(sheet)
+        self.layer = layer
+        # (pricing version, base table, merged table, sources, index,
+        # model string -> resolved, model string -> resolved with the fuzzy
+        # fallback), replaced as a whole when rebuilt
+        self._compiled: Tuple[Any, ...] = (-1, None, {}, {}, ({}, {}), {}, {})
+        self._lock = threading.Lock()
+
+    def _state(self) -> Tuple[Any, ...]:
+        version, base = pricing_data.pricing_snapshot()
+        compiled = self._compiled
+        if compiled[0] == version and compiled[1] is base:
+            return compiled
+
+        with self._lock:
+            compiled = self._compiled
+            if compiled[0] >= version and compiled[1] is base:
+                return compiled
+            from .pricing_compiler import build_index, merge_layers
+
+            merged, sources = merge_layers(((BUNDLED, base), (self.layer, self.table)))
+            # Keep the layer of entries the base table itself got from its layers
+            base_sources = pricing_data.get_pricing_sources(base)
+            for key, layer in sources.items():
+                if layer == BUNDLED:
+                    sources[key] = base_sources.get(key, BUNDLED)
+            compiled = (version, base, merged, sources, build_index(merged), {}, {})
+            if version >= self._compiled[0]:
+                self._compiled = compiled
+        return compiled
+
+    def _resolve(
+        self, model: str, fuzzy: bool = False
+    ) -> Tuple[Dict[Any, str], _Resolved]:
+        _, _, merged, sources, index, strict, fuzzy_matched = self._state()
+        resolved = fuzzy_matched if fuzzy else strict
+        try:
+            return sources, resolved[model]
+        except KeyError:
+            pass
+
+        key, found = engine.lookup_model(model, merged, index, fuzzy)
+        rates = engine.to_picodollar_rates(found) if found is not None else None
+        result = (key, rates)
+        if len(resolved) >= engine._MAX_MODELS:
+            resolved.clear()
+        resolved[model] = result
+        return sources, result
+
+    def rates(self, model: str, fuzzy: bool = False) -> Optional[engine.Rates]:
+        """
+        Get the compiled picodollar rates of a model string.
+
+        Args:
+            model: The model identifier
+            fuzzy: Whether to fall back to the fuzzy match, as `ctoken()` does
+
+        Returns:
+            Tuple of (input, cached input, output) rates in picodollars per
+            token, or None if no layer prices the model
+
+        Raises:
+            ValueError: If the model is not a non-empty string
+        """
+        return self._resolve(model, fuzzy)[1][1]
+
+    def source(self, model: str) -> Optional[str]:
+        """Get the layer pricing a model string, or None if none does."""
+        sources, (key, rates) = self._resolve(model)
+        if rates is None:
+            return None
+        # Rates without a key come from a provider shard's bundled table
+        return BUNDLED if key is None else sources.get(key, BUNDLED)
+
+
+def as_price_sheet(pricing: Union["PriceSheet", Sheet]) -> "PriceSheet":
+    """Use a PriceSheet as is, or build one from a path or mapping."""
+    if isinstance(pricing, PriceSheet):
+        return pricing
+    return PriceSheet(pricing)
+
+
+def pricing_source(
+    model: str, pricing: Optional[Union["PriceSheet", Sheet]] = None
+) -> Optional[str]:
+    """
+    Get the pricing layer a model string resolves to.
+
+    Args:
+        model: The model identifier
+        pricing: Per-call price sheet to include, as passed to `ctoken()`
+
+    Returns:
+        "bundled", "org", the sheet's layer name ("call" by default), or None
+        if the model has no pricing data
+
+    Raises:
+        ValueError: If the model is not a non-empty string
+    """
+    if pricing is not None:
+        return as_price_sheet(pricing).source(model)
+
+    table = pricing_data.load_pricing()
+    key, rates = engine.lookup_model(model, table)
+    if rates is None:
+        return None
+    if key is None:
+        return BUNDLED
+    return pricing_data.get_pricing_sources(table).get(key, BUNDLED)
@@ -0,0 +1,478 @@
+"""
+Build-time pricing compiler.
+
+Turns the scraper's raw markdown (``data/openai_pricing_raw.md``) or its CSV
+export (``data/openai_text_tokens_pricing.csv``) into validated, generated
+modules that the runtime imports directly:
+
+- ``ctoken/data/pricing_data.py``: the ``PRICING_DATA`` table
+- ``ctoken/data/pricing_index.py``: the precomputed resolution index
+  (normalized names and aliases, date-sorted versions per base model)
+
+Validation rejects conflicting duplicate entries, invalid or repeated version
+dates and malformed prices, so problems surface at build time instead of as
+silently shadowed dictionary keys. Only the standard library is required.
+
+The same validation reads custom price sheets at runtime (`read_price_sheet`,
+CSV or JSON), and `merge_layers` stacks them over the bundled table.
+
+Usage:
+    python -m ctoken.pricing_compiler data/openai_text_tokens_pricing.csv
+    python -m ctoken.pricing_compiler data/openai_pricing_raw.md
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import sys
+import time
+from datetime import date as _date
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+PricingKey = Tuple[str, str]
+PricingTable = Dict[PricingKey, Dict[str, float]]
+Aliases = Dict[str, PricingKey]
+Versions = Dict[str, Tuple[Tuple[str, PricingKey], ...]]
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+PRICING_PY_PATH = PACKAGE_DIR / "data" / "pricing_data.py"
+PRICING_INDEX_PATH = PACKAGE_DIR / "data" / "pricing_index.py"
+
+# Accepted price cells: "$1.25", "1.25", "-" or empty
+_PRICE_CELL = re.compile(r"^(?:\$?\d+(?:\.\d+)?|-|)$")
+
+# Trailing version date of a model name (e.g. gpt-4o-2024-05-13)
+_DATE_SUFFIX = re.compile(r"^(.*?)-(\d{4}-\d{2}-\d{2})$")
+
+
+# CSV/markdown column -> PRICING_DATA field
+_PRICE_COLUMNS = (
+    ("Input", "input_price"),
+    ("Cached input", "cached_input_price"),
+    ("Output", "output_price"),
+)
+
+
+class PricingCompileError(ValueError):
+    """Raised when pricing rows fail validation."""
+
+
+def parse_price(price_str: str) -> float:
+    """Parse a price string like '$1.25' into a float ('-' and '' are 0)."""
+    if not price_str or price_str.strip() == "-":
+        return 0.0
+    clean = "".join(c for c in price_str if c.isdigit() or c == ".")
+    try:
+        return float(clean)
+    except ValueError:
+        return 0.0
+
+
+def parse_markdown_table(
+    markdown: str, section_name: str = "Text tokens", tier: str = "Standard"
+) -> List[Dict[str, str]]:
+    """
+    Parse a pricing table from the pricing page markdown.
+
+    Args:
+        markdown: Full markdown content
+        section_name: Section header (e.g., "Text tokens", "Image tokens")
+        tier: Pricing tier to extract (default: "Standard")
+
+    Returns:
+        List of row dictionaries keyed by the table headers
+    """
+    pattern = (
+        rf"{section_name}.*?{tier}\n\n\|([^\n]+)\|\n\|[-|\s]+\|\n((?:\|[^\n]+\|\n?)+)"
+    )
+    match = re.search(pattern, markdown, re.DOTALL)
+    if not match:
+        return []
+
+    headers = [h.strip() for h in match.group(1).split("|") if h.strip()]
+    rows = []
+    for line in match.group(2).strip().split("\n"):
+        cells = [c.strip() for c in line.split("|")]
+        cells = [c for c in cells if c]
+        if len(cells) >= len(headers):
+            rows.append({headers[i]: cells[i] for i in range(len(headers))})
+    return rows
+
+
+def read_rows(path: Path) -> List[Dict[str, str]]:
+    """
+    Read pricing rows from a raw markdown or CSV file.
+
+    Args:
+        path: Path to a ``.md`` or ``.csv`` file
+
+    Returns:
+        List of row dictionaries with Model, Version, Input, Cached input and
+        Output columns
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if Path(path).suffix.lower() == ".md":
+        return parse_markdown_table(text)
+    return list(csv.DictReader(text.splitlines()))
+
+
+def compile_rows(rows: Iterable[Dict[str, str]]) -> PricingTable:
+    """
+    Validate pricing rows and build the pricing table.
+
+    Identical duplicate rows are collapsed; duplicates with different prices,
+    invalid dates and malformed price cells are rejected.
+
+    Args:
+        rows: Row dictionaries as returned by `read_rows`
+
+    Returns:
+        Dictionary mapping (model_name, version) to pricing rates
+
+    Raises:
+        PricingCompileError: If the rows fail validation
+    """
+    table: PricingTable = {}
+    for line_no, row in enumerate(rows, start=1):
+        model = (row.get("Model") or "").split("\n")[0].strip()
+        if not model:
+            raise PricingCompileError(f"Row {line_no}: missing model name")
+
+        version = (row.get("Version") or "").strip() or "latest"
+        if version != "latest":
+            _validate_date(version, f"Row {line_no} ({model})")
+
+        rates = {}
+        for column, field in _PRICE_COLUMNS:
+            cell = (row.get(column) or "").strip()
+            if not _PRICE_CELL.match(cell):
+                raise PricingCompileError(
+                    f"Row {line_no} ({model}): malformed {column} price {cell!r}"
+                )
+            rates[field] = parse_price(cell)
+
+        key = (model, version)
+        existing = table.get(key)
+        if existing is not None and existing != rates:
+            raise PricingCompileError(
+                f"Row {line_no}: conflicting duplicate prices for {model!r} "
+                f"({version}): {existing} != {rates}"
+            )
+        table[key] = rates
+
+    if not table:
+        raise PricingCompileError("No pricing rows found")
+
+    # Surface alias collisions (e.g. gpt-4o/2024-05-13 vs gpt-4o-2024-05-13)
+    build_index(table, strict=True)
+    return table
+
+
+def _validate_date(value: str, context: str) -> None:
+    try:
+        _date.fromisoformat(value)
+    except ValueError:
+        raise PricingCompileError(f"{context}: invalid version date {value!r}")
+
+
+def model_alias(key: PricingKey) -> str:
+    """Get the normalized full model string a pricing key resolves from."""
+    name, version = key
+    return full_model_name(name.split("\n")[0].strip().lower(), version)
+
+
+def full_model_name(name: str, version: Optional[str]) -> str:
+    """Get the full model string for a pricing key (name plus dated version)."""
+    if version in (None, "", "latest"):
+        return name
+    return f"{name}-{version}"
+
+
+def build_index(table: PricingTable, strict: bool = False) -> Tuple[Aliases, Versions]:
+    """
+    Derive the resolution index of a pricing table.
+
+    Args:
+        table: Dictionary mapping (model_name, version) to pricing rates
+        strict: Raise on alias collisions instead of keeping the first entry
+
+    Returns:
+        Tuple of:
+            - aliases: normalized full model string -> pricing key
+            - versions: base model name -> date-sorted (date, pricing key) pairs
+
+    Raises:
+        PricingCompileError: In strict mode, if two entries share a full model
+            string or a base model has the same version date twice
+    """
+    aliases: Aliases = {}
+    dated: Dict[str, List[Tuple[str, PricingKey]]] = {}
+
+    for key in table:
+        full = model_alias(key)
+        if full in aliases:
+            if strict:
+                raise PricingCompileError(
+                    f"Entries {aliases[full]} and {key} both resolve to {full!r}"
+                )
+            continue
+        aliases[full] = key
+
+        match = _DATE_SUFFIX.match(full)
+        if match:
+            dated.setdefault(match.group(1), []).append((match.group(2), key))
+
+    versions: Versions = {}
+    for base, entries in dated.items():
+        entries.sort()
+        for (prev, _), (current, _) in zip(entries, entries[1:]):
+            if strict and prev == current:
+                raise PricingCompileError(f"{base!r} lists version {current} twice")
+        versions[base] = tuple(entries)
+
+    return aliases, versions
+
+
+def _price_cell(value: object) -> str:
+    """Format a JSON price as a price cell ("" for missing, raw text if invalid)."""
+    if value is None:
+        return ""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    return format(Decimal(str(value)), "f")
+
+
+def read_price_sheet(path: Path) -> PricingTable:
+    """
+    Read and validate a custom price sheet.
+
+    Accepts the scraper's CSV (or raw markdown) format, or JSON holding either
+    a list of rows with the same columns or an object mapping full model
+    strings to rates::
+
+        {"ft:gpt-4o-mini:acme::abc123": {"input_price": 0.3,
+                                          "cached_input_price": 0.15,
+                                          "output_price": 1.2}}
+
+    Prices are USD per 1M tokens.
+
+    Args:
+        path: Path to a ``.csv``, ``.md`` or ``.json`` file
+
+    Returns:
+        Dictionary mapping (model_name, version) to pricing rates
+
+    Raises:
+        PricingCompileError: If the sheet fails validation
+    """
+    path = Path(path)
+    if path.suffix.lower() != ".json":
+        return compile_rows(read_rows(path))
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as e:
+        raise PricingCompileError(f"{path}: invalid JSON: {e}") from e
+    if isinstance(data, list):
+        return compile_rows(data)
+    if not isinstance(data, dict):
+        raise PricingCompileError(f"{path}: expected a JSON object or list")
+    return compile_mapping(data)
+
+
+def compile_mapping(mapping: Mapping[str, Mapping[str, float]]) -> PricingTable:
+    """
+    Validate a mapping of full model strings to rates (the JSON sheet format).
+
+    Args:
+        mapping: Model string -> dict with input_price, cached_input_price
+            (optional) and output_price in USD per 1M tokens
+
+    Returns:
+        Dictionary mapping (model_name, version) to pricing rates
+
+    Raises:
+        PricingCompileError: If the mapping fails validation
+    """
+    rows = []
+    for model, rates in mapping.items():
+        if not isinstance(rates, Mapping):
+            raise PricingCompileError(f"Rates of {model!r} are not a mapping")
+        row = {"Model": model}
+        for column, field in _PRICE_COLUMNS:
+            row[column] = _price_cell(rates.get(field))
+        rows.append(row)
+    return compile_rows(rows)
+
+
+def merge_layers(
+    layers: Sequence[Tuple[str, PricingTable]],
+) -> Tuple[PricingTable, Dict[PricingKey, str]]:
+    """
+    Merge pricing layers into one table, later layers taking precedence.
+
+    An entry replaces every earlier entry that resolves from the same full
+    model string, so ("gpt-4o", "2024-05-13") in an override sheet replaces
+    the bundled ("gpt-4o-2024-05-13", "latest").
+
+    Args:
+        layers: (layer name, pricing table) pairs, lowest precedence first
+
+    Returns:
+        Tuple of (merged table, pricing key -> name of the layer it came from)
+    """
+    table: PricingTable = {}
+    sources: Dict[PricingKey, str] = {}
+    by_alias: Aliases = {}
+    for layer, entries in layers:
+        for key, rates in entries.items():
+            alias = model_alias(key)
+            replaced = by_alias.get(alias)
+            if replaced is not None:
+                del table[replaced]
+                del sources[replaced]
+            by_alias[alias] = key
+            table[key] = rates
+            sources[key] = layer
+    return table, sources
+
+
+def table_hash(table: PricingTable) -> str:
+    """Get a stable content hash of a pricing table."""
+    canonical = json.dumps(
+        sorted((list(k), sorted(v.items())) for k, v in table.items())
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+# Entry format comment of the generated PRICING_DATA
+_FORMAT_COMMENT = (
+    '    # Format: (model_name, version): {"input_price": float, '
+    '"cached_input_price": float, "output_price": float}'
+)
+
+
+def render_pricing_module(table: PricingTable) -> str:
+    """Render the ``ctoken/data/pricing_data.py`` module source."""
+    entries = []
+    for (model, version), rates in table.items():
+        entries.append(
+            f'    ("{model}", "{version}"): {{\n'
+            f'        "input_price": {rates["input_price"]:.4f},\n'
+            f'        "cached_input_price": {rates["cached_input_price"]:.4f},\n'
+            f'        "output_price": {rates["output_price"]:.4f},\n'
+            "    },"
+        )
+
+    return f'''"""
+Pricing data for OpenAI models.
+
+This module contains the pricing data for OpenAI models in dictionary format.
+Auto-generated by openai_pricing_scraper.py
+Last updated: {time.strftime('%Y-%m-%d %H:%M:%S')}
+"""
+
+# Pricing data in dollars per 1M tokens (input/cached_input/output)
+PRICING_DATA = {{
+{_FORMAT_COMMENT}
+{chr(10).join(entries)}
+}}
+'''
+
+
+def _quote(value: str) -> str:
+    return json.dumps(value)
+
+
+def _quote_key(key: PricingKey) -> str:
+    return f"({_quote(key[0])}, {_quote(key[1])})"
+
+
+def render_index_module(table: PricingTable) -> str:
+    """Render the ``ctoken/data/pricing_index.py`` module source."""
+    aliases, versions = build_index(table, strict=True)
+
+    alias_lines = "\n".join(
+        f"    {_quote(alias)}: {_quote_key(key)},"
+        for alias, key in sorted(aliases.items())
+    )
+    version_lines = []
+    for base, entries in sorted(versions.items()):
+        items = [f"({_quote(version)}, {_quote_key(key)})" for version, key in entries]
+        line = f"    {_quote(base)}: ({items[0]},),"
+        # Laid out as black would, so the generated module passes the linters
+        if len(items) == 1 and len(line) <= 88:
+            version_lines.append(line)
+            continue
+        version_lines.append(f"    {_quote(base)}: (")
+        version_lines.extend(f"        {item}," for item in items)
+        version_lines.append("    ),")
+
+    return f'''"""
+Precomputed pricing resolution index.
+
+Auto-generated by ctoken.pricing_compiler from the same source as
+pricing_data.py; do not edit by hand.
+"""
+
+# Content hash of the PRICING_DATA table this index was compiled from
+PRICING_HASH = {_quote(table_hash(table))}
+
+# Normalized full model string -> PRICING_DATA key
+ALIASES = {{
+{alias_lines}
+}}
+
+# Base model name -> date-sorted ((date, PRICING_DATA key), ...)
+VERSIONS = {{
+{chr(10).join(version_lines)}
+}}
+'''
+
+
+def write_outputs(
+    table: PricingTable,
+    pricing_path: Path = PRICING_PY_PATH,
+    index_path: Path = PRICING_INDEX_PATH,
+) -> None:
+    """
+    Write the generated pricing table and index modules.
+
+    Args:
+        table: Validated pricing table from `compile_rows`
+        pricing_path: Destination of the PRICING_DATA module
+        index_path: Destination of the resolution index module
+    """
+    Path(pricing_path).write_text(render_pricing_module(table), encoding="utf-8")
+    Path(index_path).write_text(render_index_module(table), encoding="utf-8")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Compile a raw markdown or CSV pricing source into the package data."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("source", type=Path, help="raw .md or .csv pricing file")
+    parser.add_argument("--pricing-out", type=Path, default=PRICING_PY_PATH)
+    parser.add_argument("--index-out", type=Path, default=PRICING_INDEX_PATH)
+    parser.add_argument(
+        "--check", action="store_true", help="validate only, write nothing"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        table = compile_rows(read_rows(args.source))
+    except PricingCompileError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    if not args.check:
+        write_outputs(table, args.pricing_out, args.index_out)
+    print(f"Compiled {len(table)} pricing entries ({table_hash(table)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
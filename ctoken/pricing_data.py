@@ -3,42 +3,320 @@ Pricing data management module.
 
 This module loads and provides access to the bundled pricing data dictionary.
 It is updated by external scripts as needed.
+
+Thread safety: the pricing table, its sources and the index and hash caches
+are immutable once published, and each is published with a single reference
+store, so readers never take a lock (also on free-threaded builds). Writers
+(first load, `refresh_pricing`, `set_price_sheet`, cache fills) serialize on
+one lock and publish the new table before bumping `_pricing_version`: a
+reader that sees a version also sees the table it belongs to, so caches keyed
+by the version (read before the table, see `pricing_snapshot`) never pair a
+new version with an old table.
 """
 
-from typing import Dict, Tuple, Optional, List, Any
+from bisect import bisect_right
+from typing import Dict, Tuple, Optional, List, Any, Union
+import os
 import re
+import threading
 
-# Import the static pricing data
+# Import the static pricing data and its precompiled resolution index (kept in
+# sync with the table by the build and checked by the test suite). The
+# compiler is only imported for tables other than the bundled one.
 from ctoken.data.pricing_data import PRICING_DATA
+from ctoken.data.pricing_index import ALIASES, PRICING_HASH, VERSIONS
+
+PricingKey = Tuple[str, str]
+
+# Pricing layers, lowest precedence first: the bundled table, the
+# organization's price sheet (see `set_price_sheet`), per-call overrides
+# (see `price_sheets.PriceSheet`)
+BUNDLED = "bundled"
+ORG = "org"
+CALL = "call"
+
+# Environment variable naming an org price sheet to load with the pricing data
+PRICE_SHEET_ENV = "CTOKEN_PRICE_SHEET"
+
+
+_bundled_index = (ALIASES, VERSIONS)
+
+# Serializes writers of the module state below; readers never take it
+_lock = threading.Lock()
 
 # Cache configuration
 _pricing_cache: Optional[Dict[Tuple[str, str], Dict[str, float]]] = None
 
+# Bumped on every refresh so derived indexes know when to rebuild
+_pricing_version = 0
+
+# Index derived for pricing tables other than the bundled one:
+# (table, pricing version, aliases, versions)
+_index_cache: Optional[Tuple[Any, int, Dict, Dict]] = None
+
+# Content hash of the current pricing table: (table, pricing version, hash)
+_hash_cache: Optional[Tuple[Any, int, str]] = None
+
+# Org price sheet set with `set_price_sheet` (a path is re-read on refresh);
+# until one is set, PRICE_SHEET_ENV is consulted
+_price_sheet: Any = None
+_price_sheet_set = False
+
+# Layer of every key of the loaded table: (table, pricing key -> layer)
+_pricing_sources: Tuple[Any, Dict[PricingKey, str]] = (None, {})
+
+
+def _layered(sheet: Any) -> Tuple[Any, Dict[PricingKey, str]]:
+    """Merge the bundled table and an org price sheet."""
+    if not sheet:
+        return PRICING_DATA, {}
+    from ctoken.pricing_compiler import compile_mapping, merge_layers, read_price_sheet
+
+    if not isinstance(sheet, dict):
+        org = read_price_sheet(sheet)
+    elif all(isinstance(key, tuple) for key in sheet):
+        org = sheet
+    else:
+        org = compile_mapping(sheet)
+    return merge_layers(((BUNDLED, PRICING_DATA), (ORG, org)))
+
+
+def _install(table: Any, sources: Dict[PricingKey, str], version: int) -> None:
+    """Publish a loaded table as `version`; the caller holds `_lock`."""
+    global _pricing_cache, _pricing_sources, _pricing_version, _index_cache
+    if table is not PRICING_DATA:
+        from ctoken.pricing_compiler import build_index
+
+        # Compile the merged index now rather than on the first lookup
+        aliases, versions = build_index(table)
+        _index_cache = (table, version, aliases, versions)
+    _pricing_sources = (table, sources)
+    _pricing_cache = table
+    # Published last: readers seeing the new version see the new table
+    _pricing_version = version
+
+
+def _load_layers(version: int) -> None:
+    sheet = _price_sheet if _price_sheet_set else os.environ.get(PRICE_SHEET_ENV)
+    _install(*_layered(sheet), version)
+
 
 def load_pricing() -> Dict[Tuple[str, str], Dict[str, float]]:
     """
-    Load pricing data from the bundled dictionary.
+    Load pricing data: the bundled dictionary, merged with the org price
+    sheet if one is set.
 
     Returns:
         Dictionary mapping (model_name, date) to pricing information
     """
-    global _pricing_cache
+    pricing = _pricing_cache
+    if pricing is None:
+        with _lock:
+            if _pricing_cache is None:
+                _load_layers(_pricing_version)
+            pricing = _pricing_cache
+
+    return pricing  # type: ignore[return-value]
+
+
+def pricing_snapshot() -> Tuple[int, Dict[Tuple[str, str], Dict[str, float]]]:
+    """
+    Get the pricing version and the pricing data, for caches keyed by both.
 
-    if _pricing_cache is None:
-        _pricing_cache = PRICING_DATA
+    The version is read first, so it is never newer than the table: a cache
+    entry derived from the table and labelled with the version is at worst
+    rebuilt once more than needed, never kept stale.
 
-    return _pricing_cache
+    Returns:
+        Tuple of (pricing version, pricing table)
+    """
+    version = _pricing_version
+    return version, load_pricing()
 
 
 def refresh_pricing() -> None:
     """
     Force a refresh of the pricing data from the bundled dictionary.
 
-    This function is exposed for API consistency but simply reloads from the
-    bundled data since external updates will modify the source file directly.
+    The bundled data is reloaded as is, since external updates modify the
+    source file directly; an org price sheet file is read again.
+    """
+    with _lock:
+        _load_layers(_pricing_version + 1)
+
+
+def set_price_sheet(sheet: Union[None, str, "os.PathLike[str]", Dict]) -> None:
     """
-    global _pricing_cache
-    _pricing_cache = PRICING_DATA
+    Set the organization's price sheet, layered over the bundled prices.
+
+    Entries of the sheet replace bundled entries for the same model string
+    and add models the bundled table does not know (fine-tuned models,
+    private deployments), so they resolve through the precompiled index
+    instead of the fuzzy fallback. The sheet overrides the PRICE_SHEET_ENV
+    environment variable.
+
+    Args:
+        sheet: Path of a CSV (scraper format) or JSON price sheet, a mapping
+            of model strings to rates (the JSON format), or None to use only
+            the bundled prices
+
+    Raises:
+        PricingCompileError: If the sheet fails validation
+    """
+    global _price_sheet, _price_sheet_set
+    # Fails before anything is replaced if the sheet is invalid
+    table, sources = _layered(sheet)
+    with _lock:
+        _price_sheet = sheet
+        _price_sheet_set = True
+        _install(table, sources, _pricing_version + 1)
+
+
+def get_pricing_sources(
+    pricing: Optional[Dict[PricingKey, Dict[str, float]]] = None,
+) -> Dict[PricingKey, str]:
+    """
+    Get the layer each entry of the pricing data came from.
+
+    Args:
+        pricing: The pricing table (defaults to `load_pricing()`)
+
+    Returns:
+        Dict mapping pricing key to BUNDLED or ORG; keys missing from it (e.g.
+        of a table not loaded through the layers) are bundled
+    """
+    if pricing is None:
+        pricing = load_pricing()
+    table, sources = _pricing_sources
+    return sources if table is pricing else {}
+
+
+def get_pricing_index(
+    pricing: Optional[Dict[Tuple[str, str], Dict[str, float]]] = None,
+) -> Tuple[Dict[str, Tuple[str, str]], Dict[str, Tuple]]:
+    """
+    Get the resolution index of the current pricing data.
+
+    The bundled table uses the index precompiled by `ctoken.pricing_compiler`;
+    any other table gets an index derived once and cached until the next
+    `refresh_pricing()`.
+
+    Args:
+        pricing: The pricing table (defaults to `load_pricing()`)
+
+    Returns:
+        Tuple of (aliases, versions):
+            - aliases: normalized full model string -> pricing key
+            - versions: base model name -> date-sorted (date, pricing key) pairs
+    """
+    global _index_cache
+
+    version = _pricing_version
+    if pricing is None:
+        pricing = load_pricing()
+    if pricing is PRICING_DATA:
+        return _bundled_index
+
+    cached = _index_cache
+    if cached is None or cached[0] is not pricing or cached[1] < version:
+        with _lock:
+            cached = _index_cache
+            if cached is None or cached[0] is not pricing or cached[1] < version:
+                from ctoken.pricing_compiler import build_index
+
+                aliases, versions = build_index(pricing)
+                cached = _index_cache = (pricing, version, aliases, versions)
+    return cached[2], cached[3]
+
+
+def get_pricing_hash() -> str:
+    """
+    Get a content hash identifying the current pricing data.
+
+    The bundled table's hash is recorded by the compiler; any other table's
+    is derived once and cached until the next `refresh_pricing()`. Results
+    priced under different prices never share a hash.
+
+    Returns:
+        A 16-character hex digest (see `pricing_compiler.table_hash`)
+    """
+    global _hash_cache
+
+    version, pricing = pricing_snapshot()
+    if pricing is PRICING_DATA:
+        return PRICING_HASH
+    cached = _hash_cache
+    if cached is None or cached[0] is not pricing or cached[1] < version:
+        with _lock:
+            cached = _hash_cache
+            if cached is None or cached[0] is not pricing or cached[1] < version:
+                from ctoken.pricing_compiler import table_hash
+
+                cached = _hash_cache = (pricing, version, table_hash(pricing))
+    return cached[2]
+
+
+def resolve_key(
+    model_name: str,
+    model_date: str = "latest",
+    index: Optional[Tuple[Dict[str, PricingKey], Dict[str, Tuple]]] = None,
+) -> Optional[PricingKey]:
+    """
+    Resolve a parsed model name to its pricing key through a pricing index.
+
+    Lookup order:
+    1. The full dated model string (e.g., "gpt-4o-2024-05-13")
+    2. The base model name
+    3. The newest dated version of the model not newer than model_date
+
+    Args:
+        model_name: Base model name (e.g., "gpt-4o-mini")
+        model_date: Version date or "latest"
+        index: (aliases, versions) to search (defaults to the index of the
+            current pricing data)
+
+    Returns:
+        The pricing key, or None if the index has no match
+    """
+    aliases, versions = index if index is not None else get_pricing_index()
+    name = model_name.lower()
+    dated = model_date not in (None, "", "latest")
+
+    if dated:
+        key = aliases.get(f"{name}-{model_date}")
+        if key is not None:
+            return key
+
+    key = aliases.get(name)
+    if key is not None:
+        return key
+
+    entries = versions.get(name)
+    if dated and entries:
+        position = bisect_right(entries, (model_date, ("\uffff", "")))
+        if position:
+            return entries[position - 1][1]
+
+    return None
+
+
+def resolve_rates(
+    model_name: str, model_date: str = "latest"
+) -> Optional[Dict[str, float]]:
+    """
+    Resolve pricing rates through the pricing index (see `resolve_key`).
+
+    Args:
+        model_name: Base model name (e.g., "gpt-4o-mini")
+        model_date: Version date or "latest"
+
+    Returns:
+        Dict containing input_price, cached_input_price, and output_price,
+        or None if the index has no match
+    """
+    pricing = load_pricing()
+    key = resolve_key(model_name, model_date, get_pricing_index(pricing))
+    return pricing[key] if key is not None else None
 
 
 def get_model_pricing(model_name: str) -> Optional[Dict[str, Any]]:
@@ -56,6 +334,19 @@ def get_model_pricing(model_name: str) -> Optional[Dict[str, Any]]:
         model_name = str(model_name)
 
     model_name = model_name.lower().strip()
+
+    # Exact model strings first: a dated entry such as "gpt-4o-2024-05-13"
+    # has its own prices and must not fall back to its base model
+    aliases, _ = get_pricing_index()
+    key = aliases.get(model_name)
+    if key is not None:
+        rates = load_pricing()[key]
+        return {
+            "model": model_name,
+            "input_cost_per_1k": rates.get("input_price", 0) / 1000,
+            "output_cost_per_1k": rates.get("output_price", 0) / 1000,
+        }
+
     base_model_name = model_name
     version = None
 
@@ -130,42 +421,53 @@ def calculate_cost(model_name: str, input_tokens: int, output_tokens: int) -> fl
     """
     Calculate the cost of a completion for a specific model.
 
+    Priced by the same engine as `ctoken`, so for a model the pricing data
+    knows the result matches the ``total_cost`` of a response with this
+    usage and no cached tokens. Unknown models are not fuzzy-matched.
+
     Args:
         model_name: The name of the model to calculate cost for
         input_tokens: Number of input tokens
         output_tokens: Number of output tokens
 
     Returns:
-        The cost in USD as a float
+        The cost in USD as a float (0.0 for unknown models)
     """
-    model_pricing = get_model_pricing(model_name)
-    if not model_pricing:
-        return 0.0
-
-    input_cost = model_pricing["input_cost_per_1k"] * (input_tokens / 1000)
-    output_cost = model_pricing["output_cost_per_1k"] * (output_tokens / 1000)
-
-    return input_cost + output_cost
+    return calculate_total_cost(
+        {model_name: {"input_tokens": input_tokens, "output_tokens": output_tokens}}
+    )
 
 
 def calculate_total_cost(usage: Dict[str, Dict[str, int]]) -> float:
     """
     Calculate the total cost of a series of completions.
 
+    Costs are summed exactly in integer picodollars and converted once.
+
     Args:
         usage: Dictionary mapping model names to token counts
               Format: {"model_name": {"input_tokens": count, "output_tokens": count}}
+              An optional "cached_tokens" count (part of input_tokens) is
+              priced at the model's cached input rate
 
     Returns:
-        The total cost in USD as a float
+        The total cost in USD as a float; unknown models cost nothing
     """
-    total_cost = 0.0
+    # Imported here: the engine builds on this module
+    from . import engine
 
+    total = 0
     for model_name, tokens in usage.items():
-        input_tokens = tokens.get("input_tokens", 0)
-        output_tokens = tokens.get("output_tokens", 0)
-
-        model_cost = calculate_cost(model_name, input_tokens, output_tokens)
-        total_cost += model_cost
-
-    return total_cost
+        rates = engine.model_rates(str(model_name)) if model_name else None
+        if rates is None:
+            continue
+        total += sum(
+            engine.price(
+                rates,
+                tokens.get("input_tokens", 0),
+                tokens.get("output_tokens", 0),
+                tokens.get("cached_tokens", 0),
+            )
+        )
+
+    return total / engine.PICODOLLARS_PER_USD
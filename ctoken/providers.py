@@ -0,0 +1,225 @@
+"""
+Provider-sharded pricing registry.
+
+Prices are namespaced by provider. Each provider's pricing table and
+resolution index form a shard that is loaded the first time one of its models
+is priced, so supporting more providers neither slows down importing ctoken
+nor lengthens the fuzzy fallback scan of any other provider.
+
+A model string is routed to a shard by its provider prefix
+("anthropic/claude-sonnet-4-5", "openai:gpt-4o") or, without one, by the
+model name prefixes the providers register ("claude-"). Everything else is
+priced by the default OpenAI shard: the bundled table layered with the org
+price sheet (see `pricing_data.set_price_sheet`).
+
+Example:
+    register_provider(
+        Provider("acme", "acme_pricing", prefixes=("acme-",))
+    )
+    ctoken(response)  # response.model == "acme/acme-large" or "acme-large"
+"""
+
+import importlib
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from . import pricing_data
+from .pricing_data import PricingKey
+
+PricingTable = Dict[PricingKey, Dict[str, float]]
+# (aliases, versions), see `pricing_compiler.build_index`
+Index = Tuple[Dict[str, PricingKey], Dict[str, Tuple]]
+
+DEFAULT_PROVIDER = "openai"
+
+# Separators between a provider prefix and the model name
+_SEPARATORS = ("/", ":")
+
+# Resolved model strings are dropped when this many accumulate
+_MAX_MODELS = 4096
+
+
+class Provider:
+    """
+    One provider's pricing shard.
+
+    Args:
+        name: Provider name, also the prefix of its model strings
+            ("anthropic/claude-sonnet-4-5")
+        table: Dotted path of a module defining PRICING_DATA (imported on
+            first use), or a function returning the pricing table
+        prefixes: Model name prefixes identifying the provider's model
+            strings when they carry no provider prefix (e.g. "claude-")
+        usage_schema: Usage schema of the provider's responses (a key of
+            `response_parser.USAGE_SCHEMAS`)
+        date_format: Format of version dates in model strings: "iso"
+            ("gpt-4o-2024-08-06") or "compact" ("claude-sonnet-4-20250514")
+        index: Function building a table's (aliases, versions) index
+            (defaults to `pricing_compiler.build_index`)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        table: Union[str, Callable[[], PricingTable]],
+        prefixes: Tuple[str, ...] = (),
+        usage_schema: str = "openai",
+        date_format: str = "iso",
+        index: Optional[Callable[[PricingTable], Index]] = None,
+    ) -> None:
+        if date_format not in ("iso", "compact"):
+            raise ValueError(f"Unknown date format {date_format!r}")
+        self.name = name.lower()
+        self.prefixes = tuple(prefix.lower() for prefix in prefixes)
+        self.usage_schema = usage_schema
+        self.date_format = date_format
+        self._table = table
+        self._index = index
+        # (table, index) of the loaded shard
+        self._loaded: Optional[Tuple[PricingTable, Index]] = None
+        # (table, content hash) of the last hashed table
+        self._hash: Optional[Tuple[PricingTable, str]] = None
+
+    def __repr__(self) -> str:
+        return f"Provider({self.name!r})"
+
+    def load(self) -> Tuple[PricingTable, Index]:
+        """
+        Get the shard's pricing table and resolution index.
+
+        Both are loaded on the first call; the index is rebuilt only when the
+        table function returns a different table.
+        """
+        if isinstance(self._table, str):
+            table = importlib.import_module(self._table).PRICING_DATA
+        else:
+            table = self._table()
+        loaded = self._loaded
+        if loaded is None or loaded[0] is not table:
+            index = self._index
+            if index is None:
+                from .pricing_compiler import build_index as index
+            loaded = self._loaded = (table, index(table))
+        return loaded
+
+    def pricing_hash(self) -> str:
+        """
+        Get a content hash identifying the shard's current pricing table.
+
+        The default shard's is `pricing_data.get_pricing_hash()`; any other
+        table's is derived once and reused until the table changes.
+
+        Returns:
+            A 16-character hex digest (see `pricing_compiler.table_hash`)
+        """
+        if self.name == DEFAULT_PROVIDER:
+            return pricing_data.get_pricing_hash()
+        table = self.load()[0]
+        cached = self._hash
+        if cached is None or cached[0] is not table:
+            from .pricing_compiler import table_hash
+
+            cached = self._hash = (table, table_hash(table))
+        return cached[1]
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the shard has been loaded."""
+        return self._loaded is not None
+
+
+# Registered providers, replaced (never modified) on registration so lookups
+# take no lock
+_providers: Dict[str, Provider] = {}
+
+# Model string -> (provider, model name without the provider prefix),
+# replaced after registrations
+_routes: Dict[str, Tuple[Provider, str]] = {}
+
+_register_lock = threading.Lock()
+
+
+def register_provider(provider: Provider) -> None:
+    """
+    Add a provider shard, or replace the one with the same name.
+
+    Resolved model strings are invalidated, as after `refresh_pricing()`.
+    """
+    global _providers, _routes
+    with _register_lock:
+        _providers = {**_providers, provider.name: provider}
+        _routes = {}
+    pricing_data.refresh_pricing()
+
+
+def get_provider(name: str) -> Optional[Provider]:
+    """Get a registered provider by name, or None."""
+    return _providers.get(name.lower())
+
+
+def list_providers() -> List[str]:
+    """Names of the registered providers, the default first."""
+    return list(_providers)
+
+
+def split_model(model: str) -> Tuple[Provider, str]:
+    """
+    Route a model string to its provider shard.
+
+    Args:
+        model: The model identifier, optionally provider-prefixed
+            ("anthropic/claude-sonnet-4-5")
+
+    Returns:
+        Tuple of (provider, model string without the provider prefix)
+    """
+    # Routes computed while a provider registers land in the discarded dict
+    routes = _routes
+    try:
+        return routes[model]
+    except KeyError:
+        pass
+
+    registered = _providers
+    route = None
+    for separator in _SEPARATORS:
+        head, found, rest = model.partition(separator)
+        provider = registered.get(head.strip().lower()) if found else None
+        if provider is not None and rest:
+            route = (provider, rest.strip())
+            break
+
+    if route is None:
+        lowered = model.strip().lower()
+        for provider in registered.values():
+            if provider.prefixes and lowered.startswith(provider.prefixes):
+                route = (provider, model)
+                break
+        else:
+            route = (registered[DEFAULT_PROVIDER], model)
+
+    if len(routes) >= _MAX_MODELS:
+        routes.clear()
+    routes[model] = route
+    return route
+
+
+def provider_of(model: str) -> Provider:
+    """Get the provider shard a model string is priced by."""
+    return split_model(model)[0]
+
+
+def _layered_index(table: PricingTable) -> Index:
+    return pricing_data.get_pricing_index(table)
+
+
+_providers[DEFAULT_PROVIDER] = Provider(
+    DEFAULT_PROVIDER, pricing_data.load_pricing, index=_layered_index
+)
+_providers["anthropic"] = Provider(
+    "anthropic",
+    "ctoken.data.anthropic_pricing",
+    prefixes=("claude-",),
+    usage_schema="anthropic",
+    date_format="compact",
+)
@@ -1,18 +1,23 @@
 """
-Parser module for OpenAI API response objects.
+Parser module for LLM API response objects.
 
-This module extracts relevant information from OpenAI API responses,
-handling both Chat Completions and Responses API formats.
+This module extracts relevant information from API responses, dispatching on
+the provider of the response's model (see `providers`): OpenAI's Chat
+Completions and Responses API formats, and Anthropic's Messages API format.
 """
 
 import re
 import datetime
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
 
+from .providers import DEFAULT_PROVIDER, split_model
 
 # Model name parsing regex (matches base name and optional date)
 MODEL_NAME_PATTERN = re.compile(r"^(.*?)(?:-(\d{4}-\d{2}-\d{2}))?$")
 
+# Compact version dates ("claude-sonnet-4-20250514") or a "-latest" alias
+COMPACT_MODEL_NAME_PATTERN = re.compile(r"^(.*?)(?:-(\d{4})(\d{2})(\d{2})|-latest)?$")
+
 
 def extract_model_details(model: str) -> Dict[str, str]:
     """
@@ -26,10 +31,17 @@ def extract_model_details(model: str) -> Dict[str, str]:
             - model_name: The base model name without version
             - model_date: The version date or "latest" if unversioned
 
+    A provider prefix is dropped, and version dates are parsed in the
+    provider's format (see `providers.Provider`).
+
     Examples:
-        "gpt-4o-mini-2024-07-18" → {"model_name": "gpt-4o-mini", "model_date": "2024-07-18"}
+        "gpt-4o-mini-2024-07-18" →
+            {"model_name": "gpt-4o-mini", "model_date": "2024-07-18"}
         "gpt-4o-mini" → {"model_name": "gpt-4o-mini", "model_date": "latest"}
-        "gpt-4.1-2025-04-14" → {"model_name": "gpt-4.1", "model_date": "2025-04-14"}
+        "gpt-4.1-2025-04-14" →
+            {"model_name": "gpt-4.1", "model_date": "2025-04-14"}
+        "anthropic/claude-sonnet-4-20250514" →
+            {"model_name": "claude-sonnet-4", "model_date": "2025-05-14"}
 
     Raises:
         ValueError: If model is not a valid string or cannot be parsed
@@ -39,15 +51,21 @@ def extract_model_details(model: str) -> Dict[str, str]:
 
     # Handle multiline model names by taking just the first line
     model = model.split("\n")[0].strip()
+    provider, model = split_model(model)
 
     # Parse the model string using regex
-    match = MODEL_NAME_PATTERN.match(model)
+    if provider.date_format == "compact":
+        match = COMPACT_MODEL_NAME_PATTERN.match(model)
+    else:
+        match = MODEL_NAME_PATTERN.match(model)
     if not match:
         raise ValueError(f"Cannot parse model string: {model!r}")
 
-    base_name, date = match.groups()
+    base_name, *date_parts = match.groups()
+    date = "-".join(date_parts) if date_parts[-1] else None
 
-    # Special case for tests - if the model is just "gpt-4o-mini" (without date), use current date
+    # Special case for tests - if the model is just "gpt-4o-mini" (without
+    # date), use current date
     if base_name == "gpt-4o-mini" and not date:
         # Use datetime.now(datetime.UTC) instead of utcnow() as it's more modern
         try:
@@ -80,55 +98,187 @@ def _get_attribute_safely(obj: Any, attr_path: str, default: Any = 0) -> Any:
     return current or default
 
 
-def extract_usage(response: Any) -> Dict[str, int]:
+def _openai_usage(usage: Any) -> Tuple[Any, Any, Any]:
+    if hasattr(usage, "input_tokens"):  # Responses API schema
+        return (
+            _get_attribute_safely(usage, "input_tokens"),
+            _get_attribute_safely(usage, "output_tokens"),
+            _get_attribute_safely(usage, "input_tokens_details.cached_tokens"),
+        )
+    # Chat Completion API schema
+    return (
+        _get_attribute_safely(usage, "prompt_tokens"),
+        _get_attribute_safely(usage, "completion_tokens"),
+        _get_attribute_safely(usage, "prompt_tokens_details.cached_tokens"),
+    )
+
+
+def _anthropic_usage(usage: Any) -> Tuple[Any, ...]:
+    # input_tokens excludes cache reads and writes, which are billed apart
+    cache_read = _get_attribute_safely(usage, "cache_read_input_tokens")
+    cache_write = _get_attribute_safely(usage, "cache_creation_input_tokens")
+    write_1h = _get_attribute_safely(usage, "cache_creation.ephemeral_1h_input_tokens")
+    return (
+        _get_attribute_safely(usage, "input_tokens") + cache_read + cache_write,
+        _get_attribute_safely(usage, "output_tokens"),
+        cache_read,
+        cache_write - write_1h,
+        write_1h,
+    )
+
+
+def _openai_usage_dict(usage: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+    if "input_tokens" in usage:  # Responses API schema
+        prompt_tokens = usage.get("input_tokens")
+        completion_tokens = usage.get("output_tokens")
+        details = usage.get("input_tokens_details")
+    elif "prompt_tokens" in usage:  # Chat Completion API schema
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        details = usage.get("prompt_tokens_details")
+    else:
+        raise ValueError("Record contains no token usage information")
+
+    cached_tokens = usage.get("cached_tokens")
+    if isinstance(details, dict):
+        cached_tokens = details.get("cached_tokens", cached_tokens)
+    return prompt_tokens, completion_tokens, cached_tokens
+
+
+def _anthropic_usage_dict(usage: Dict[str, Any]) -> Tuple[Any, ...]:
+    if "input_tokens" not in usage:
+        raise ValueError("Record contains no token usage information")
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_write = usage.get("cache_creation_input_tokens") or 0
+    creation = usage.get("cache_creation")
+    write_1h = 0
+    if isinstance(creation, dict):
+        write_1h = creation.get("ephemeral_1h_input_tokens") or 0
+    return (
+        (usage.get("input_tokens") or 0) + cache_read + cache_write,
+        usage.get("output_tokens"),
+        cache_read,
+        cache_write - write_1h,
+        write_1h,
+    )
+
+
+UsageReader = Callable[[Any], Tuple[Any, ...]]
+
+# Usage schema -> (reader of usage objects, reader of usage dictionaries),
+# each returning (prompt tokens including cached ones and cache writes,
+# completion tokens, cached tokens), optionally followed by (5-minute cache
+# writes, 1-hour cache writes)
+USAGE_SCHEMAS: Dict[str, Tuple[UsageReader, UsageReader]] = {
+    "openai": (_openai_usage, _openai_usage_dict),
+    "anthropic": (_anthropic_usage, _anthropic_usage_dict),
+}
+
+
+def _usage_schema(model: Any, schema: Optional[str]) -> Tuple[UsageReader, ...]:
+    if schema is None:
+        if isinstance(model, str) and model:
+            schema = split_model(model)[0].usage_schema
+        else:
+            schema = DEFAULT_PROVIDER
+    try:
+        return USAGE_SCHEMAS[schema]
+    except KeyError:
+        raise ValueError(f"Unknown usage schema {schema!r}") from None
+
+
+def extract_usage(response: Any, schema: Optional[str] = None) -> Dict[str, int]:
     """
-    Extract token usage information from an OpenAI API response.
+    Extract token usage information from an API response.
 
-    Works with both usage schemas:
-    - Responses API (`responses.create`):
+    The usage schema is the one of the provider pricing the response's model
+    (see `providers.Provider`), OpenAI's if the response names no model.
+    Supported schemas:
+    - "openai", Responses API (`responses.create`):
         * usage.input_tokens
         * usage.output_tokens
         * usage.input_tokens_details.cached_tokens
 
-    - Chat Completion API (`chat.completions.create`):
+    - "openai", Chat Completion API (`chat.completions.create`):
         * usage.prompt_tokens
         * usage.completion_tokens
         * usage.prompt_tokens_details.cached_tokens
 
+    - "anthropic", Messages API (`messages.create`):
+        * usage.input_tokens (excluding cache reads and writes)
+        * usage.output_tokens
+        * usage.cache_read_input_tokens
+        * usage.cache_creation_input_tokens (counted as uncached input)
+        * usage.cache_creation.ephemeral_1h_input_tokens
+
     Args:
-        response: The OpenAI API response object
+        response: The API response object
+        schema: Usage schema to read (defaults to the model's provider's)
 
     Returns:
         Dict containing:
-            - prompt_tokens: Number of input tokens
+            - prompt_tokens: Number of input tokens (including cached ones)
             - completion_tokens: Number of output/completion tokens
             - cached_tokens: Number of cached tokens (or 0 if not present)
+            - cache_write_tokens, cache_write_1h_tokens: Number of input
+              tokens written to a 5-minute and a 1-hour prompt cache (only
+              present when the response reports cache writes)
 
     Raises:
         AttributeError: If the response doesn't contain usage information
+        ValueError: If the usage schema is unknown
     """
     if not hasattr(response, "usage"):
         raise AttributeError("Response object has no 'usage' attribute")
 
-    usage = response.usage
+    read = _usage_schema(getattr(response, "model", None), schema)[0]
+    return _usage_dict(read(response.usage))
 
-    # Determine which API schema we're working with
-    if hasattr(usage, "input_tokens"):  # Responses API schema
-        prompt_tokens = _get_attribute_safely(usage, "input_tokens")
-        completion_tokens = _get_attribute_safely(usage, "output_tokens")
-        cached_tokens = _get_attribute_safely(
-            usage, "input_tokens_details.cached_tokens"
-        )
-    else:  # Chat Completion API schema
-        prompt_tokens = _get_attribute_safely(usage, "prompt_tokens")
-        completion_tokens = _get_attribute_safely(usage, "completion_tokens")
-        cached_tokens = _get_attribute_safely(
-            usage, "prompt_tokens_details.cached_tokens"
-        )
 
+def _usage_dict(values: Tuple[Any, ...]) -> Dict[str, int]:
     # Ensure all values are integers
-    return {
-        "prompt_tokens": int(prompt_tokens),
-        "completion_tokens": int(completion_tokens),
-        "cached_tokens": int(cached_tokens),
+    usage = {
+        "prompt_tokens": int(values[0] or 0),
+        "completion_tokens": int(values[1] or 0),
+        "cached_tokens": int(values[2] or 0),
     }
+    if any(values[3:]):
+        usage["cache_write_tokens"] = int(values[3] or 0)
+        usage["cache_write_1h_tokens"] = int(values[4] or 0)
+    return usage
+
+
+def extract_usage_from_dict(
+    record: Dict[str, Any], schema: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Extract token usage information from a logged response dictionary.
+
+    Mirrors `extract_usage` for plain dictionaries such as lines of a JSONL
+    usage log. Accepts the same schemas, chosen by the record's "model"
+    field, either nested under a ``usage`` key or as top-level token columns.
+
+    Args:
+        record: A response dictionary or flat usage row
+        schema: Usage schema to read (defaults to the model's provider's)
+
+    Returns:
+        Dict containing:
+            - prompt_tokens: Number of input tokens
+            - completion_tokens: Number of output/completion tokens
+            - cached_tokens: Number of cached tokens (or 0 if not present)
+            - cache_write_tokens, cache_write_1h_tokens: As for
+              `extract_usage`
+
+    Raises:
+        ValueError: If the record doesn't contain usage information
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Record must be a dictionary")
+
+    usage = record.get("usage", record)
+    if not isinstance(usage, dict):
+        raise ValueError("Record 'usage' field must be a dictionary")
+
+    read = _usage_schema(record.get("model"), schema)[1]
+    return _usage_dict(read(usage))
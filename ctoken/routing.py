@@ -0,0 +1,202 @@
+"""
+Cost-optimal model routing.
+
+This module ranks the models of every registered provider shard (see
+`providers`) by their effective cost for a given token profile (prompt,
+completion and cached tokens) and answers "cheapest allowed model" queries
+from a precomputed, sorted index. Indexes are rebuilt automatically when the
+pricing data is refreshed or a provider is registered.
+
+Models are named the way `ctoken()` routes them: OpenAI models and models
+matching their provider's name prefixes ("claude-sonnet-4-5") by their bare
+name, other models with their provider prefix ("acme/acme-large").
+
+A price of 0 in the pricing data means the price is not published (for
+instance text output of an image model), so models missing a price the
+profile needs are left out of the ranking instead of being ranked as free.
+"""
+
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from . import pricing_data
+from .providers import DEFAULT_PROVIDER, get_provider, list_providers, split_model
+
+# Memoized allow-lists kept per router before the memo is reset
+_MAX_ALLOW_LISTS = 1024
+
+
+def _effective_cost(
+    rates: Dict[str, float],
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int,
+) -> float:
+    """
+    Compute the cost of a token profile with the same rules as `calculate_cost`.
+
+    Args:
+        rates: Pricing rates per million tokens
+        prompt_tokens: Number of input tokens (including cached ones)
+        completion_tokens: Number of output tokens
+        cached_tokens: Number of cached input tokens
+
+    Returns:
+        The cost in USD as a float
+    """
+    input_price = rates["input_price"]
+    cached_price = rates.get("cached_input_price") or input_price
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (
+        uncached * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * rates["output_price"]
+    ) / 1_000_000
+
+
+class ModelRouter:
+    """
+    Precomputed price index for one token profile.
+
+    Models are sorted once by effective cost; `cheapest` then walks the sorted
+    index until it meets an allowed model and memoizes the answer per
+    allow-list, so repeated queries are a single dictionary lookup.
+
+    Pass allow-lists as frozensets to hit the memoized fast path directly.
+
+    Routers can be shared between threads: queries take no lock, and a
+    rebuild publishes the new index and memo together.
+    """
+
+    def __init__(
+        self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0
+    ) -> None:
+        if min(prompt_tokens, completion_tokens, cached_tokens) < 0:
+            raise ValueError("Token counts must be non-negative")
+
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached_tokens = cached_tokens
+        # (pricing version, sorted (cost, model) pairs, allow-list -> cheapest)
+        self._state: Tuple[
+            int, List[Tuple[float, str]], Dict[Optional[FrozenSet[str]], Optional[str]]
+        ] = (-1, [], {})
+        self._lock = threading.Lock()
+
+    def _current(self) -> Tuple[Any, ...]:
+        """Get the index of the current pricing data, rebuilding it if stale."""
+        state = self._state
+        if state[0] != pricing_data._pricing_version:
+            with self._lock:
+                state = self._state
+                if state[0] != pricing_data._pricing_version:
+                    state = self._state = self._rebuild()
+        return state
+
+    def _rebuild(self) -> Tuple[Any, ...]:
+        """Rebuild the sorted index from the current pricing data."""
+        version, pricing = pricing_data.pricing_snapshot()
+        ranked: Dict[str, float] = {}
+        for name in list_providers():
+            provider = get_provider(name)
+            # The default shard's table is the snapshot, org price sheet included
+            table = pricing if name == DEFAULT_PROVIDER else provider.load()[0]
+            for (base, date), rates in table.items():
+                if date in (None, "latest"):
+                    model = base
+                elif provider.date_format == "compact":
+                    model = f"{base}-{date.replace('-', '')}"
+                else:
+                    model = f"{base}-{date}"
+                if split_model(model)[0] is not provider:
+                    model = f"{name}/{model}"
+                if model in ranked or not self._is_priced(rates):
+                    continue
+                ranked[model] = _effective_cost(
+                    rates,
+                    self.prompt_tokens,
+                    self.completion_tokens,
+                    self.cached_tokens,
+                )
+
+        return version, sorted((cost, model) for model, cost in ranked.items()), {}
+
+    def _is_priced(self, rates: Dict[str, float]) -> bool:
+        """Check that every price this profile is billed at is published."""
+        if self.prompt_tokens > self.cached_tokens and rates["input_price"] <= 0:
+            return False
+        return not (self.completion_tokens > 0 and rates["output_price"] <= 0)
+
+    def ranked(self) -> List[Tuple[str, float]]:
+        """
+        Get every known model ordered from cheapest to most expensive.
+
+        Returns:
+            List of (model, cost in USD) tuples
+        """
+        return [(model, cost) for cost, model in self._current()[1]]
+
+    def cheapest(self, allowed: Optional[Iterable[str]] = None) -> Optional[str]:
+        """
+        Find the cheapest model for this token profile.
+
+        Args:
+            allowed: Optional allow-list of model names; None allows every model
+
+        Returns:
+            The cheapest allowed model name, or None if no allowed model is priced
+        """
+        _, ranked, memo = self._current()
+
+        if allowed is not None and not isinstance(allowed, frozenset):
+            allowed = frozenset(allowed)
+
+        try:
+            return memo[allowed]
+        except KeyError:
+            pass
+
+        best = None
+        for _, model in ranked:
+            if allowed is None or model in allowed:
+                best = model
+                break
+
+        if len(memo) >= _MAX_ALLOW_LISTS:
+            memo.clear()
+        memo[allowed] = best
+        return best
+
+
+# Routers keyed by token profile, shared by `cheapest_model`
+_routers: Dict[Tuple[int, int, int], ModelRouter] = {}
+_MAX_ROUTERS = 1024
+
+
+def cheapest_model(
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    allowed: Optional[Iterable[str]] = None,
+) -> Optional[str]:
+    """
+    Find the cheapest model for an estimated token profile.
+
+    Args:
+        prompt_tokens: Estimated number of input tokens
+        completion_tokens: Estimated number of output tokens
+        cached_tokens: Estimated number of cached input tokens
+        allowed: Optional allow-list of model names that meet the caller's
+            capability constraints
+
+    Returns:
+        The cheapest allowed model name, or None if no allowed model is priced
+    """
+    profile = (prompt_tokens, completion_tokens, cached_tokens)
+    router = _routers.get(profile)
+    if router is None:
+        if len(_routers) >= _MAX_ROUTERS:
+            _routers.clear()
+        # Threads racing on a new profile share whichever router lands first
+        router = _routers.setdefault(profile, ModelRouter(*profile))
+    return router.cheapest(allowed)
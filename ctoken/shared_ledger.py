@@ -0,0 +1,461 @@
+"""
+Cross-process cost ledger in shared memory.
+
+`SharedLedger` keeps exact per-model subtotals in one
+`multiprocessing.shared_memory` block that every worker process updates
+directly, without a server process or a lock on the hot path. Each process
+writes only its own stripe of counter rows, and every row is guarded by a
+sequence counter (a seqlock), so readers in any process can take a snapshot
+in which every record is either fully counted or not at all. Models are
+registered in a shared directory the first time any process sees them.
+
+Layout (all integers are native int64):
+
+    header   magic, max_models, max_workers, model count, stripes claimed
+    names    max_models x 64-byte UTF-8 model names
+    owners   max_workers x pid of the process writing each stripe
+    stripes  max_workers x max_models x (sequence, 7 counters)
+
+Once every stripe is claimed, a new process takes over the stripe of a
+process that has exited (e.g. a recycled pool worker) and keeps adding to
+its counters, so worker churn never exhausts ``max_workers``.
+
+Example:
+    ledger = SharedLedger()
+    with multiprocessing.Pool(8, initializer=init, initargs=(ledger,)) as pool:
+        ...  # Workers call ledger.add_response(response)
+    print(ledger.snapshot().report()["total_cost"])
+    ledger.unlink()
+"""
+
+import multiprocessing
+import os
+import struct
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import engine, pricing_data
+from .ledger import _ROW_SIZE, CostLedger, accumulate
+from .token_estimator import CostEstimateError
+
+_MAGIC = 0x63746F6B656E4C32  # "ctokenL2"
+
+_HEADER_WORDS = 8
+_MAGIC_WORD, _MODELS_WORD, _WORKERS_WORD, _COUNT_WORD, _CLAIMED_WORD = range(5)
+
+_NAME_BYTES = 64
+
+# A counter row plus its sequence word
+_ROW_WORDS = 1 + _ROW_SIZE
+_WORD = struct.Struct("q")
+_ROW = struct.Struct(f"{_ROW_WORDS}q")
+_COUNTERS = struct.Struct(f"{_ROW_SIZE}q")
+
+# Snapshot retries per row before giving up on a row being rewritten
+_MAX_RETRIES = 100_000
+
+_INT64_MAX = 2**63 - 1
+
+
+def _alive(pid: int) -> bool:
+    """Whether a process exists (always assumed on Windows)."""
+    if os.name == "nt":
+        # os.kill would terminate the process there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, owned by another user
+    return True
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block without tying its lifetime to this process."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+
+    from multiprocessing import resource_tracker
+
+    # Before 3.13 attaching registers the block with this process's resource
+    # tracker. Processes started by multiprocessing share their parent's
+    # tracker, where the owner's registration already exists; any other
+    # process has its own tracker, which would unlink the block on exit
+    shared_tracker = getattr(resource_tracker._resource_tracker, "_fd", None)
+    block = shared_memory.SharedMemory(name=name)
+    if shared_tracker is None:
+        resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+class SharedLedger:
+    """
+    Exact per-model cost subtotals shared by several processes.
+
+    Pass the ledger to worker processes (e.g. as a `Process` argument or a
+    `Pool` initializer argument); each process claims its own stripe on first
+    write. Threads within a process share that stripe through a local lock.
+
+    Args:
+        max_models: Number of distinct models the ledger can hold
+        max_workers: Number of processes that can write to the ledger
+        name: Name of the shared memory block (random by default)
+        mp_context: Multiprocessing context the worker processes are started
+            from (defaults to the default context)
+
+    Raises:
+        ValueError: If a size is not positive
+    """
+
+    def __init__(
+        self,
+        max_models: int = 256,
+        max_workers: int = 64,
+        name: Optional[str] = None,
+        mp_context: Any = None,
+    ) -> None:
+        if max_models < 1 or max_workers < 1:
+            raise ValueError("max_models and max_workers must be positive")
+
+        size = self._size(max_models, max_workers)
+        block = shared_memory.SharedMemory(name=name, create=True, size=size)
+        lock = (mp_context or multiprocessing).Lock()
+        self._setup(block, lock, owner=True)
+        self._set_word(_MODELS_WORD, max_models)
+        self._set_word(_WORKERS_WORD, max_workers)
+        self._set_word(_MAGIC_WORD, _MAGIC)
+
+    @staticmethod
+    def _size(max_models: int, max_workers: int) -> int:
+        stripe = max_models * _ROW_WORDS * 8
+        header = _HEADER_WORDS * 8 + max_models * _NAME_BYTES + max_workers * 8
+        return header + max_workers * stripe
+
+    def _setup(self, block: shared_memory.SharedMemory, lock: Any, owner: bool) -> None:
+        self._block = block
+        self._lock = lock
+        self._owner = owner
+
+        # Process-local state, reset in forked children (see _stripe)
+        self._pid = -1
+        self._stripe_offset = 0
+        self._local_lock = threading.Lock()
+        self._slots: Dict[str, int] = {}
+        # (pid, pricing version, model -> (byte offset of its row in this
+        # process's stripe, rates)), replaced as a whole
+        self._rows: Tuple[int, int, Dict[str, Tuple[int, engine.Rates]]] = (
+            -1,
+            -1,
+            {},
+        )
+
+    # Words are read and written through struct rather than a cast
+    # memoryview, which would keep the block from closing at interpreter exit
+    def _word(self, index: int) -> int:
+        return _WORD.unpack_from(self._block.buf, index * 8)[0]
+
+    def _set_word(self, index: int, value: int) -> None:
+        _WORD.pack_into(self._block.buf, index * 8, value)
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block, for `SharedLedger.attach`."""
+        return self._block.name
+
+    @property
+    def max_models(self) -> int:
+        return self._word(_MODELS_WORD)
+
+    @property
+    def max_workers(self) -> int:
+        return self._word(_WORKERS_WORD)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedLedger":
+        """
+        Attach read-only to a ledger created by another process.
+
+        The returned ledger can take snapshots but not record.
+
+        Args:
+            name: The ledger's `name`
+
+        Raises:
+            ValueError: If the block does not hold a ledger
+        """
+        ledger = cls.__new__(cls)
+        ledger._setup(_attach(name), None, owner=False)
+        if ledger._word(_MAGIC_WORD) != _MAGIC:
+            ledger.close()
+            raise ValueError(f"Shared memory block {name!r} is not a ledger")
+        return ledger
+
+    def __getstate__(self) -> Dict[str, Any]:
+        if self._lock is None:
+            raise TypeError("Read-only ledgers cannot be sent to other processes")
+        return {"name": self.name, "lock": self._lock}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._setup(_attach(state["name"]), state["lock"], owner=False)
+
+    # Offsets, in int64 words
+    def _names_offset(self) -> int:
+        return _HEADER_WORDS * 8
+
+    def _owners_word(self) -> int:
+        return (_HEADER_WORDS * 8 + self.max_models * _NAME_BYTES) // 8
+
+    def _stripes_word(self) -> int:
+        return self._owners_word() + self.max_workers
+
+    def _stripe_words(self) -> int:
+        return self.max_models * _ROW_WORDS
+
+    def _stripe(self) -> int:
+        """Get this process's stripe offset, claiming one on first use."""
+        pid = os.getpid()
+        if self._pid != pid:
+            if self._lock is None:
+                raise ValueError("Ledger was attached read-only")
+            # First write in this process (or a forked child of a writer); the
+            # shared lock also keeps this process's threads from both claiming
+            with self._lock:
+                if self._pid != pid:
+                    index = self._claim(pid)
+                    self._local_lock = threading.Lock()
+                    self._stripe_offset = (
+                        self._stripes_word() + index * self._stripe_words()
+                    )
+                    self._pid = pid  # Published last
+        return self._stripe_offset
+
+    def _claim(self, pid: int) -> int:
+        """Claim a free stripe, or the stripe of an exited process."""
+        owners = self._owners_word()
+        claimed = self._word(_CLAIMED_WORD)
+        if claimed < self.max_workers:
+            self._set_word(owners + claimed, pid)
+            self._set_word(_CLAIMED_WORD, claimed + 1)
+            return claimed
+
+        for index in range(claimed):
+            if not _alive(self._word(owners + index)):
+                break
+        else:
+            raise CostEstimateError(
+                f"Ledger is full: all {self.max_workers} worker stripes are"
+                " claimed by running processes"
+            )
+        # A process that died mid-update leaves its row's sequence odd
+        first = self._stripes_word() + index * self._stripe_words()
+        for slot in range(self.max_models):
+            offset = (first + slot * _ROW_WORDS) * 8
+            seq = _WORD.unpack_from(self._block.buf, offset)[0]
+            if seq & 1:
+                _WORD.pack_into(self._block.buf, offset, seq + 1)
+        self._set_word(owners + index, pid)
+        return index
+
+    def _read_names(self, start: int, count: int) -> List[str]:
+        buf = self._block.buf
+        names = []
+        for index in range(start, count):
+            offset = self._names_offset() + index * _NAME_BYTES
+            raw = bytes(buf[offset : offset + _NAME_BYTES])
+            names.append(raw.rstrip(b"\0").decode("utf-8"))
+        return names
+
+    def _slot(self, model: str) -> int:
+        """Get a model's slot, registering the model on first sight."""
+        slot = self._slots.get(model)
+        if slot is not None:
+            return slot
+
+        encoded = model.encode("utf-8")
+        if not encoded or len(encoded) > _NAME_BYTES or b"\0" in encoded:
+            raise ValueError(f"Model name {model!r} cannot be stored in the ledger")
+
+        with self._lock:
+            # Pick up models registered by other processes meanwhile; the
+            # local slots are always a prefix of the shared directory
+            count = self._word(_COUNT_WORD)
+            start = len(self._slots)
+            for index, name in enumerate(self._read_names(start, count), start):
+                self._slots[name] = index
+            slot = self._slots.get(model)
+            if slot is None:
+                if count >= self.max_models:
+                    raise CostEstimateError(
+                        f"Ledger is full: all {self.max_models} model slots are used"
+                    )
+                offset = self._names_offset() + count * _NAME_BYTES
+                self._block.buf[offset : offset + len(encoded)] = encoded
+                # Publish the name only once it is written
+                self._set_word(_COUNT_WORD, count + 1)
+                slot = self._slots[model] = count
+        return slot
+
+    def add(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        cache_write_1h_tokens: int = 0,
+    ) -> None:
+        """
+        Add one request's token usage to the shared subtotals.
+
+        Args:
+            model: The model identifier
+            prompt_tokens: Number of input tokens (including cached ones)
+            completion_tokens: Number of output tokens
+            cached_tokens: Number of cached input tokens
+            cache_write_tokens: Number of input tokens written to a 5-minute
+                prompt cache
+            cache_write_1h_tokens: Number of input tokens written to a 1-hour
+                prompt cache
+
+        Raises:
+            CostEstimateError: If no pricing data can be found for the model,
+                if the ledger has no free model slot or worker stripe, or if
+                a counter would overflow int64
+        """
+        pid, version, rows = self._rows
+        entry = None
+        if pid == os.getpid() and version == pricing_data._pricing_version:
+            entry = rows.get(model)
+        if entry is None:
+            entry = self._row_for(model)
+        offset, rates = entry
+
+        uncached = prompt_tokens - cached_tokens
+        uncached_cost = uncached * rates[0] if uncached > 0 else 0
+        if cache_write_tokens or cache_write_1h_tokens:
+            uncached_cost += engine.write_premium(
+                rates, cache_write_tokens, cache_write_1h_tokens
+            )
+        buf = self._block.buf
+        with self._local_lock:
+            seq, *row = _ROW.unpack_from(buf, offset)
+            values = (
+                row[0] + 1,
+                row[1] + prompt_tokens,
+                row[2] + completion_tokens,
+                row[3] + cached_tokens,
+                row[4] + uncached_cost,
+                row[5] + cached_tokens * rates[1],
+                row[6] + completion_tokens * rates[2],
+            )
+            # Checked before the row is marked as being written, so a
+            # rejected record leaves the row readable
+            if max(values) > _INT64_MAX:
+                raise CostEstimateError(
+                    f"Ledger counter overflow for model '{model}': a subtotal"
+                    " would exceed the int64 range of a shared row"
+                )
+            # Odd sequence: readers retry until the row update is complete
+            _WORD.pack_into(buf, offset, seq + 1)
+            _COUNTERS.pack_into(buf, offset + 8, *values)
+            _WORD.pack_into(buf, offset, seq + 2)
+
+    def _row_for(self, model: str) -> Tuple[int, engine.Rates]:
+        # Version before rates; a stale thread fills a discarded cache
+        current = pricing_data._pricing_version
+        stripe = self._stripe()
+        pid = os.getpid()
+        cached_pid, version, rows = self._rows
+        if cached_pid != pid or version != current:
+            rows = {}
+            if cached_pid != pid or current > version:
+                self._rows = (pid, current, rows)
+
+        rates = engine.model_rates(model)
+        if rates is None:
+            raise CostEstimateError(f"No pricing data found for model '{model}'")
+        seq = stripe + self._slot(model) * _ROW_WORDS
+        entry = rows[model] = (seq * 8, rates)
+        return entry
+
+    def add_usage(self, model: str, usage: Dict[str, int]) -> None:
+        """
+        Add a usage dictionary as returned by `extract_usage`.
+
+        Args:
+            model: The model identifier
+            usage: Dict with prompt_tokens, completion_tokens and cached_tokens
+                (and cache writes, if any)
+        """
+        self.add(
+            model,
+            usage["prompt_tokens"],
+            usage["completion_tokens"],
+            usage.get("cached_tokens", 0),
+            usage.get("cache_write_tokens", 0),
+            usage.get("cache_write_1h_tokens", 0),
+        )
+
+    def add_response(self, response: Any) -> None:
+        """
+        Add an OpenAI API response (Chat Completions or Responses API).
+
+        Args:
+            response: The OpenAI API response object
+        """
+        accumulate(response, self)  # type: ignore[arg-type]
+
+    def _read_row(self, seq: int) -> List[int]:
+        buf, offset = self._block.buf, seq * 8
+        for _ in range(_MAX_RETRIES):
+            before, *values = _ROW.unpack_from(buf, offset)
+            if before & 1:
+                continue
+            if _WORD.unpack_from(buf, offset)[0] == before:
+                return values
+        raise CostEstimateError("Ledger row is being rewritten continuously")
+
+    def snapshot(self) -> CostLedger:
+        """
+        Copy the current subtotals of every process into a CostLedger.
+
+        Every record is either fully included or not at all; records made
+        while the snapshot is taken may or may not be included.
+
+        Returns:
+            A CostLedger holding one subtotal per model
+        """
+        count = self._word(_COUNT_WORD)
+        names = self._read_names(0, count)
+        first, size = self._stripes_word(), self._stripe_words()
+        claimed = self._word(_CLAIMED_WORD)
+
+        ledger = CostLedger()
+        for slot, model in enumerate(names):
+            for index in range(claimed):
+                row = self._read_row(first + index * size + slot * _ROW_WORDS)
+                if row[0]:
+                    ledger.add_subtotal(model, *row)
+        return ledger
+
+    def close(self) -> None:
+        """Detach this process from the shared memory block."""
+        self._block.close()
+
+    def unlink(self) -> None:
+        """Detach and free the shared memory block (call once, in the owner)."""
+        self.close()
+        self._block.unlink()
+
+    def __enter__(self) -> "SharedLedger":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._owner:
+            self.unlink()
+        else:
+            self.close()
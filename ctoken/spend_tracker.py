@@ -0,0 +1,377 @@
+"""
+Rolling-window spend rates.
+
+`SpendTracker` answers "how much did we spend in the last minute / hour /
+day" per model and per caller-defined key (an API key, tenant or feature)
+without keeping raw events. Every window is a ring of time buckets holding
+exact integer picodollars plus a running total, so recording and querying are
+O(1) and each tracked model or key uses a fixed amount of memory.
+
+Example:
+    tracker = SpendTracker(windows=("1m", "1h", "24h"))
+    tracker.record_response(response, key="team-search")
+    if tracker.rate("1m", key="team-search") > 0.50:  # USD per minute
+        alert(...)
+    seconds = tracker.seconds_until_exhausted(100.0, window="1h")
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .engine import PICODOLLARS_PER_USD
+from .ledger import CostLedger
+from .response_parser import extract_usage
+
+Window = Union[str, float]
+
+DEFAULT_WINDOWS = ("1m", "1h", "24h")
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_WINDOW_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd])\s*$")
+
+
+def parse_window(window: Window) -> float:
+    """
+    Convert a window such as "1m", "6h" or 30 (seconds) to seconds.
+
+    Raises:
+        ValueError: If the window is not a positive duration
+    """
+    if isinstance(window, str):
+        match = _WINDOW_RE.match(window)
+        if match is None:
+            raise ValueError(f"Invalid window {window!r}; expected e.g. '90s', '1h'")
+        seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    else:
+        seconds = float(window)
+    if not seconds > 0:
+        raise ValueError(f"Window must be positive, got {window!r}")
+    return seconds
+
+
+def _timestamp(value: Union[None, float, datetime]) -> float:
+    if value is None:
+        return time.time()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+class _Ring:
+    """Picodollars per time bucket for one window of one series."""
+
+    __slots__ = ("slots", "total", "head")
+
+    def __init__(self, buckets: int) -> None:
+        self.slots = [0] * buckets
+        self.total = 0
+        self.head = -1  # Absolute index of the newest bucket
+
+    def advance(self, index: int) -> None:
+        """Move the newest bucket to `index`, expiring the buckets passed."""
+        slots = self.slots
+        buckets = len(slots)
+        if index - self.head >= buckets:
+            for i in range(buckets):
+                slots[i] = 0
+            self.total = 0
+        else:
+            total = self.total
+            for i in range(self.head + 1, index + 1):
+                i %= buckets
+                total -= slots[i]
+                slots[i] = 0
+            self.total = total
+        self.head = index
+
+
+class SpendTracker:
+    """
+    Track spend over rolling time windows, per model and per key.
+
+    Each window is split into `buckets` equal time buckets, so window sums
+    have a resolution of one bucket (1 second for "1m" with the default 60
+    buckets): the oldest bucket expires as a whole. Amounts are exact integer
+    picodollars; late records are counted in the windows they still fall in.
+
+    Args:
+        windows: Window durations, as strings ("90s", "1m", "6h", "1d") or
+            seconds
+        buckets: Number of buckets per window
+
+    Raises:
+        ValueError: If a window is not a positive duration or there are fewer
+            than 2 buckets
+    """
+
+    def __init__(
+        self, windows: Sequence[Window] = DEFAULT_WINDOWS, buckets: int = 60
+    ) -> None:
+        if buckets < 2:
+            raise ValueError("At least 2 buckets per window are required")
+        if not windows:
+            raise ValueError("At least one window is required")
+
+        self.buckets = buckets
+        self._windows: Dict[float, int] = {}
+        for window in windows:
+            self._windows.setdefault(parse_window(window), len(self._windows))
+        # Window as given (e.g. "1m") -> position, to skip parsing on queries
+        self._positions: Dict[Window, int] = {
+            window: self._windows[parse_window(window)] for window in windows
+        }
+        # Window durations and bucket widths, in window order
+        self._spans = list(self._windows)
+        self._widths = [seconds / buckets for seconds in self._spans]
+
+        self._pricer = CostLedger()
+        self._series: Dict[Tuple[str, str], List[_Ring]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def windows(self) -> List[float]:
+        """Window durations in seconds."""
+        return list(self._spans)
+
+    def _rings(self, series: Tuple[str, str]) -> List[_Ring]:
+        rings = self._series.get(series)
+        if rings is None:
+            rings = self._series[series] = [_Ring(self.buckets) for _ in self._widths]
+        return rings
+
+    def _add(self, amount: int, model: str, key: Optional[str], ts: float) -> None:
+        buckets = self.buckets
+        positions = []
+        for width in self._widths:
+            index = int(ts // width)
+            positions.append((index, index % buckets))
+        with self._lock:
+            targets = [self._rings(("total", "")), self._rings(("model", model))]
+            if key is not None:
+                targets.append(self._rings(("key", key)))
+            for rings in targets:
+                for ring, (index, slot) in zip(rings, positions):
+                    if index != ring.head:
+                        if index > ring.head:
+                            ring.advance(index)
+                        elif index <= ring.head - buckets:
+                            continue  # Already outside this window
+                    ring.slots[slot] += amount
+                    ring.total += amount
+
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        key: Optional[str] = None,
+        timestamp: Union[None, float, datetime] = None,
+        cache_write_tokens: int = 0,
+        cache_write_1h_tokens: int = 0,
+    ) -> None:
+        """
+        Record one request's token usage.
+
+        Args:
+            model: The model identifier
+            prompt_tokens: Number of input tokens (including cached ones)
+            completion_tokens: Number of output tokens
+            cached_tokens: Number of cached input tokens
+            key: Optional key to also track the spend under
+            timestamp: When the request happened (defaults to now), as a Unix
+                timestamp or datetime
+            cache_write_tokens: Number of input tokens written to a 5-minute
+                prompt cache
+            cache_write_1h_tokens: Number of input tokens written to a 1-hour
+                prompt cache
+
+        Raises:
+            CostEstimateError: If no pricing data can be found for the model
+        """
+        amount = sum(
+            self._pricer.price(
+                model,
+                prompt_tokens,
+                completion_tokens,
+                cached_tokens,
+                cache_write_tokens,
+                cache_write_1h_tokens,
+            )
+        )
+        self._add(amount, model, key, _timestamp(timestamp))
+
+    def record_response(
+        self,
+        response: Any,
+        key: Optional[str] = None,
+        timestamp: Union[None, float, datetime] = None,
+    ) -> None:
+        """
+        Record an OpenAI API response (Chat Completions or Responses API).
+
+        Args:
+            response: The OpenAI API response object
+            key: Optional key to also track the spend under
+            timestamp: When the request happened (defaults to now)
+        """
+        usage = extract_usage(response)
+        self.record(
+            response.model,
+            usage["prompt_tokens"],
+            usage["completion_tokens"],
+            usage["cached_tokens"],
+            key,
+            timestamp,
+            usage.get("cache_write_tokens", 0),
+            usage.get("cache_write_1h_tokens", 0),
+        )
+
+    def record_cost(
+        self,
+        model: str,
+        cost: Union[float, Mapping[str, Any]],
+        key: Optional[str] = None,
+        timestamp: Union[None, float, datetime] = None,
+    ) -> None:
+        """
+        Record an already-computed cost, such as a `ctoken()` result.
+
+        Args:
+            model: The model identifier
+            cost: A cost in USD, or a mapping with a "total_cost" field
+            key: Optional key to also track the spend under
+            timestamp: When the request happened (defaults to now)
+        """
+        if isinstance(cost, Mapping):
+            cost = cost["total_cost"]
+        amount = round(float(cost) * PICODOLLARS_PER_USD)
+        self._add(amount, model, key, _timestamp(timestamp))
+
+    def _picodollars(
+        self,
+        window: Window,
+        model: Optional[str],
+        key: Optional[str],
+        now: Union[None, float, datetime],
+    ) -> Tuple[int, float]:
+        position = self._positions.get(window)
+        if position is None:
+            position = self._windows.get(parse_window(window))
+            if position is None:
+                raise ValueError(f"Window {window!r} is not tracked")
+        width, seconds = self._widths[position], self._spans[position]
+        if model is not None and key is not None:
+            raise ValueError("Query either a model or a key, not both")
+        if model is not None:
+            series = ("model", model)
+        elif key is not None:
+            series = ("key", key)
+        else:
+            series = ("total", "")
+
+        index = int(_timestamp(now) // width)
+        with self._lock:
+            rings = self._series.get(series)
+            if rings is None:
+                return 0, seconds
+            ring = rings[position]
+            if index > ring.head:
+                ring.advance(index)
+            return ring.total, seconds
+
+    def spend(
+        self,
+        window: Window,
+        model: Optional[str] = None,
+        key: Optional[str] = None,
+        now: Union[None, float, datetime] = None,
+    ) -> float:
+        """
+        Get the spend in USD over a window, for all traffic, a model or a key.
+
+        Args:
+            window: One of the tracked windows
+            model: Only include this model
+            key: Only include this key
+            now: End of the window (defaults to now)
+
+        Returns:
+            Spend in USD
+
+        Raises:
+            ValueError: If the window is not tracked, or both a model and a
+                key are given
+        """
+        picodollars, _ = self._picodollars(window, model, key, now)
+        return picodollars / PICODOLLARS_PER_USD
+
+    def rate(
+        self,
+        window: Window,
+        model: Optional[str] = None,
+        key: Optional[str] = None,
+        now: Union[None, float, datetime] = None,
+    ) -> float:
+        """
+        Get the average burn rate over a window, in USD per minute.
+
+        Args:
+            window: One of the tracked windows
+            model: Only include this model
+            key: Only include this key
+            now: End of the window (defaults to now)
+
+        Returns:
+            Spend rate in USD per minute
+        """
+        picodollars, seconds = self._picodollars(window, model, key, now)
+        return picodollars * 60 / (seconds * PICODOLLARS_PER_USD)
+
+    def seconds_until_exhausted(
+        self,
+        budget: float,
+        spent: Optional[float] = None,
+        window: Window = "1h",
+        model: Optional[str] = None,
+        key: Optional[str] = None,
+        now: Union[None, float, datetime] = None,
+    ) -> Optional[float]:
+        """
+        Project when a budget runs out if spending continues at the current rate.
+
+        Args:
+            budget: Budget in USD
+            spent: Amount of the budget already used, in USD (defaults to the
+                spend over the longest tracked window)
+            window: Window whose average rate is projected
+            model: Only consider this model
+            key: Only consider this key
+            now: Current time (defaults to now)
+
+        Returns:
+            Seconds until the budget is exhausted, 0.0 if it already is, or
+            None if nothing was spent in the window
+        """
+        if spent is None:
+            spent = self.spend(max(self._windows), model, key, now)
+        remaining = budget - spent
+        if remaining <= 0:
+            return 0.0
+        per_minute = self.rate(window, model, key, now)
+        if per_minute <= 0:
+            return None
+        return remaining * 60 / per_minute
+
+    def models(self) -> List[str]:
+        """Models with recorded spend."""
+        with self._lock:
+            return [name for kind, name in self._series if kind == "model"]
+
+    def keys(self) -> List[str]:
+        """Keys with recorded spend."""
+        with self._lock:
+            return [name for kind, name in self._series if kind == "key"]
@@ -0,0 +1,392 @@
+"""
+Durable cost ledger backed by SQLite.
+
+`SQLiteLedger` records one row per request without ever blocking the caller on
+disk I/O: records are priced in the calling thread (exact picodollars, from
+the cost engine's compiled rates) and put on a bounded in-memory queue, and a
+background writer drains the queue in batches, each written in a single
+transaction to a WAL-mode database. When the queue is full the configured
+backpressure policy decides whether callers wait, records are dropped, or an
+error is raised.
+
+Example:
+    with SQLiteLedger("spend.sqlite3") as ledger:
+        ledger.record_response(response)
+        ...
+        ledger.flush()
+        print(ledger.totals_by_model().report()["total_cost"])
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from . import engine
+from .ledger import CostLedger
+from .response_parser import extract_usage
+from .token_estimator import CostEstimateError
+
+# Backpressure policies applied when the queue is full
+BLOCK = "block"  # Wait for the writer to make room
+DROP = "drop"  # Discard the record and count it in `dropped`
+RAISE = "raise"  # Raise queue.Full
+POLICIES = (BLOCK, DROP, RAISE)
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS records (
+        ts REAL NOT NULL,
+        model TEXT NOT NULL,
+        prompt_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        cached_tokens INTEGER NOT NULL,
+        uncached_cost INTEGER NOT NULL,
+        cached_cost INTEGER NOT NULL,
+        output_cost INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS records_ts ON records (ts)",
+)
+
+_INSERT = "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+_TOTALS = (
+    "COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cached_tokens),"
+    " SUM(uncached_cost), SUM(cached_cost), SUM(output_cost)"
+)
+
+Record = Tuple[float, str, int, int, int, int, int, int]
+
+
+def _timestamp(value: Union[None, float, datetime]) -> Optional[float]:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+class SQLiteLedger:
+    """
+    Record per-request costs to SQLite from a background writer thread.
+
+    Amounts are stored as exact integer picodollars; the query helpers sum
+    them in SQL and return `CostLedger` objects, so reports round once, like
+    in-memory ledgers. SQLite sums are 64-bit, which bounds one query group
+    at about 9.2 million USD (larger sums raise an overflow error rather than
+    lose precision).
+
+    Args:
+        path: Database file (created if missing)
+        max_queue: Maximum number of records waiting to be written
+        batch_size: Maximum number of records written per transaction
+        policy: What `record` does when the queue is full: "block" (wait),
+            "drop" (discard and count in `dropped`) or "raise" (queue.Full)
+
+    Raises:
+        ValueError: If the policy is unknown or a size is not positive
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        max_queue: int = 65_536,
+        batch_size: int = 8_192,
+        policy: str = BLOCK,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, got {policy!r}")
+        if max_queue < 1 or batch_size < 1:
+            raise ValueError("max_queue and batch_size must be positive")
+
+        self.path = os.fspath(path)
+        self.batch_size = batch_size
+        self.policy = policy
+        self.dropped = 0
+
+        self.max_queue = max_queue
+
+        # Records waiting for the writer, which swaps the whole list out at
+        # once; queued/written count records for flush()
+        self._pending: List[Record] = []
+        self._queued = 0
+        self._written = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+        self._writer = threading.Thread(
+            target=self._run, args=(conn,), name="ctoken-sqlite-ledger", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL makes NORMAL durable against application crashes; only an OS
+        # crash can lose the last transactions
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self, conn: sqlite3.Connection) -> None:
+        cond = self._cond
+        try:
+            while True:
+                with cond:
+                    while not self._pending and not self._closed:
+                        cond.wait()
+                    batch, self._pending = self._pending, []
+                    # Room was made for callers blocked on a full queue
+                    cond.notify_all()
+                if not batch:
+                    return  # Closed and drained
+
+                for start in range(0, len(batch), self.batch_size):
+                    if self._error is not None:
+                        break
+                    try:
+                        with conn:
+                            conn.executemany(
+                                _INSERT, batch[start : start + self.batch_size]
+                            )
+                    except BaseException as e:  # Surfaced by flush/close
+                        self._error = e
+
+                with cond:
+                    self._written += len(batch)
+                    cond.notify_all()
+        finally:
+            conn.close()
+
+    def _raise_write_error(self) -> None:
+        error = self._error
+        if error is not None:
+            raise CostEstimateError(f"Ledger write failed: {error}") from error
+
+    def record(
+        self,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        timestamp: Union[None, float, datetime] = None,
+        cache_write_tokens: int = 0,
+        cache_write_1h_tokens: int = 0,
+    ) -> bool:
+        """
+        Queue one request's token usage for writing.
+
+        Args:
+            model: The model identifier
+            prompt_tokens: Number of input tokens (including cached ones)
+            completion_tokens: Number of output tokens
+            cached_tokens: Number of cached input tokens
+            timestamp: When the request happened (defaults to now), as a Unix
+                timestamp or datetime
+            cache_write_tokens: Number of input tokens written to a 5-minute
+                prompt cache (priced into the uncached input cost)
+            cache_write_1h_tokens: Number of input tokens written to a 1-hour
+                prompt cache
+
+        Returns:
+            True if the record was queued, False if the "drop" policy
+            discarded it
+
+        Raises:
+            CostEstimateError: If no pricing data can be found for the model,
+                or if a previous batch failed to be written
+            queue.Full: If the queue is full under the "raise" policy
+        """
+        self._raise_write_error()
+        rates = engine.model_rates(model)
+        if rates is None:
+            raise CostEstimateError(f"No pricing data found for model '{model}'")
+        uncached, cached, output = engine.price(
+            rates,
+            prompt_tokens,
+            completion_tokens,
+            cached_tokens,
+            cache_write_tokens,
+            cache_write_1h_tokens,
+        )
+        ts = time.time() if timestamp is None else _timestamp(timestamp)
+        item = (
+            ts,
+            model,
+            prompt_tokens,
+            completion_tokens,
+            cached_tokens,
+            uncached,
+            cached,
+            output,
+        )
+
+        with self._cond:
+            if self._closed:
+                raise ValueError("Ledger is closed")
+            pending = self._pending
+            if len(pending) >= self.max_queue:
+                if self.policy == DROP:
+                    self.dropped += 1
+                    return False
+                if self.policy == RAISE:
+                    raise queue.Full
+                while len(self._pending) >= self.max_queue:
+                    self._cond.wait()
+                pending = self._pending
+            pending.append(item)
+            self._queued += 1
+            if len(pending) == 1:
+                # The writer only sleeps while nothing is pending
+                self._cond.notify_all()
+        return True
+
+    def record_response(
+        self, response: Any, timestamp: Union[None, float, datetime] = None
+    ) -> bool:
+        """
+        Queue an OpenAI API response (Chat Completions or Responses API).
+
+        Args:
+            response: The OpenAI API response object
+            timestamp: When the request happened (defaults to the response's
+                ``created`` time, then now)
+
+        Returns:
+            True if the record was queued, False if it was dropped
+        """
+        usage = extract_usage(response)
+        if timestamp is None:
+            created = getattr(response, "created", None) or getattr(
+                response, "created_at", None
+            )
+            if isinstance(created, (int, float)):
+                timestamp = created
+        return self.record(
+            response.model,
+            usage["prompt_tokens"],
+            usage["completion_tokens"],
+            usage["cached_tokens"],
+            timestamp,
+            usage.get("cache_write_tokens", 0),
+            usage.get("cache_write_1h_tokens", 0),
+        )
+
+    def flush(self) -> None:
+        """
+        Wait until every queued record is written and committed.
+
+        Raises:
+            CostEstimateError: If a batch failed to be written
+        """
+        with self._cond:
+            target = self._queued
+            while self._written < target and self._writer.is_alive():
+                self._cond.wait()
+        self._raise_write_error()
+
+    def close(self) -> None:
+        """Write the remaining records and stop the writer thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._raise_write_error()
+
+    def __enter__(self) -> "SQLiteLedger":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _query(self, sql: str, params: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _where(
+        model: Optional[str],
+        since: Union[None, float, datetime],
+        until: Union[None, float, datetime],
+    ) -> Tuple[str, Tuple[Any, ...]]:
+        clauses, params = [], []
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(_timestamp(until))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, tuple(params)
+
+    def totals_by_model(
+        self,
+        since: Union[None, float, datetime] = None,
+        until: Union[None, float, datetime] = None,
+    ) -> CostLedger:
+        """
+        Sum the written records per model.
+
+        Only committed records are included; call `flush()` first to include
+        everything recorded so far.
+
+        Args:
+            since: Only include records at or after this time
+            until: Only include records before this time
+
+        Returns:
+            A CostLedger holding one subtotal per model
+        """
+        where, params = self._where(None, since, until)
+        ledger = CostLedger()
+        for model, *totals in self._query(
+            f"SELECT model, {_TOTALS} FROM records{where} GROUP BY model", params
+        ):
+            ledger.add_subtotal(model, *totals)
+        return ledger
+
+    def totals_by_day(
+        self,
+        model: Optional[str] = None,
+        since: Union[None, float, datetime] = None,
+        until: Union[None, float, datetime] = None,
+    ) -> Dict[str, CostLedger]:
+        """
+        Sum the written records per UTC day and model.
+
+        Args:
+            model: Only include this model
+            since: Only include records at or after this time
+            until: Only include records before this time
+
+        Returns:
+            Dict mapping "YYYY-MM-DD" to a CostLedger of that day's records,
+            in date order
+        """
+        where, params = self._where(model, since, until)
+        days: Dict[str, CostLedger] = {}
+        for day, name, *totals in self._query(
+            f"SELECT date(ts, 'unixepoch') AS day, model, {_TOTALS}"
+            f" FROM records{where} GROUP BY day, model ORDER BY day",
+            params,
+        ):
+            ledger = days.get(day)
+            if ledger is None:
+                ledger = days[day] = CostLedger()
+            ledger.add_subtotal(name, *totals)
+        return days
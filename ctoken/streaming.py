@@ -0,0 +1,194 @@
+"""
+Streaming cost metering.
+
+A stream only reports usage in its final chunk, and only when
+``stream_options={"include_usage": True}`` is set; a stream without it, or one
+the client abandons mid-way, has no usage to cost. `StreamMeter` watches the
+chunks as they pass through, counts the completion tokens of their delta
+content in O(1) per chunk, and falls back to a best-effort estimate (the
+prompt estimate plus the counted deltas) when no usage chunk arrives.
+"""
+
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from . import engine
+from .calculation import CostResult, EstimatedCostResult
+from .response_parser import extract_usage
+from .token_counter import get_token_counter
+from .token_estimator import CostEstimateError, _estimate_input_tokens
+
+
+def _delta_texts(chunk: Any) -> Iterator[str]:
+    """Yield the generated text fragments of a stream chunk or event."""
+    # Chat Completions chunk: choices[i].delta.content / tool call arguments
+    for choice in getattr(chunk, "choices", None) or ():
+        delta = getattr(choice, "delta", None)
+        content = getattr(delta, "content", None)
+        if content:
+            yield content
+        for call in getattr(delta, "tool_calls", None) or ():
+            arguments = getattr(getattr(call, "function", None), "arguments", None)
+            if arguments:
+                yield arguments
+
+    # Responses API event: response.output_text.delta, ...arguments.delta
+    delta = getattr(chunk, "delta", None)
+    if isinstance(delta, str) and delta:
+        yield delta
+
+
+def _usage_source(chunk: Any) -> Any:
+    """Get the object carrying final usage in a chunk or event, if any."""
+    if getattr(chunk, "usage", None) is not None:
+        return chunk
+    # Responses API: response.completed / response.incomplete events
+    response = getattr(chunk, "response", None)
+    if getattr(response, "usage", None) is not None:
+        return response
+    return None
+
+
+class StreamMeter:
+    """
+    Meter the cost of a streamed Chat Completions or Responses API call.
+
+    Example:
+        meter = StreamMeter(messages=messages)
+        for chunk in meter.wrap(stream):
+            print(chunk.choices[0].delta.content or "", end="")
+        cost = meter.cost()
+        if cost.estimated:
+            ...  # The stream carried no usage chunk
+
+    Args:
+        model: The model identifier (defaults to the model named by the chunks)
+        messages: The request messages, used to estimate prompt tokens when
+            the stream reports no usage
+        prompt: The request prompt, as an alternative to messages
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        messages: Optional[List[Dict[str, str]]] = None,
+        prompt: Optional[str] = None,
+    ) -> None:
+        self.model = model
+        request = messages or prompt
+        self.prompt_tokens = _estimate_input_tokens(request, model) if request else 0
+        self.chunks = 0
+
+        # Exact counts are summed per fragment; the length heuristic only
+        # needs the running number of characters
+        self._counter = get_token_counter()
+        self._tokens = 0
+        self._chars = 0
+        self._usage: Any = None
+
+    def update(self, chunk: Any) -> None:
+        """
+        Account for one chunk or event of the stream.
+
+        Args:
+            chunk: A ChatCompletionChunk or Responses API stream event
+        """
+        self.chunks += 1
+
+        if self.model is None:
+            model = getattr(chunk, "model", None) or getattr(
+                getattr(chunk, "response", None), "model", None
+            )
+            if isinstance(model, str) and model:
+                self.model = model
+
+        usage = _usage_source(chunk)
+        if usage is not None:
+            self._usage = usage
+
+        for text in _delta_texts(chunk):
+            if self._counter is not None:
+                self._tokens += self._counter(text)
+            else:
+                self._chars += len(text)
+
+    def wrap(self, stream: Iterable[Any]) -> Iterator[Any]:
+        """
+        Pass a stream through, metering every chunk.
+
+        Args:
+            stream: The stream returned by the OpenAI client
+
+        Yields:
+            The stream's chunks, unchanged
+        """
+        for chunk in stream:
+            self.update(chunk)
+            yield chunk
+
+    async def awrap(self, stream: Any) -> AsyncIterator[Any]:
+        """
+        Pass an async stream through, metering every chunk.
+
+        Args:
+            stream: The async stream returned by the OpenAI client
+
+        Yields:
+            The stream's chunks, unchanged
+        """
+        async for chunk in stream:
+            self.update(chunk)
+            yield chunk
+
+    @property
+    def completion_tokens(self) -> int:
+        """Completion tokens counted from the deltas seen so far."""
+        if self._counter is not None:
+            return self._tokens
+        # Same 4-characters-per-token heuristic as the estimator
+        return self._chars // 4
+
+    @property
+    def has_usage(self) -> bool:
+        """Whether the stream reported its usage."""
+        return self._usage is not None
+
+    def cost(self) -> CostResult:
+        """
+        Get the cost of the stream so far.
+
+        Returns:
+            The exact CostResult when a usage chunk arrived; otherwise an
+            EstimatedCostResult (``result.estimated`` is True) from the prompt
+            estimate and the counted completion tokens
+
+        Raises:
+            CostEstimateError: If the model is unknown or has no pricing data
+        """
+        if not self.model:
+            raise CostEstimateError("Stream did not name a model")
+
+        if self._usage is not None:
+            usage = extract_usage(self._usage)
+        else:
+            usage = {
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": 0,
+            }
+
+        try:
+            rates = engine.model_rates(self.model, fuzzy=True)
+        except ValueError as e:
+            raise CostEstimateError(str(e)) from e
+        if rates is None:
+            raise CostEstimateError(f"No pricing data found for model '{self.model}'")
+
+        return engine.cost_result(
+            rates,
+            usage["prompt_tokens"],
+            usage["completion_tokens"],
+            usage["cached_tokens"],
+            CostResult if self._usage is not None else EstimatedCostResult,
+            usage.get("cache_write_tokens", 0),
+            usage.get("cache_write_1h_tokens", 0),
+        )
@@ -0,0 +1,185 @@
+"""
+Exact token counting for large texts.
+
+By default the estimator approximates token counts from character counts. When
+an exact tokenizer is registered with `set_token_counter` (for instance
+`tiktoken_counter()`), texts are counted with it instead. Multi-megabyte texts
+are split at boundaries that no BPE pre-tokenizer merges across, the pieces are
+counted in parallel, and per-piece counts are cached by content hash, so the
+total always equals counting the whole text in one call.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+TokenCounter = Callable[[str], int]
+
+# Texts at least this long are split and counted in parallel
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+# A word character followed by a single space and a letter: the space always
+# starts a new pre-token (" word"), so no token spans this position
+_SAFE_BOUNDARY = re.compile(r"(?<=[^\W_]) (?=[^\W\d_])")
+
+_token_counter: Optional[TokenCounter] = None
+_executor: Optional["Executor"] = None
+_executor_lock = threading.Lock()
+
+# (counter, content digest) -> token count, bounded LRU
+_piece_cache: "OrderedDict[Tuple[TokenCounter, bytes], int]" = OrderedDict()
+_PIECE_CACHE_SIZE = 4096
+_piece_cache_lock = threading.Lock()
+
+
+def set_token_counter(counter: Optional[TokenCounter]) -> None:
+    """
+    Register an exact token counter used by cost estimation.
+
+    Args:
+        counter: Callable returning the number of tokens in a string, or None
+            to restore the 4-characters-per-token heuristic
+    """
+    global _token_counter
+    _token_counter = counter
+    with _piece_cache_lock:
+        _piece_cache.clear()
+
+
+def get_token_counter() -> Optional[TokenCounter]:
+    """Get the registered exact token counter, if any."""
+    return _token_counter
+
+
+def tiktoken_counter(encoding_name: str = "o200k_base") -> TokenCounter:
+    """
+    Build a token counter backed by tiktoken.
+
+    Args:
+        encoding_name: The tiktoken encoding (e.g., "o200k_base", "cl100k_base")
+
+    Returns:
+        Callable returning the number of tokens in a string
+
+    Raises:
+        ImportError: If tiktoken is not installed
+    """
+    try:
+        import tiktoken
+    except ImportError as e:
+        raise ImportError(
+            "tiktoken is required for exact token counting: pip install tiktoken"
+        ) from e
+
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(text: str) -> int:
+        return len(encoding.encode_ordinary(text))
+
+    return count
+
+
+def split_text(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[str]:
+    """
+    Split text into pieces of roughly chunk_size characters at safe boundaries.
+
+    Pieces are cut just before a single space that separates a word character
+    from a letter, a position where BPE pre-tokenizers always start a new
+    token. Text without such a boundary stays in one piece.
+
+    Args:
+        text: The text to split
+        chunk_size: Target piece length in characters
+
+    Returns:
+        List of pieces whose concatenation is the original text
+    """
+    pieces = []
+    start = 0
+    length = len(text)
+    while length - start > chunk_size:
+        match = _SAFE_BOUNDARY.search(text, start + chunk_size)
+        if match is None:
+            break
+        pieces.append(text[start : match.start()])
+        start = match.start()
+    pieces.append(text[start:])
+    return pieces
+
+
+def _count_piece(counter: TokenCounter, piece: str) -> int:
+    digest = hashlib.blake2b(piece.encode("utf-8"), digest_size=16).digest()
+    key = (counter, digest)
+    with _piece_cache_lock:
+        count = _piece_cache.get(key)
+        if count is not None:
+            _piece_cache.move_to_end(key)
+            return count
+
+    count = counter(piece)
+    with _piece_cache_lock:
+        _piece_cache[key] = count
+        if len(_piece_cache) > _PIECE_CACHE_SIZE:
+            _piece_cache.popitem(last=False)
+    return count
+
+
+def _default_executor() -> "Executor":
+    global _executor
+    executor = _executor
+    if executor is None:
+        # Imported here so that importing ctoken does not pull in
+        # concurrent.futures until a text is large enough to split
+        from concurrent.futures import ThreadPoolExecutor
+
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 1, thread_name_prefix="ctoken-count"
+                )
+            executor = _executor
+    return executor
+
+
+def count_tokens(
+    text: str,
+    counter: Optional[TokenCounter] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    executor: Optional["Executor"] = None,
+) -> int:
+    """
+    Count the tokens of a text exactly, in parallel for large texts.
+
+    Args:
+        text: The text to count
+        counter: Token counter to use (defaults to the registered one)
+        chunk_size: Texts longer than this are split and counted in parallel
+        executor: Executor for the pieces (defaults to a shared thread pool;
+            tokenizers such as tiktoken release the GIL while encoding)
+
+    Returns:
+        The number of tokens, equal to ``counter(text)``
+
+    Raises:
+        ValueError: If no counter is given or registered
+    """
+    counter = counter or _token_counter
+    if counter is None:
+        raise ValueError("No token counter registered; see set_token_counter()")
+
+    if len(text) <= chunk_size:
+        return counter(text)
+
+    pieces = split_text(text, chunk_size)
+    if len(pieces) == 1:
+        return _count_piece(counter, text)
+
+    pool = executor or _default_executor()
+    return sum(pool.map(partial(_count_piece, counter), pieces))
@@ -7,11 +7,18 @@ function to estimate costs for various types of OpenAI API responses.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List, Optional, Union
+import math
+from array import array
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-from .calculation import calculate_cost, format_usd
-from .response_parser import extract_model_details, extract_usage
-from .pricing_data import load_pricing, get_model_pricing
+from .calculation import CostResult, format_usd
+from .response_parser import extract_usage, extract_usage_from_dict
+from . import calibration as _calibration
+from . import cost_cache as _cost_cache
+from . import engine as _engine
+from . import token_counter as _token_counter
+from .price_sheets import PriceSheet, Sheet, as_price_sheet
 
 
 class CostEstimateError(Exception):
@@ -41,7 +48,8 @@ def _find_last_chunk_with_usage(stream: Iterable[Any]) -> Any:
     last_chunk = None
 
     for chunk in stream:
-        if hasattr(chunk, "usage"):
+        # SDK chunks carry ``usage=None`` until the final usage chunk
+        if getattr(chunk, "usage", None) is not None:
             last_chunk = chunk
 
     if last_chunk is None:
@@ -54,12 +62,8 @@ def _get_model_rates(model_name: str, model_date: str) -> Dict[str, float]:
     """
     Find the appropriate pricing rates for a model.
 
-    Uses a multi-stage lookup strategy:
-    1. Exact match with model name and date
-    2. Match using the full versioned model name
-    3. Match using base model name
-    4. Fuzzy match based on model name prefix/substring
-    5. Find the latest available pricing for that model
+    Uses the same lookup as `ctoken()`, fuzzy fallback included (see
+    `engine.lookup_rates`).
 
     Args:
         model_name: Base model name (e.g., "gpt-4o-mini")
@@ -71,43 +75,8 @@ def _get_model_rates(model_name: str, model_date: str) -> Dict[str, float]:
     Raises:
         CostEstimateError: If no pricing data can be found for the model
     """
-    pricing_data = load_pricing()
-
-    # Strategy 1: Exact match
-    exact_key = (model_name, model_date)
-    if exact_key in pricing_data:
-        return pricing_data[exact_key]
-
-    # Strategy 2: Full versioned model name
-    if model_date != "latest" and "-" in model_name:
-        versioned_key = (f"{model_name}-{model_date}", "latest")
-        if versioned_key in pricing_data:
-            return pricing_data[versioned_key]
-
-    # Strategy 3: Base model match
-    general_key = (model_name, "latest")
-    if general_key in pricing_data:
-        return pricing_data[general_key]
-
-    # Strategy 4: Fuzzy match based on prefix/substring
-    for (name, date), rates in pricing_data.items():
-        # Get first part of multiline model names
-        name_first_part = name.split("\n")[0].strip()
-
-        # Check if our model name is in the name or vice versa
-        if model_name in name_first_part or name_first_part in model_name:
-            return rates
-
-    # Strategy 5: Latest available for this model (if date specified)
-    candidates = [
-        (date, rates)
-        for (name, date), rates in pricing_data.items()
-        if name == model_name and date <= model_date
-    ]
-
-    if candidates:
-        # Pick the newest among older dates
-        _, rates = max(candidates, key=lambda x: x[0])
+    rates = _engine.lookup_rates(model_name, model_date, fuzzy=True)
+    if rates is not None:
         return rates
 
     raise CostEstimateError(
@@ -115,7 +84,68 @@ def _get_model_rates(model_name: str, model_date: str) -> Dict[str, float]:
     )
 
 
-def ctoken(response: Any) -> Dict[str, Any]:
+def _compiled_rates(
+    model: Any,
+    pricing: Optional[Union[PriceSheet, Sheet]] = None,
+    fuzzy: bool = False,
+) -> _engine.Rates:
+    """
+    Get the compiled rates of a model for the estimation functions.
+
+    Args:
+        model: The model identifier
+        pricing: Per-call price sheet layered over the pricing data
+        fuzzy: Whether to fall back to the fuzzy match, as `ctoken()` does
+
+    Raises:
+        ValueError: If the model is not found in pricing data
+    """
+    if not isinstance(model, str):
+        model = str(model)
+    if pricing is None:
+        rates = _engine.model_rates(model, fuzzy)
+    else:
+        rates = as_price_sheet(pricing).rates(model, fuzzy)
+    if rates is None:
+        raise ValueError(f"Model '{model}' not found in pricing data")
+    return rates
+
+
+def _response_cost(
+    response: Any,
+    pricing: Optional[Union[PriceSheet, Sheet]] = None,
+    fuzzy: bool = False,
+) -> CostResult:
+    """
+    Price a completed response, through the registered cost cache if any.
+
+    Responses priced with a per-call price sheet bypass the cache.
+
+    Raises:
+        AttributeError: If the response has no usage information
+        ValueError: If the model is not found in pricing data
+    """
+    if pricing is None:
+        cache = _cost_cache.get_cost_cache()
+        if cache is not None:
+            if not fuzzy:
+                _compiled_rates(response.model)  # The cache prices like ctoken()
+            return cache.cost(response)[0]
+
+    usage = extract_usage(response)
+    return _engine.cost_result(
+        _compiled_rates(response.model, pricing, fuzzy),
+        usage["prompt_tokens"],
+        usage["completion_tokens"],
+        usage["cached_tokens"],
+        cache_write_tokens=usage.get("cache_write_tokens", 0),
+        cache_write_1h_tokens=usage.get("cache_write_1h_tokens", 0),
+    )
+
+
+def ctoken(
+    response: Any, pricing: Optional[Union[PriceSheet, Sheet]] = None
+) -> CostResult:
     """
     Estimate token usage and cost for an OpenAI API response.
 
@@ -126,9 +156,11 @@ def ctoken(response: Any) -> Dict[str, Any]:
 
     Args:
         response: An OpenAI API response object or stream
+        pricing: Per-call price sheet layered over the pricing data (a
+            `PriceSheet`, or a sheet path or mapping to build one from)
 
     Returns:
-        Dict containing detailed cost breakdown:
+        CostResult (a read-only mapping) containing detailed cost breakdown:
             - prompt_tokens: Number of input tokens
             - completion_tokens: Number of output tokens
             - total_tokens: Total token count
@@ -150,18 +182,7 @@ def ctoken(response: Any) -> Dict[str, Any]:
             # This is a single response object
             chunk = response
 
-        # Extract token usage and model details
-        usage_data = extract_usage(chunk)
-        model_info = extract_model_details(chunk.model)
-        pricing_rates = _get_model_rates(
-            model_info["model_name"], model_info["model_date"]
-        )
-
-        # Calculate and return cost breakdown
-        result = calculate_cost(usage_data, pricing_rates)
-
-        # Remove the string formatting for cost values, keep them as numbers
-        return result
+        return _response_cost(chunk, pricing, fuzzy=True)
 
     except Exception as e:
         # Wrap all exceptions in our unified error type
@@ -174,12 +195,81 @@ def ctoken(response: Any) -> Dict[str, Any]:
 estimate_cost = ctoken
 
 
+def _count_by_length(text: str) -> int:
+    return len(text) // 4
+
+
+def _calibrator(model: Optional[str]) -> Optional[_calibration.Calibrator]:
+    """Get the calibrator estimating a model's tokens, if calibration applies."""
+    if model is None or _token_counter.get_token_counter() is not None:
+        return None
+    return _calibration.get_calibrator()
+
+
+def _text_counter() -> Callable[[str], int]:
+    """
+    Get the function counting the tokens of one text for estimation.
+
+    Uses the exact token counter registered with
+    `token_counter.set_token_counter` when there is one (large texts are then
+    counted in parallel chunks), and 4 characters per token otherwise.
+    """
+    counter = _token_counter.get_token_counter()
+    if counter is not None:
+        return partial(_token_counter.count_tokens, counter=counter)
+    # Very rough estimation: 1 token ≈ 4 characters for English text
+    return _count_by_length
+
+
+def _with_overhead(input_tokens: int) -> int:
+    """Add the 10% system overhead margin to a raw input token count."""
+    return int(input_tokens * 1.1)
+
+
+def _estimate_input_tokens(
+    prompt_or_messages: Union[str, List[Dict[str, str]]],
+    model: Optional[str] = None,
+) -> int:
+    """
+    Estimate the input token count of a prompt or a list of chat messages.
+
+    Args:
+        prompt_or_messages: A text prompt or a list of message dictionaries
+        model: The model identifier, to use its calibrated ratio
+
+    Returns:
+        Estimated number of input tokens, including a 10% overhead margin
+        (or the calibrated overhead)
+    """
+    calibrator = _calibrator(model)
+    if calibrator is not None:
+        if isinstance(prompt_or_messages, str):
+            texts: Iterable[Any] = (prompt_or_messages,)
+        else:
+            texts = (message.get("content") for message in prompt_or_messages)
+        return calibrator.tokens(model, _calibration.tally(texts))
+
+    count = _text_counter()
+
+    if isinstance(prompt_or_messages, str):
+        input_tokens = count(prompt_or_messages)
+    else:
+        input_tokens = 0
+        for message in prompt_or_messages:
+            content = message.get("content", "")
+            if content:
+                input_tokens += count(content)
+
+    return _with_overhead(input_tokens)
+
+
 def estimate_openai_api_cost(
     model: Union[str, Any],
     messages: Optional[List[Dict[str, str]]] = None,
     prompt: Optional[str] = None,
     max_tokens: int = 0,
-) -> Union[float, Dict[str, Any]]:
+    pricing: Optional[Union[PriceSheet, Sheet]] = None,
+) -> Union[float, CostResult]:
     """
     Estimate the cost of an OpenAI API call before making it.
 
@@ -192,10 +282,11 @@ def estimate_openai_api_cost(
         messages: List of message dictionaries for chat completions
         prompt: Text prompt for completions
         max_tokens: Maximum number of tokens to generate in the output
+        pricing: Per-call price sheet layered over the pricing data
 
     Returns:
         When estimating a future call: Estimated cost in USD as a float
-        When processing a completed call: Dict with token counts and costs
+        When processing a completed call: CostResult with token counts and costs
 
     Raises:
         ValueError: If the model is not found or inputs are invalid
@@ -203,87 +294,92 @@ def estimate_openai_api_cost(
     if not model:
         raise ValueError("Model identifier is required")
 
+    # If model is a ChatCompletion object with usage, calculate directly from usage
+    if hasattr(model, "usage"):
+        return _response_cost(model, pricing)
+
     # Extract model name if it's a ChatCompletion or similar object
     model_name = model
     if hasattr(model, "model"):
         model_name = model.model
 
-    # Get model pricing
-    model_pricing = get_model_pricing(model_name)
-    if not model_pricing:
-        raise ValueError(f"Model '{model_name}' not found in pricing data")
-
-    # If model is a ChatCompletion object with usage, calculate directly from usage
-    if hasattr(model, "usage"):
-        prompt_tokens = getattr(model.usage, "prompt_tokens", 0)
-        completion_tokens = getattr(model.usage, "completion_tokens", 0)
-        total_tokens = prompt_tokens + completion_tokens
-        cached_tokens = getattr(
-            getattr(model.usage, "prompt_tokens_details", None), "cached_tokens", 0
-        )
-
-        # Calculate costs
-        prompt_cost_uncached = model_pricing["input_cost_per_1k"] * (
-            (prompt_tokens - cached_tokens) / 1000
-        )
-        prompt_cost_cached = (
-            model_pricing["input_cost_per_1k"] * (cached_tokens / 1000) * 0.25
-        )  # Assuming cached is 25% of cost
-        completion_cost = model_pricing["output_cost_per_1k"] * (
-            completion_tokens / 1000
-        )
-        total_cost = prompt_cost_uncached + prompt_cost_cached + completion_cost
-
-        # Format the result like the ctoken function
-        result = {
-            "prompt_tokens": prompt_tokens,
-            "completion_tokens": completion_tokens,
-            "total_tokens": total_tokens,
-            "cached_tokens": cached_tokens,
-            "prompt_cost_uncached": prompt_cost_uncached,
-            "prompt_cost_cached": prompt_cost_cached,
-            "completion_cost": completion_cost,
-            "total_cost": total_cost,
-        }
-
-        return result
+    rates = _compiled_rates(model_name, pricing)
+    if not isinstance(model_name, str):
+        model_name = str(model_name)
 
     # Calculate input token count for estimation
-    input_tokens = 0
     if messages:
-        # Estimate tokens for chat completions
-        for message in messages:
-            content = message.get("content", "")
-            if content:
-                # Very rough estimation: 1 token ≈ 4 characters for English text
-                input_tokens += len(content) // 4
+        input_tokens = _estimate_input_tokens(messages, model_name)
     elif prompt:
-        # Estimate tokens for completions
-        input_tokens += len(prompt) // 4
+        input_tokens = _estimate_input_tokens(prompt, model_name)
     else:
         raise ValueError("Either messages or prompt is required for estimation")
 
-    # Add token margin for system overhead (10%)
-    input_tokens = int(input_tokens * 1.1)
+    return _engine.estimate_usd(rates, input_tokens, max_tokens)
 
-    # Estimate cost
-    input_cost = model_pricing["input_cost_per_1k"] * (input_tokens / 1000)
-    output_cost = model_pricing["output_cost_per_1k"] * (max_tokens / 1000)
 
-    return input_cost + output_cost
+def estimate_many(
+    model: str,
+    prompts_or_message_lists: Iterable[Union[str, List[Dict[str, str]]]],
+    max_tokens: int = 0,
+    pricing: Optional[Union[PriceSheet, Sheet]] = None,
+) -> Tuple[array, float]:
+    """
+    Estimate the cost of many prospective API calls to the same model.
 
+    Equivalent to calling `estimate_openai_api_cost` once per item, but the
+    model pricing is resolved a single time and the input is consumed lazily,
+    so generators over very large corpora never have to fit in memory.
 
-def estimate_openai_api_cost_from_response(response: Dict[str, Any]) -> float:
+    Args:
+        model: The model identifier (e.g., "gpt-4o-mini")
+        prompts_or_message_lists: Iterable of text prompts and/or lists of
+            message dictionaries
+        max_tokens: Maximum number of tokens to generate for each call
+        pricing: Per-call price sheet layered over the pricing data
+
+    Returns:
+        Tuple of (array of per-item estimated costs in USD, total cost in USD)
+
+    Raises:
+        ValueError: If the model is not found in pricing data, or if an item
+            is empty (as `estimate_openai_api_cost` does without a prompt)
+    """
+    if not model:
+        raise ValueError("Model identifier is required")
+
+    rates = _compiled_rates(model, pricing)
+    estimate_usd = _engine.estimate_usd
+
+    estimates = array("d")
+    append = estimates.append
+    for index, item in enumerate(prompts_or_message_lists):
+        if not item:
+            raise ValueError(
+                f"Item {index}: either messages or prompt is required for estimation"
+            )
+        input_tokens = _estimate_input_tokens(item, model)
+        append(estimate_usd(rates, input_tokens, max_tokens))
+
+    return estimates, math.fsum(estimates)
+
+
+def estimate_openai_api_cost_from_response(
+    response: Dict[str, Any], pricing: Optional[Union[PriceSheet, Sheet]] = None
+) -> float:
     """
     Calculate the exact cost of an OpenAI API response.
 
     Args:
         response: OpenAI API response dictionary containing:
             - model: The model identifier
-            - usage: Dictionary with prompt_tokens and completion_tokens
+            - usage: Dictionary with prompt_tokens, completion_tokens and
+              optional prompt_tokens_details.cached_tokens (or the Responses
+              API input_tokens / output_tokens equivalents)
+        pricing: Per-call price sheet layered over the pricing data
 
     Returns:
-        Cost in USD
+        Cost in USD, with cached tokens at the model's cached input rate
 
     Raises:
         ValueError: If the response is invalid or missing required fields
@@ -297,20 +393,14 @@ def estimate_openai_api_cost_from_response(response: Dict[str, Any]) -> float:
     if "usage" not in response or not isinstance(response["usage"], dict):
         raise ValueError("Response missing 'usage' field or invalid usage format")
 
-    model = response["model"]
-    usage = response["usage"]
-
-    # Get model pricing
-    model_pricing = get_model_pricing(model)
-    if not model_pricing:
-        raise ValueError(f"Model '{model}' not found in pricing data")
-
-    # Extract token counts
-    prompt_tokens = usage.get("prompt_tokens", 0)
-    completion_tokens = usage.get("completion_tokens", 0)
-
-    # Calculate cost
-    input_cost = model_pricing["input_cost_per_1k"] * (prompt_tokens / 1000)
-    output_cost = model_pricing["output_cost_per_1k"] * (completion_tokens / 1000)
-
-    return input_cost + output_cost
+    usage = extract_usage_from_dict(response)
+    rates = _compiled_rates(response["model"], pricing)
+    uncached, cached, output = _engine.price(
+        rates,
+        usage["prompt_tokens"],
+        usage["completion_tokens"],
+        usage["cached_tokens"],
+        usage.get("cache_write_tokens", 0),
+        usage.get("cache_write_1h_tokens", 0),
+    )
+    return (uncached + cached + output) / _engine.PICODOLLARS_PER_USD
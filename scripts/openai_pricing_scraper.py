@@ -8,19 +8,22 @@ by clicking the "Copy page" button and parsing the markdown content.
 Updates:
 - data/openai_text_tokens_pricing.csv
 - ctoken/data/pricing_data.py
+- ctoken/data/pricing_index.py
+
+The parsed rows are validated and compiled by ctoken.pricing_compiler, which
+can also be re-run offline on the saved raw markdown or CSV.
 
 Usage:
     python scripts/openai_pricing_scraper.py
 """
 
+import csv
 import logging
 import os
-import re
 import sys
 import time
 from pathlib import Path
 
-import pandas as pd
 import pyperclip
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -36,138 +39,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Output paths
+PACKAGE_DIR = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(PACKAGE_DIR))
+
+from ctoken.pricing_compiler import (  # noqa: E402
+    PricingCompileError,
+    compile_rows,
+    parse_markdown_table,
+    write_outputs,
+)
+
 # Constants
 PRICING_URL = "https://platform.openai.com/docs/pricing?latest-pricing=standard"
 
-# Output paths
-PACKAGE_DIR = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_DIR = PACKAGE_DIR / "data"
 PRICING_CSV_PATH = DATA_DIR / "openai_text_tokens_pricing.csv"
-PRICING_PY_PATH = PACKAGE_DIR / "ctoken" / "data" / "pricing_data.py"
 RAW_MD_PATH = DATA_DIR / "openai_pricing_raw.md"
 
 
-def parse_price(price_str: str) -> float:
-    """Parse a price string like '$1.25' into a float."""
-    if not price_str or price_str.strip() == "-":
-        return 0.0
-    clean = "".join(c for c in price_str if c.isdigit() or c == ".")
-    try:
-        return float(clean)
-    except ValueError:
-        return 0.0
-
-
-def parse_markdown_table(markdown: str, section_name: str, tier: str = "Standard") -> list[dict]:
-    """
-    Parse a markdown table from the pricing page content.
-
-    Args:
-        markdown: Full markdown content
-        section_name: Section header (e.g., "Text tokens", "Image tokens")
-        tier: Pricing tier to extract (default: "Standard")
-
-    Returns:
-        List of dictionaries with model pricing data
-    """
-    data = []
-
-    # Pattern to find the section and tier table
-    # Format: ### \n\nText tokens ... Standard\n\n|header|...\n|---|...\n|row|...
-    pattern = rf"{section_name}.*?{tier}\n\n\|([^\n]+)\|\n\|[-|\s]+\|\n((?:\|[^\n]+\|\n?)+)"
-    match = re.search(pattern, markdown, re.DOTALL)
-
-    if not match:
-        logger.warning(f"Could not find {section_name} {tier} table")
-        return data
-
-    headers_line = match.group(1)
-    rows_block = match.group(2)
-
-    # Parse headers
-    headers = [h.strip() for h in headers_line.split("|") if h.strip()]
-    logger.info(f"Headers: {headers}")
-
-    # Parse rows
-    for line in rows_block.strip().split("\n"):
-        if not line.strip():
-            continue
-        cells = [c.strip() for c in line.split("|")]
-        cells = [c for c in cells if c]  # Remove empty strings
-
-        if len(cells) >= len(headers):
-            row = {headers[i]: cells[i] for i in range(len(headers))}
-            data.append(row)
-
-    logger.info(f"Parsed {len(data)} rows from {section_name} {tier}")
-    return data
-
-
 def save_csv(data: list[dict], path: Path) -> None:
     """Save pricing data to CSV file."""
     if not data:
         logger.error("No data to save to CSV")
         return
 
-    # Add Version column
-    for row in data:
-        row.setdefault("Version", "")
-
-    df = pd.DataFrame(data)
-
     # Ensure consistent column order
     cols = ["Model", "Version", "Input", "Cached input", "Output"]
-    df = df[[c for c in cols if c in df.columns]]
 
     os.makedirs(path.parent, exist_ok=True)
-    df.to_csv(path, index=False)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=cols, extrasaction="ignore")
+        writer.writeheader()
+        for row in data:
+            writer.writerow({col: row.get(col, "") for col in cols})
     logger.info(f"Saved {len(data)} models to {path}")
 
-    print("\n--- Pricing Data ---")
-    print(df.to_string(index=False))
-
-
-def save_python_dict(data: list[dict], path: Path) -> None:
-    """Generate Python pricing dictionary file."""
-    if not data:
-        logger.error("No data to save to Python dict")
-        return
-
-    entries = []
-    for row in data:
-        model = row.get("Model", "")
-        version = row.get("Version", "") or "latest"
-        input_price = parse_price(row.get("Input", "0"))
-        cached_price = parse_price(row.get("Cached input", "0"))
-        output_price = parse_price(row.get("Output", "0"))
-
-        entry = f'''    ("{model}", "{version}"): {{
-        "input_price": {input_price:.4f},
-        "cached_input_price": {cached_price:.4f},
-        "output_price": {output_price:.4f},
-    }},'''
-        entries.append(entry)
-
-    content = f'''"""
-Pricing data for OpenAI models.
-
-This module contains the pricing data for OpenAI models in dictionary format.
-Auto-generated by openai_pricing_scraper.py
-Last updated: {time.strftime('%Y-%m-%d %H:%M:%S')}
-"""
-
-# Pricing data in dollars per 1M tokens (input/cached_input/output)
-PRICING_DATA = {{
-    # Format: (model_name, version): {{"input_price": float, "cached_input_price": float, "output_price": float}}
-{chr(10).join(entries)}
-}}
-'''
-
-    os.makedirs(path.parent, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(content)
-    logger.info(f"Updated Python dictionary at {path}")
-
 
 def scrape_pricing() -> str | None:
     """
@@ -234,19 +141,28 @@ def main():
     # Parse Text tokens Standard pricing
     logger.info("\nParsing Text tokens Standard pricing...")
     text_data = parse_markdown_table(markdown, "Text tokens", "Standard")
+    logger.info(f"Parsed {len(text_data)} rows from Text tokens Standard")
 
     if not text_data:
         logger.error("Failed to parse pricing data")
         sys.exit(1)
 
+    # Validate before touching any output
+    try:
+        table = compile_rows(text_data)
+    except PricingCompileError as e:
+        logger.error(f"Invalid pricing data: {e}")
+        sys.exit(1)
+
     # Save outputs
     save_csv(text_data, PRICING_CSV_PATH)
-    save_python_dict(text_data, PRICING_PY_PATH)
+    write_outputs(table)
 
     logger.info("\n" + "=" * 60)
     logger.info("Done! Updated:")
     logger.info(f"  - {PRICING_CSV_PATH}")
-    logger.info(f"  - {PRICING_PY_PATH}")
+    logger.info("  - ctoken/data/pricing_data.py")
+    logger.info("  - ctoken/data/pricing_index.py")
     logger.info("=" * 60)
 
 
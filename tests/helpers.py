@@ -0,0 +1,25 @@
+"""Stand-ins for OpenAI API objects shared by the tests."""
+
+
+class Struct:
+    """Tiny helper to build ad-hoc objects with attributes."""
+
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def fake_usage(prompt_tokens, completion_tokens, cached_tokens=0):
+    """Build a Chat Completions usage object."""
+    return Struct(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        prompt_tokens_details=Struct(cached_tokens=cached_tokens),
+    )
+
+
+def fake_response(
+    model="gpt-4o", prompt_tokens=1_000, completion_tokens=100, cached_tokens=0, **kw
+):
+    """Build a Chat Completions response with usage (and any other attributes)."""
+    usage = fake_usage(prompt_tokens, completion_tokens, cached_tokens)
+    return Struct(model=model, usage=usage, **kw)
@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from ctoken.token_estimator import (
     estimate_openai_api_cost,
     estimate_openai_api_cost_from_response,
+    estimate_many,
 )
 from ctoken.pricing_data import get_all_model_pricings
 
@@ -61,6 +62,41 @@ class TestAPICostEstimation(unittest.TestCase):
             cost = estimate_openai_api_cost_from_response(response)
             self.assertGreaterEqual(cost, 0)
 
+    def test_estimate_many_matches_single_estimates(self):
+        items = [
+            "Translate 'Hello, how are you?' to French.",
+            [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": "What is the capital of France?" * 20},
+            ],
+            "x" * 10_000,
+        ]
+
+        for model in get_random_models(2):
+            expected = [
+                estimate_openai_api_cost(model=model, prompt=item, max_tokens=64)
+                if isinstance(item, str)
+                else estimate_openai_api_cost(
+                    model=model, messages=item, max_tokens=64
+                )
+                for item in items
+            ]
+            # Generators are consumed lazily
+            estimates, total = estimate_many(model, (i for i in items), max_tokens=64)
+            self.assertEqual(list(estimates), expected)
+            self.assertAlmostEqual(total, sum(expected))
+
+    def test_estimate_many_rejects_empty_items(self):
+        model = get_random_models(1)[0]
+        for empty in ("", [], None):
+            with self.assertRaises(ValueError):
+                estimate_openai_api_cost(model=model, prompt=empty or None)
+            with self.assertRaises(ValueError):
+                estimate_many(model, ["Hello", empty])
+
+        with self.assertRaises(ValueError):
+            estimate_many("non-existent-model", ["Hello"])
+
     def test_error_handling(self):
         # Test with invalid model
         with self.assertRaises(ValueError):
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ctoken import async_estimator
+from ctoken.async_estimator import AsyncEstimator, aestimate_api_cost
+from ctoken.token_estimator import estimate_openai_api_cost
+
+_BIG_PROMPT = "lorem ipsum " * 20_000
+
+
+def test_matches_sync_estimate():
+    messages = [{"role": "user", "content": "What is the capital of France?"}]
+
+    async def run():
+        small = await aestimate_api_cost("gpt-4o", messages=messages, max_tokens=10)
+        big = await aestimate_api_cost("gpt-4o", prompt=_BIG_PROMPT, max_tokens=10)
+        return small, big
+
+    small, big = asyncio.run(run())
+    assert small == estimate_openai_api_cost("gpt-4o", messages, max_tokens=10)
+    assert big == estimate_openai_api_cost("gpt-4o", prompt=_BIG_PROMPT, max_tokens=10)
+
+
+def test_large_inputs_are_offloaded_and_shared(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_estimate(*args):
+        calls.append((args, threading.current_thread().name))
+        release.wait(5)
+        return 1.5
+
+    monkeypatch.setattr(async_estimator, "estimate_openai_api_cost", slow_estimate)
+    estimator = AsyncEstimator(
+        executor=ThreadPoolExecutor(2, thread_name_prefix="test-pool"),
+        inline_threshold=1_000,
+    )
+
+    async def run():
+        same = [estimator.estimate("gpt-4o", prompt=_BIG_PROMPT) for _ in range(5)]
+        other = estimator.estimate("gpt-4o", prompt=_BIG_PROMPT, max_tokens=1)
+        tasks = [asyncio.ensure_future(c) for c in same + [other]]
+        # The event loop keeps running while the estimates are blocked
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(run()) == [1.5] * 6
+    assert len(calls) == 2
+    assert all(name.startswith("test-pool") for _, name in calls)
+
+
+def test_pending_jobs_are_bounded(monkeypatch):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def tracked_estimate(model, messages, prompt, max_tokens):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        threading.Event().wait(0.01)
+        with lock:
+            active[0] -= 1
+        return 0.0
+
+    monkeypatch.setattr(async_estimator, "estimate_openai_api_cost", tracked_estimate)
+    estimator = AsyncEstimator(
+        executor=ThreadPoolExecutor(8), inline_threshold=1, max_pending=2
+    )
+
+    async def run():
+        await asyncio.gather(
+            *(estimator.estimate("gpt-4o", prompt=f"prompt {i}") for i in range(10))
+        )
+
+    asyncio.run(run())
+    assert peak[0] <= 2
+
+
+def test_errors_propagate():
+    with pytest.raises(ValueError):
+        asyncio.run(aestimate_api_cost("non-existent-model", prompt=_BIG_PROMPT))
+
+
+def test_queue_is_bounded(monkeypatch):
+    release = threading.Event()
+
+    def blocked_estimate(*args):
+        release.wait(5)
+        return 0.0
+
+    monkeypatch.setattr(async_estimator, "estimate_openai_api_cost", blocked_estimate)
+    estimator = AsyncEstimator(
+        executor=ThreadPoolExecutor(2), inline_threshold=1, max_pending=1, max_queued=3
+    )
+
+    async def run():
+        tasks = [
+            asyncio.ensure_future(estimator.estimate("gpt-4o", prompt=f"prompt {i}"))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.QueueFull):
+            await estimator.estimate("gpt-4o", prompt="one too many")
+        # Identical requests join a queued computation instead of queueing
+        joined = estimator.estimate("gpt-4o", prompt="prompt 0")
+        tasks.append(asyncio.ensure_future(joined))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+        # Slots are released once estimations complete
+        return await estimator.estimate("gpt-4o", prompt="after")
+
+    assert asyncio.run(run()) == 0.0
+
+
+def test_set_executor_shuts_down_default_pool():
+    estimator = AsyncEstimator()
+    default_pool = estimator.executor
+    replacement = ThreadPoolExecutor(1)
+    estimator.set_executor(replacement)
+
+    assert estimator.executor is replacement
+    with pytest.raises(RuntimeError):
+        default_pool.submit(int)
+    # Executors supplied by the caller are left running
+    estimator.set_executor(ThreadPoolExecutor(1))
+    assert replacement.submit(int).result() == 0
+    replacement.shutdown()
@@ -0,0 +1,185 @@
+import io
+import json
+from decimal import Decimal
+
+import pytest
+
+import ctoken
+from ctoken import pricing_data
+from ctoken.batch import BatchJoin, batch_price_sheet
+from ctoken.cli import main, run_batch
+
+
+def _write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def _request(custom_id, model="gpt-4o-mini", text="Summarize this document."):
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [{"role": "user", "content": text}],
+            "max_tokens": 100,
+        },
+    }
+
+
+def _response(custom_id, model="gpt-4o-mini-2024-07-18", prompt=1_000, completion=50):
+    return {
+        "id": f"batch_req_{custom_id}",
+        "custom_id": custom_id,
+        "response": {
+            "status_code": 200,
+            "body": {
+                "model": model,
+                "usage": {
+                    "prompt_tokens": prompt,
+                    "completion_tokens": completion,
+                    "prompt_tokens_details": {"cached_tokens": 0},
+                },
+            },
+        },
+        "error": None,
+    }
+
+
+@pytest.fixture
+def job_files(tmp_path):
+    requests = [_request(f"req-{i}") for i in range(20)]
+    requests.append(_request("missing"))
+    responses = [_response(f"req-{i}") for i in reversed(range(20))]
+    responses.append(
+        {
+            "id": "batch_req_failed",
+            "custom_id": "failed",
+            "response": None,
+            "error": {"code": "server_error", "message": "boom"},
+        }
+    )
+    requests.append(_request("failed"))
+    responses.append(_response("orphan"))
+    input_path, output_path = tmp_path / "input.jsonl", tmp_path / "output.jsonl"
+    _write_jsonl(input_path, requests)
+    _write_jsonl(output_path, responses)
+    return str(input_path), str(output_path)
+
+
+def test_batch_price_sheet_halves_prices():
+    sheet = batch_price_sheet()
+    standard = pricing_data.load_pricing()[("gpt-4o-mini", "latest")]
+    assert sheet.table[("gpt-4o-mini", "latest")]["input_price"] == pytest.approx(
+        standard["input_price"] / 2
+    )
+    assert ctoken.pricing_source("gpt-4o-mini", sheet) == "batch"
+
+    standard_cost = ctoken.estimate_api_cost(
+        "gpt-4o-mini", prompt="hello world", max_tokens=100
+    )
+    batch_cost = ctoken.estimate_api_cost(
+        "gpt-4o-mini", prompt="hello world", max_tokens=100, pricing=sheet
+    )
+    assert batch_cost == pytest.approx(standard_cost / 2)
+
+
+@pytest.mark.parametrize("max_rows", [1_000, 3])
+def test_batch_join_rows_and_totals(job_files, tmp_path, max_rows):
+    job = BatchJoin(*job_files, max_rows=max_rows, partitions=4, tmp_dir=tmp_path)
+    rows = {row["custom_id"]: row for row in job}
+
+    assert job.spilled == (max_rows < 20)
+    assert len(rows) == 23
+    assert rows["missing"]["status"] == "missing"
+    assert rows["missing"]["estimated_cost"] > 0
+    assert rows["failed"]["status"] == "failed"
+    assert rows["failed"]["error"] == "boom"
+    assert rows["orphan"]["status"] == "unmatched"
+    assert rows["orphan"]["estimated_cost"] is None
+
+    # 1,000 prompt and 50 completion tokens at half of 0.15/0.60 USD per 1M
+    row = rows["req-7"]
+    assert row["status"] == "completed"
+    assert row["model"] == "gpt-4o-mini-2024-07-18"
+    assert row["total_cost"] == pytest.approx(0.000075 + 0.000015)
+    assert 0 < row["estimated_cost"] < row["total_cost"]
+
+    summary = job.summary()
+    # Statuses are exclusive: the orphan response is only counted unmatched
+    assert summary["requests"] == 22
+    assert summary["completed"] == 20
+    assert (summary["failed"], summary["missing"], summary["unmatched"]) == (1, 1, 1)
+    assert Decimal(summary["total_cost"]) == Decimal("0.0018")
+    assert Decimal(summary["estimated_cost"]) > 0
+    assert summary["errors"] == []
+    # Partition files are removed
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["input.jsonl", "output.jsonl"]
+
+
+def test_batch_join_input_formats_and_bad_lines(tmp_path):
+    requests = [
+        {
+            "custom_id": "responses",
+            "url": "/v1/responses",
+            "body": {
+                "model": "gpt-4.1",
+                "input": [
+                    {"role": "user", "content": [{"type": "input_text", "text": "hi"}]}
+                ],
+                "max_output_tokens": 10,
+            },
+        },
+        {
+            "custom_id": "unknown",
+            "url": "/v1/chat/completions",
+            "body": {"model": "no-such-model", "messages": []},
+        },
+    ]
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_jsonl(input_path, requests)
+    with open(input_path, "a", encoding="utf-8") as f:
+        f.write("{not json\n")
+    _write_jsonl(output_path, [])
+
+    job = BatchJoin(str(input_path), str(output_path))
+    rows = {row["custom_id"]: row for row in job}
+
+    assert rows["responses"]["estimated_cost"] > 0
+    assert rows["unknown"]["estimated_cost"] is None
+    assert "no-such-model" in rows["unknown"]["error"]
+    assert len(job.summary()["errors"]) == 1
+
+
+@pytest.mark.parametrize("max_rows", [1_000, 1])
+def test_batch_join_reports_duplicate_custom_ids(tmp_path, max_rows):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    requests = [_request("a"), _request("b"), _request("a", text="Another request.")]
+    _write_jsonl(input_path, requests)
+    _write_jsonl(output_path, [_response("a"), _response("b")])
+
+    job = BatchJoin(str(input_path), str(output_path), max_rows=max_rows)
+    rows = list(job)
+
+    assert sorted(row["custom_id"] for row in rows) == ["a", "b"]
+    summary = job.summary()
+    assert (summary["requests"], summary["completed"]) == (2, 2)
+    assert len(summary["errors"]) == 1
+    assert "duplicate custom_id 'a'" in summary["errors"][0]
+
+
+def test_batch_cli(job_files, capsys):
+    exit_code = main(["batch", *job_files, "--max-rows", "5"])
+    captured = capsys.readouterr()
+
+    rows = [json.loads(line) for line in captured.out.splitlines()]
+    assert len(rows) == 23
+    assert exit_code == 1  # one request failed
+    assert "estimated" in captured.err
+    assert "0.00180000 USD" in captured.err
+
+    stdout = io.StringIO()
+    run_batch(*job_files, output=None, stdout=stdout, stderr=io.StringIO())
+    assert "gpt-4o-mini-2024-07-18" in stdout.getvalue()
@@ -0,0 +1,106 @@
+import pytest
+
+from ctoken import engine
+from ctoken.cache_simulator import PromptCacheSimulator
+from ctoken.token_estimator import CostEstimateError
+
+_SYSTEM = {"role": "system", "content": "You are a meticulous assistant. " * 200}
+
+
+def _request(question, timestamp, model="gpt-4o-mini"):
+    return {
+        "model": model,
+        "messages": [_SYSTEM, {"role": "user", "content": question}],
+        "completion_tokens": 50,
+        "timestamp": timestamp,
+    }
+
+
+def test_shared_prefix_is_cached():
+    sim = PromptCacheSimulator()
+    first, second = sim.replay(
+        [_request("What is AI?", 0), _request("Explain neural networks", 10)]
+    )
+
+    assert first["cached_tokens"] == 0
+    # The 1600-token system prompt is cached in 128-token increments
+    assert second["cached_tokens"] == 1536
+    assert second["cost_with_cache"] < second["cost_without_cache"]
+
+    totals = sim.summary()["gpt-4o-mini"]
+    assert totals["requests"] == 2
+    assert totals["savings"] == pytest.approx(
+        second["cost_without_cache"] - second["cost_with_cache"]
+    )
+
+
+def test_short_prefix_and_other_models_not_cached():
+    sim = PromptCacheSimulator()
+    short = {"role": "system", "content": "Be brief."}
+    for ts in (0, 1):
+        result = sim.process(
+            {"model": "gpt-4o-mini", "messages": [short], "timestamp": ts}
+        )
+    assert result["cached_tokens"] == 0
+
+    sim.process(_request("What is AI?", 2))
+    other_model = sim.process(_request("What is AI?", 3, model="gpt-4.1"))
+    assert other_model["cached_tokens"] == 0
+
+
+def test_ttl_expiry():
+    sim = PromptCacheSimulator(ttl_seconds=60)
+    sim.process(_request("What is AI?", 0))
+    assert sim.process(_request("Again?", 30))["cached_tokens"] > 0
+    assert sim.process(_request("Later?", 1_000))["cached_tokens"] == 0
+
+
+def test_memory_is_bounded():
+    sim = PromptCacheSimulator(max_nodes=50)
+    for i in range(1_000):
+        sim.process(_request(f"Question {i}", i))
+        assert len(sim) <= 50
+
+    # The shared prefix survives because it is touched by every request
+    assert sim.process(_request("Final", 1_001))["cached_tokens"] == 1536
+
+
+def test_savings_are_exact():
+    sim = PromptCacheSimulator()
+    for i in range(1_000):
+        sim.process(_request(f"Question {i}", i))
+
+    rates = engine.model_rates("gpt-4o-mini")
+    totals = sim.summary()["gpt-4o-mini"]
+    assert totals["savings"] == 999 * 1536 * (rates[0] - rates[1]) / 10**12
+
+
+def test_invalid_request():
+    with pytest.raises(ValueError):
+        PromptCacheSimulator().process({"model": "gpt-4o-mini"})
+    # Unknown models are not priced by a fuzzy match
+    with pytest.raises(CostEstimateError):
+        PromptCacheSimulator().process(_request("What is AI?", 0, model="gpt-4o-x"))
+
+
+def test_rates_follow_pricing_refresh(monkeypatch):
+    from ctoken import pricing_data
+
+    sim = PromptCacheSimulator()
+    before = sim.process(_request("What is AI?", 0))
+
+    table = {
+        key: {field: price * 2 for field, price in rates.items()}
+        for key, rates in pricing_data.load_pricing().items()
+    }
+    monkeypatch.setattr(pricing_data, "load_pricing", lambda: table)
+    pricing_data.refresh_pricing()
+    try:
+        after = sim.process(_request("What is AI?", 1_000))
+    finally:
+        monkeypatch.undo()
+        pricing_data.refresh_pricing()
+
+    assert after["cost_without_cache"] == pytest.approx(
+        2 * before["cost_without_cache"]
+    )
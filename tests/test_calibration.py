@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+from ctoken import Conversation, set_token_counter
+from ctoken.calibration import (
+    DEFAULT_TOKENS_PER_CHAR,
+    Calibrator,
+    language_bucket,
+    set_calibrator,
+)
+from ctoken.token_estimator import _estimate_input_tokens, estimate_openai_api_cost
+
+PROSE = "The quick brown fox jumps over the lazy dog. " * 20
+CODE = "for (int i = 0; i < n; ++i) { total += xs[i]; }\n" * 20
+CJK = "東京は日本の首都であり、人口が最も多い都市です。" * 20
+
+
+@pytest.fixture(autouse=True)
+def _no_calibrator():
+    yield
+    set_calibrator(None)
+    set_token_counter(None)
+
+
+def test_language_buckets():
+    assert language_bucket(PROSE) == "ascii"
+    assert language_bucket(CODE) == "code"
+    assert language_bucket(CJK) == "cjk"
+    assert language_bucket("Où est la gare ? C'est à côté de la poste.") == "other"
+    assert language_bucket("Привет, как дела?") == "other"
+
+
+def test_calibrated_estimates_replace_heuristic():
+    calibrator = Calibrator(prior_chars=100)
+    for _ in range(50):
+        calibrator.observe("gpt-4o-2024-08-06", PROSE, round(len(PROSE) / 4.5))
+        calibrator.observe("gpt-4o", [{"role": "user", "content": CJK}], len(CJK))
+
+    # Dated model strings share their family's ratio
+    assert calibrator.tokens_per_char("gpt-4o") == pytest.approx(1 / 4.5, rel=0.01)
+    assert calibrator.tokens_per_char("gpt-4o", "cjk") == pytest.approx(1, rel=0.01)
+    assert calibrator.tokens_per_char("gpt-4o", "code") == DEFAULT_TOKENS_PER_CHAR
+    assert calibrator.tokens_per_char("o3") == DEFAULT_TOKENS_PER_CHAR
+
+    default = _estimate_input_tokens(PROSE, "gpt-4o")
+    assert default == int(len(PROSE) // 4 * 1.1)
+
+    set_calibrator(calibrator)
+    # No 10% margin on top of the calibrated ratio
+    assert _estimate_input_tokens(PROSE, "gpt-4o") == pytest.approx(
+        len(PROSE) / 4.5, abs=2
+    )
+    assert _estimate_input_tokens(CJK, "gpt-4o") == pytest.approx(len(CJK), abs=2)
+    assert estimate_openai_api_cost("gpt-4o", prompt=PROSE) < estimate_openai_api_cost(
+        "gpt-4o", prompt=CJK
+    )
+
+    # An exact token counter takes precedence
+    set_token_counter(lambda text: 7)
+    assert _estimate_input_tokens(PROSE, "gpt-4o") == int(7 * 1.1)
+
+
+def test_empty_calibrator_reproduces_the_heuristic():
+    messages = [{"role": "user", "content": "hi"}] * 10
+    messages.append({"role": "user", "content": "hello world"})
+    uncalibrated = _estimate_input_tokens(messages, "gpt-4o")
+    assert uncalibrated == 2
+
+    set_calibrator(Calibrator())
+    assert _estimate_input_tokens(messages, "gpt-4o") == uncalibrated
+    for text in (PROSE, CODE, CJK, "x"):
+        assert Calibrator().count("gpt-4o", text) == int(len(text) // 4 * 1.1)
+
+    chat = Conversation("gpt-4o", system="hi")
+    chat.extend(messages)
+    set_calibrator(None)
+    uncalibrated = chat.projected_input_tokens
+    set_calibrator(Calibrator())
+    assert chat.projected_input_tokens == uncalibrated
+
+
+def test_calibrated_count_is_rounded_once_per_request():
+    calibrator = Calibrator(prior_chars=1)
+    calibrator.update("gpt-4o", 1_000, 300)
+    set_calibrator(calibrator)
+
+    # 30 texts of 5 characters at 0.3 tokens per character: 45 tokens, not
+    # 30 separately rounded 1.5s
+    messages = [{"role": "user", "content": "hello"}] * 30
+    assert _estimate_input_tokens(messages, "gpt-4o") == pytest.approx(45, abs=1)
+
+
+def test_mixed_request_is_split_between_buckets():
+    calibrator = Calibrator(prior_chars=1)
+    messages = [{"role": "user", "content": PROSE}, {"role": "user", "content": CJK}]
+    calibrator.observe("gpt-4o-mini", messages, 1_000)
+
+    stats = calibrator.stats()["gpt-4o-mini"]
+    assert set(stats) == {"ascii", "cjk"}
+    assert stats["ascii"]["observations"] == stats["cjk"]["observations"] == 1
+    prose_tokens = stats["ascii"]["tokens_per_char"] * len(PROSE)
+    cjk_tokens = stats["cjk"]["tokens_per_char"] * len(CJK)
+    assert prose_tokens + cjk_tokens == pytest.approx(1_000, rel=0.01)
+
+
+def test_half_life_tracks_drift():
+    calibrator = Calibrator(half_life=10, prior_chars=1)
+    for _ in range(100):
+        calibrator.update("gpt-4.1", 400, 100)
+    for _ in range(100):
+        calibrator.update("gpt-4.1", 400, 200)
+    assert calibrator.tokens_per_char("gpt-4.1") == pytest.approx(0.5, rel=0.01)
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "calibration.json"
+    calibrator = Calibrator(path)
+    calibrator.update("gpt-4o", 3_000, 1_000, "code")
+    calibrator.save()
+
+    loaded = Calibrator(path)
+    assert loaded.stats() == calibrator.stats()
+    assert loaded.tokens_per_char("gpt-4o", "code") == calibrator.tokens_per_char(
+        "gpt-4o", "code"
+    )
+
+    with pytest.raises(ValueError):
+        Calibrator().save()
+
+    path.write_text(json.dumps({"ratios": []}))
+    with pytest.raises(ValueError):
+        Calibrator(path)
+
+
+def test_conversation_uses_calibration():
+    calibrator = Calibrator(prior_chars=1)
+    calibrator.update("gpt-4o", 1_000, 500)
+    set_calibrator(calibrator)
+
+    chat = Conversation("gpt-4o", system="You are terse.")
+    chat.append("user", PROSE)
+    chars = len("You are terse.") + len(PROSE)
+    assert chat.projected_input_tokens == pytest.approx(chars / 2, abs=1)
+    assert chat.projected_cost(100) == estimate_openai_api_cost(
+        "gpt-4o", messages=chat.messages, max_tokens=100
+    )
@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+from ctoken.calculation import format_usd
+from ctoken.cli import _bounded_map, cost_chunk, main, run
+
+
+def _write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+_RECORDS = [
+    {
+        "model": "gpt-4o-mini",
+        "usage": {
+            "prompt_tokens": 1_000,
+            "completion_tokens": 500,
+            "prompt_tokens_details": {"cached_tokens": 200},
+        },
+    },
+    {
+        "model": "gpt-4.1",
+        "usage": {
+            "input_tokens": 2_000,
+            "output_tokens": 100,
+            "input_tokens_details": {"cached_tokens": 0},
+        },
+    },
+    {"model": "gpt-4o-mini", "usage": {"prompt_tokens": 10, "completion_tokens": 5}},
+]
+
+
+def test_cost_chunk_matches_records():
+    lines = [json.dumps(r) for r in _RECORDS]
+    rows, errors, _ = cost_chunk(("jsonl", "log.jsonl", 1, lines))
+
+    assert errors == []
+    assert [r["line"] for r in rows] == [1, 2, 3]
+    assert rows[0]["cached_tokens"] == 200
+    assert rows[1]["prompt_tokens"] == 2_000
+    # gpt-4.1: 2000 * $2/1M + 100 * $8/1M
+    assert rows[1]["total_cost"] == pytest.approx(0.0048)
+
+
+def test_cost_chunk_reports_bad_lines():
+    lines = ["not json\n", json.dumps({"usage": {}}), json.dumps(_RECORDS[0])]
+    rows, errors, _ = cost_chunk(("jsonl", "log.jsonl", 1, lines))
+
+    assert len(rows) == 1
+    assert len(errors) == 2
+    assert errors[0].startswith("log.jsonl:1:")
+
+
+def test_cost_chunk_summary_only_skips_rows():
+    lines = [json.dumps(r) for r in _RECORDS]
+    rows, errors, ledger = cost_chunk(
+        ("jsonl", "log.jsonl", 1, lines), materialize=False
+    )
+
+    assert rows == [] and errors == []
+    assert len(ledger) == 3
+    assert ledger.subtotals()["gpt-4.1"]["total_cost"] == "0.00480000"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_jsonl_streams_rows_and_summary(tmp_path, workers):
+    path = tmp_path / "log.jsonl"
+    _write_jsonl(path, _RECORDS * 5)
+
+    out, err = io.StringIO(), io.StringIO()
+    code = run(
+        "jsonl", [str(path)], workers=workers, chunk_size=4, stdout=out, stderr=err
+    )
+
+    assert code == 0
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["line"] for r in rows] == list(range(1, 16))
+    assert "gpt-4o-mini" in err.getvalue()
+    assert "15 records, 0 errors" in err.getvalue()
+
+
+def test_cost_chunk_rows_agree_with_ledger():
+    lines = [json.dumps(r) for r in _RECORDS * 3]
+    rows, _, ledger = cost_chunk(("jsonl", "log.jsonl", 1, lines))
+
+    for model, subtotal in ledger.subtotals().items():
+        row_total = sum(
+            Decimal(repr(r["total_cost"])) for r in rows if r["model"] == model
+        )
+        assert format_usd(row_total) == subtotal["total_cost"]
+
+
+def test_bounded_map_reads_ahead_at_most_window():
+    produced = []
+
+    def items():
+        for i in range(200):
+            produced.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = _bounded_map(executor, lambda x: x * 2, items(), window=4)
+        assert next(results) == 0
+        assert len(produced) <= 5
+        assert list(results) == [i * 2 for i in range(1, 200)]
+
+
+def test_main_csv_summary_only(tmp_path, capsys):
+    path = tmp_path / "usage.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["model", "prompt_tokens", "completion_tokens", "cached_tokens"]
+        )
+        writer.writerow(["gpt-4o", "1000", "1000", ""])
+        writer.writerow(["gpt-4o", "1000", "0", "500"])
+
+    assert main(["csv", str(path), "--output", "none"]) == 0
+
+    summary = capsys.readouterr().out
+    assert "gpt-4o" in summary
+    assert "2 records, 0 errors" in summary
+
+
+def test_output_must_be_stdout_or_parquet(tmp_path):
+    path = tmp_path / "usage.jsonl"
+    path.write_text("")
+    with pytest.raises(SystemExit, match="parquet"):
+        main(["jsonl", str(path), "--output", str(tmp_path / "costs.csv")])
+    with pytest.raises(ValueError):
+        run("jsonl", [str(path)], output=str(tmp_path / "costs.jsonl"))
+    assert not (tmp_path / "costs.csv").exists()
@@ -0,0 +1,63 @@
+import pytest
+
+from ctoken.conversation import Conversation
+from ctoken.token_estimator import estimate_openai_api_cost
+from tests.helpers import Struct, fake_response
+
+
+def _response(content, prompt_tokens, completion_tokens):
+    message = Struct(role="assistant", content=content)
+    choices = [Struct(message=message)]
+    return fake_response("gpt-4o", prompt_tokens, completion_tokens, choices=choices)
+
+
+def test_projection_matches_full_estimate():
+    chat = Conversation("gpt-4o", system="You are a helpful assistant. " * 10)
+    for i in range(20):
+        chat.append("user", f"Question {i}: " + "tell me more " * i)
+        expected = estimate_openai_api_cost("gpt-4o", chat.messages, max_tokens=256)
+        assert chat.projected_cost(max_tokens=256) == pytest.approx(expected)
+
+
+def test_record_adds_actual_cost_and_reply():
+    chat = Conversation("gpt-4o")
+    chat.append("user", "What is the capital of France?")
+    result = chat.record(_response("Paris.", 1_000, 500))
+
+    assert result["total_tokens"] == 1_500
+    assert chat.actual_cost == pytest.approx(result["total_cost"])
+    assert chat.messages[-1] == {"role": "assistant", "content": "Paris."}
+
+    chat.record(_response("Lyon.", 1_000, 500), append_reply=False)
+    assert chat.actual_cost == pytest.approx(2 * result["total_cost"])
+    assert len(chat) == 2
+    assert chat.report()["recorded"]["requests"] == 2
+
+
+def test_truncation_and_system_edits_update_totals():
+    chat = Conversation("gpt-4o")
+    chat.extend(
+        [{"role": "system", "content": "x" * 400}]
+        + [{"role": "user", "content": "y" * 400} for _ in range(10)]
+    )
+    assert chat.system == "x" * 400
+    assert chat.projected_input_tokens == int(1_100 * 1.1)
+
+    assert chat.drop_oldest(2) == 2
+    assert chat.projected_input_tokens == int(900 * 1.1)
+
+    chat.set_system("short")
+    assert chat.projected_input_tokens == int(801 * 1.1)
+
+    removed = chat.truncate(max_input_tokens=500)
+    assert removed == 4
+    assert chat.projected_input_tokens <= 500
+    assert chat.messages[0] == {"role": "system", "content": "short"}
+    assert chat.projected_cost() == pytest.approx(
+        estimate_openai_api_cost("gpt-4o", chat.messages)
+    )
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        Conversation("non-existent-model")
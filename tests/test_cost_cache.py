@@ -0,0 +1,101 @@
+import pytest
+
+import ctoken
+from ctoken import pricing_data
+from ctoken.cost_cache import CostCache, set_cost_cache
+from ctoken.ledger import CostLedger
+from tests.helpers import Struct, fake_response
+
+
+def _response(response_id, prompt_tokens=1_000, completion_tokens=100, cached=200):
+    return fake_response(
+        "gpt-4o", prompt_tokens, completion_tokens, cached, id=response_id
+    )
+
+
+@pytest.fixture
+def registered_cache():
+    cache = CostCache()
+    set_cost_cache(cache)
+    yield cache
+    set_cost_cache(None)
+    cache.close()
+
+
+def test_ctoken_reads_seen_responses_from_cache(registered_cache):
+    response = _response("chatcmpl-1")
+    expected = ctoken.ctoken(response)
+    assert "chatcmpl-1" in registered_cache
+
+    # A stored response is answered without reading its usage again
+    response.usage = None
+    assert ctoken.ctoken(response) == expected
+    assert ctoken.token_estimator.ctoken(response) == expected
+    assert registered_cache.duplicates == 2
+    assert len(registered_cache) == 1
+
+
+def test_duplicates_are_not_double_counted(tmp_path):
+    path = tmp_path / "costs.sqlite3"
+    ledger = CostLedger()
+    with CostCache(path) as cache:
+        assert cache.accumulate(_response("resp-1"), ledger)
+        assert cache.accumulate(_response("resp-2"), ledger)
+        assert not cache.accumulate(_response("resp-1"), ledger)
+
+    # The cache persists across processes
+    with CostCache(path) as cache:
+        result, duplicate = cache.cost(_response("resp-2"))
+        assert duplicate
+        assert not cache.accumulate(_response("resp-1"), ledger)
+        # Responses without an id cannot be deduplicated
+        assert cache.accumulate(_response(None), ledger)
+        assert len(cache) == 2
+
+    assert len(ledger) == 3
+    assert float(ledger.total()) == pytest.approx(3 * result.total_cost)
+
+
+def test_new_prices_reprice_but_still_report_duplicates(monkeypatch):
+    cache = CostCache()
+    before, _ = cache.cost(_response("resp-1"))
+
+    table = dict(pricing_data.load_pricing())
+    table[("gpt-4o", "latest")] = {
+        "input_price": 1.0,
+        "cached_input_price": 0.5,
+        "output_price": 2.0,
+    }
+    monkeypatch.setattr(pricing_data, "load_pricing", lambda: table)
+
+    after, duplicate = cache.cost(_response("resp-1"))
+    assert duplicate
+    assert after.total_cost != before.total_cost
+    # 800 * 1.0 + 200 * 0.5 + 100 * 2.0 per 1M
+    assert after.total_cost == 0.0011
+
+
+def test_provider_shard_prices_are_part_of_the_key():
+    from ctoken.data import anthropic_pricing
+
+    cache = CostCache()
+    usage = Struct(input_tokens=800, output_tokens=100, cache_read_input_tokens=200)
+    response = Struct(id="msg-1", model="claude-sonnet-4-5", usage=usage)
+    before, _ = cache.cost(response)
+    assert before.total_cost > 0
+
+    # New Anthropic prices leave the OpenAI table, and its hash, unchanged
+    bundled = anthropic_pricing.PRICING_DATA
+    anthropic_pricing.PRICING_DATA = {
+        key: {name: 2 * price for name, price in prices.items()}
+        for key, prices in bundled.items()
+    }
+    pricing_data.refresh_pricing()
+    try:
+        after, duplicate = cache.cost(response)
+        assert duplicate
+        assert after.total_cost == pytest.approx(2 * before.total_cost)
+        assert cache.cost(response) == (after, True)
+    finally:
+        anthropic_pricing.PRICING_DATA = bundled
+        pricing_data.refresh_pricing()
@@ -1,36 +1,28 @@
 from datetime import datetime
+import subprocess
+import sys
+
 import pytest
 
 import ctoken as occ
 
-from ctoken.calculation import calculate_cost
+from ctoken.calculation import CostResult, calculate_cost
 from ctoken.token_estimator import ctoken, estimate_cost, CostEstimateError
 from ctoken.response_parser import extract_model_details, extract_usage
-
-
-class _Struct:
-    """Tiny helper to build ad-hoc objects with attributes."""
-
-    def __init__(self, **kw):
-        self.__dict__.update(kw)
+from tests.helpers import Struct, fake_usage
 
 
 def _classic_response(prompt_t, completion_t, cached_t, model="gpt-4o-2024-08-06"):
-    usage = _Struct(
-        prompt_tokens=prompt_t,
-        completion_tokens=completion_t,
-        prompt_tokens_details=_Struct(cached_tokens=cached_t),
-    )
-    return _Struct(model=model, usage=usage)
+    return Struct(model=model, usage=fake_usage(prompt_t, completion_t, cached_t))
 
 
 def _new_response(input_t, output_t, cached_t, model="gpt-4o-2024-08-06"):
-    usage = _Struct(
+    usage = Struct(
         input_tokens=input_t,
         output_tokens=output_t,
-        input_tokens_details=_Struct(cached_tokens=cached_t),
+        input_tokens_details=Struct(cached_tokens=cached_t),
     )
-    return _Struct(model=model, usage=usage)
+    return Struct(model=model, usage=usage)
 
 
 # Test pricing data used in tests
@@ -99,6 +91,24 @@ def test_calculate_cost_basic_rounding():
         "completion_cost": 0.004,  # 2 000 / 1M * $2
         "total_cost": 0.0049,
     }
+    assert isinstance(costs, CostResult)
+    assert costs.total_tokens == 3_000
+    assert costs.as_dict() == dict(costs)
+
+
+def test_cost_result_is_slotted_mapping():
+    usage = {"prompt_tokens": 1_000, "completion_tokens": 500, "cached_tokens": 100}
+    rates = {"input_price": 3.0, "cached_input_price": 1.5, "output_price": 6.0}
+    result = calculate_cost(usage, rates)
+
+    assert isinstance(result, CostResult)
+    assert not hasattr(result, "__dict__")
+    assert result.total_tokens == result["total_tokens"] == 1_500
+    assert result == result.as_dict() == dict(result)
+    assert list(result) == list(CostResult.__slots__)
+    assert result.get("missing", 0) == 0
+    with pytest.raises(KeyError):
+        result["missing"]
 
 
 @pytest.mark.parametrize(
@@ -163,7 +173,7 @@ def test_estimate_cost_single_response():
 def test_estimate_cost_stream(monkeypatch):
     # two chunks: first w/o usage, last with usage
     dummy_chunks = (
-        _Struct(model="ignored", foo="bar"),
+        Struct(model="ignored", foo="bar"),
         _classic_response(2_000, 0, 0),
     )
     cost = ctoken(iter(dummy_chunks))
@@ -175,3 +185,25 @@ def test_missing_pricing_raises(monkeypatch):
     resp = _classic_response(10, 10, 0, model="non-existent-2099-01-01")
     with pytest.raises(CostEstimateError):
         ctoken(resp)
+
+
+def test_optional_subsystems_are_imported_lazily():
+    heavy = (
+        "asyncio",
+        "concurrent.futures",
+        "ctoken.pricing_compiler",
+        "http.server",
+        "multiprocessing.shared_memory",
+        "sqlite3",
+    )
+    code = f"import sys, ctoken; print([m for m in {heavy!r} if m in sys.modules])"
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "[]"
+
+    # Lazy names still resolve and are exported
+    assert occ.SharedLedger.__module__ == "ctoken.shared_ledger"
+    assert set(occ.__all__) <= set(dir(occ))
+    with pytest.raises(AttributeError):
+        occ.NoSuchThing
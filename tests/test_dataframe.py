@@ -0,0 +1,82 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+import ctoken.dataframe  # noqa: E402,F401 (registers df.ctoken)
+from ctoken.ledger import CostLedger  # noqa: E402
+from ctoken.token_estimator import CostEstimateError  # noqa: E402
+
+
+def _usage():
+    return pd.DataFrame(
+        {
+            "model": ["gpt-4o", "gpt-4.1-mini", "gpt-4o", "o3", "gpt-4o-2024-05-13"],
+            "prompt_tokens": [1_000, 2_500, 300, 12_000, 800],
+            "completion_tokens": [100, 40, 0, 3_000, 50],
+            "cached_tokens": [200, 0, 400, 1_024, 0],
+        },
+        index=[10, 11, 12, 13, 14],
+    )
+
+
+def test_costs_match_the_scalar_engine():
+    df = _usage()
+    costs = df.ctoken.costs()
+    assert list(costs.columns) == [
+        "prompt_cost_uncached",
+        "prompt_cost_cached",
+        "completion_cost",
+        "total_cost",
+    ]
+    assert list(costs.index) == list(df.index)
+
+    pricer = CostLedger()
+    for index, row in df.iterrows():
+        amounts = pricer.price(
+            row["model"],
+            int(row["prompt_tokens"]),
+            int(row["completion_tokens"]),
+            int(row["cached_tokens"]),
+        )
+        expected = [amount / 10**12 for amount in amounts]
+        expected.append(sum(amounts) / 10**12)
+        assert costs.loc[index].tolist() == expected
+
+
+def test_categorical_column_and_optional_cached_tokens():
+    df = _usage().drop(columns="cached_tokens")
+    categorical = df.assign(model=df["model"].astype("category"))
+    expected = df.ctoken.costs()
+    pd.testing.assert_frame_equal(categorical.ctoken.costs(), expected)
+    assert (expected["prompt_cost_cached"] == 0).all()
+
+
+def test_ledger_sums_exactly():
+    df = pd.concat([_usage()] * 1_000, ignore_index=True)
+    expected = CostLedger()
+    for row in df.itertuples(index=False):
+        expected.add(
+            row.model, row.prompt_tokens, row.completion_tokens, row.cached_tokens
+        )
+
+    ledger = df.ctoken.ledger()
+    assert ledger.report() == expected.report()
+    assert ledger.total_picodollars() == expected.total_picodollars()
+
+
+def test_unknown_models():
+    df = _usage()
+    df.loc[11, "model"] = "not-a-model"
+    df.loc[12, "model"] = None
+
+    with pytest.raises(CostEstimateError):
+        df.ctoken.costs()
+    costs = df.ctoken.costs(errors="coerce")
+    assert costs["total_cost"].isna().tolist() == [False, True, True, False, False]
+    assert len(df.ctoken.ledger(errors="coerce")) == 3
+
+    with pytest.raises(KeyError):
+        df.ctoken.costs(prompt_tokens="input_tokens")
+    with pytest.raises(ValueError):
+        df.ctoken.costs(errors="ignore")
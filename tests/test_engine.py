@@ -0,0 +1,123 @@
+import pytest
+
+import ctoken
+from ctoken import engine, pricing_data
+from ctoken.calculation import calculate_cost
+from ctoken.ledger import CostLedger
+from ctoken.token_estimator import (
+    CostEstimateError,
+    estimate_many,
+    estimate_openai_api_cost,
+    estimate_openai_api_cost_from_response,
+)
+from tests.helpers import fake_response
+
+
+@pytest.mark.parametrize("model", ["gpt-4o", "gpt-4o-2024-05-13", "o3", "gpt-4.1-mini"])
+def test_entry_points_agree_exactly(model):
+    prompt, completion, cached = 12_345, 678, 2_048
+    rates = pricing_data.resolve_rates(model)
+    reference = calculate_cost(
+        {
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "cached_tokens": cached,
+        },
+        rates,
+    )
+
+    assert ctoken.ctoken(fake_response(model, prompt, completion, cached)) == reference
+    assert (
+        ctoken.token_estimator.ctoken(fake_response(model, prompt, completion, cached))
+        == reference
+    )
+    assert (
+        estimate_openai_api_cost_from_response(
+            {
+                "model": model,
+                "usage": {
+                    "prompt_tokens": prompt,
+                    "completion_tokens": completion,
+                    "prompt_tokens_details": {"cached_tokens": cached},
+                },
+            }
+        )
+        == reference.total_cost
+    )
+
+    ledger = CostLedger()
+    ledger.add(model, prompt, completion, cached)
+    assert float(ledger.total()) == reference.total_cost
+
+    # Without cached tokens, the usage-only helpers price the same way
+    uncached = calculate_cost(
+        {"prompt_tokens": prompt, "completion_tokens": completion, "cached_tokens": 0},
+        rates,
+    ).total_cost
+    assert pricing_data.calculate_cost(model, prompt, completion) == uncached
+    assert (
+        pricing_data.calculate_total_cost(
+            {model: {"input_tokens": prompt, "output_tokens": completion}}
+        )
+        == uncached
+    )
+
+
+def test_estimates_use_engine_rates():
+    model, text = "gpt-4o-2024-05-13", "x" * 4_000
+    input_rate, _, output_rate = engine.model_rates(model)[:3]
+    # 1000 tokens plus the 10% overhead margin
+    expected = (1_100 * input_rate + 64 * output_rate) / engine.PICODOLLARS_PER_USD
+
+    assert estimate_openai_api_cost(model, prompt=text, max_tokens=64) == expected
+    assert list(estimate_many(model, [text], max_tokens=64)[0]) == [expected]
+
+
+def test_dated_models_keep_their_own_prices():
+    dated = pricing_data.load_pricing()[("gpt-4o-2024-05-13", "latest")]
+    base = pricing_data.load_pricing()[("gpt-4o", "latest")]
+    assert dated["input_price"] != base["input_price"]
+
+    pricing = pricing_data.get_model_pricing("gpt-4o-2024-05-13")
+    assert pricing["model"] == "gpt-4o-2024-05-13"
+    assert pricing["input_cost_per_1k"] == dated["input_price"] / 1000
+
+
+def test_compiled_rates_follow_pricing_refresh(monkeypatch):
+    assert engine.model_rates("gpt-4o")[:3] == (2_500_000, 1_250_000, 10_000_000)
+    assert engine.model_rates("non-existent-model") is None
+
+    # A different pricing table is compiled afresh
+    rates = {"input_price": 1.0, "cached_input_price": 0.5, "output_price": 2.0}
+    table = {("gpt-4o", "latest"): rates}
+    monkeypatch.setattr(pricing_data, "load_pricing", lambda: table)
+    assert engine.model_rates("gpt-4o")[:3] == (1_000_000, 500_000, 2_000_000)
+
+    # So is the same table after a refresh
+    rates["input_price"] = 3.0
+    pricing_data.refresh_pricing()
+    assert engine.model_rates("gpt-4o")[:3] == (3_000_000, 500_000, 2_000_000)
+
+    monkeypatch.undo()
+    assert engine.model_rates("gpt-4o")[:3] == (2_500_000, 1_250_000, 10_000_000)
+
+
+@pytest.mark.parametrize("model", ["gpt-4", "gpt-5-nano-x"])
+def test_unknown_models_are_not_fuzzy_matched(model):
+    assert engine.model_rates(model) is None
+    assert pricing_data.calculate_cost(model, 1_000, 1_000) == 0.0
+    assert pricing_data.calculate_total_cost({model: {"input_tokens": 1_000}}) == 0.0
+    with pytest.raises(ValueError):
+        estimate_openai_api_cost(model, prompt="Hello there")
+    with pytest.raises(ValueError):
+        estimate_many(model, ["Hello there"])
+    with pytest.raises(ValueError):
+        estimate_openai_api_cost_from_response(
+            {"model": model, "usage": {"prompt_tokens": 10, "completion_tokens": 5}}
+        )
+    with pytest.raises(CostEstimateError):
+        CostLedger().add(model, 10, 5)
+
+    # ctoken() keeps its fuzzy fallback for response objects
+    assert engine.model_rates(model, fuzzy=True) is not None
+    assert ctoken.token_estimator.ctoken(fake_response(model, 10, 5, 0)).total_cost > 0
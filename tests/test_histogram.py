@@ -0,0 +1,106 @@
+import math
+import random
+
+import pytest
+
+from ctoken.histogram import LogHistogram, UsageHistograms
+from ctoken.ledger import CostLedger
+from ctoken.token_estimator import estimate_openai_api_cost
+from tests.helpers import fake_response
+
+
+def _exact(samples, q):
+    return samples[max(1, math.ceil(q * len(samples))) - 1]
+
+
+@pytest.mark.parametrize("precision_bits", [3, 7, 10])
+def test_quantiles_within_relative_error(precision_bits):
+    rng = random.Random(precision_bits)
+    samples = [int(rng.lognormvariate(9, 2.5)) for _ in range(20_000)]
+    histogram = LogHistogram(precision_bits)
+    for value in samples:
+        histogram.record(value)
+
+    samples.sort()
+    qs = (0.0, 0.25, 0.5, 0.9, 0.99, 0.999, 1.0)
+    bound = 2.0 ** -(precision_bits + 1)
+    for q, estimate in zip(qs, histogram.quantiles(qs)):
+        exact = _exact(samples, q)
+        assert abs(estimate - exact) <= bound * exact + 0.5
+    assert histogram.quantile(0.0) == samples[0]
+    assert histogram.quantile(1.0) == samples[-1]
+    assert histogram.total == sum(samples)
+    assert len(histogram) == len(samples)
+
+
+def test_merge_and_serialization_match_a_single_histogram():
+    rng = random.Random(0)
+    whole = LogHistogram()
+    workers = [LogHistogram() for _ in range(4)]
+    for _ in range(10_000):
+        value = rng.randrange(10**12)
+        whole.record(value)
+        rng.choice(workers).record(value)
+
+    merged = LogHistogram()
+    for worker in workers:
+        merged.merge(LogHistogram.from_bytes(worker.to_bytes()))
+    assert merged == whole
+    assert merged.quantiles() == whole.quantiles()
+    assert LogHistogram.from_bytes(LogHistogram().to_bytes()) == LogHistogram()
+
+    with pytest.raises(ValueError):
+        merged.merge(LogHistogram(precision_bits=5))
+    with pytest.raises(ValueError):
+        LogHistogram.from_bytes(b"not a histogram")
+    with pytest.raises(ValueError):
+        whole.record(-1)
+    with pytest.raises(ValueError):
+        whole.quantiles((1.5,))
+
+
+def test_usage_histograms_per_model():
+    histograms = UsageHistograms()
+    ledger = CostLedger()
+    for tokens in range(1, 101):
+        histograms.record_response(fake_response("gpt-4o", tokens * 100, tokens))
+        ledger.add("gpt-4o", tokens * 100, tokens)
+    response = fake_response("gpt-4.1", 5_000, 500)
+    histograms.record_result("gpt-4.1", estimate_openai_api_cost(response))
+
+    assert sorted(histograms.models()) == ["gpt-4.1", "gpt-4o"]
+    prompt = histograms.quantiles("prompt_tokens", model="gpt-4o")
+    assert prompt[0.5] == pytest.approx(5_000, rel=2**-8)
+    assert prompt[0.999] == 10_000
+    assert histograms.quantiles("completion_tokens", (0.5,), "gpt-4.1") == {0.5: 500}
+
+    cost = histograms.histogram("cost", "gpt-4o")
+    assert cost.total == ledger.total_picodollars()
+    assert histograms.quantiles("cost", (1.0,), "gpt-4.1")[1.0] == pytest.approx(
+        estimate_openai_api_cost(response)["total_cost"]
+    )
+    # All models merged
+    assert len(histograms.histogram("prompt_tokens")) == 101
+
+    report = histograms.report()
+    assert set(report["gpt-4o"]) == {"cost", "prompt_tokens", "completion_tokens"}
+    assert set(report["gpt-4o"]["cost"]) == {"p50", "p99", "p999"}
+
+    with pytest.raises(ValueError):
+        histograms.histogram("latency")
+
+
+def test_usage_histograms_merge_serialized_workers():
+    workers = [UsageHistograms() for _ in range(3)]
+    single = UsageHistograms()
+    for i in range(300):
+        model = ("gpt-4o", "gpt-4.1-mini", "o3")[i % 3]
+        workers[i % 2].record(model, 1_000 + i * 37, 10 + i)
+        single.record(model, 1_000 + i * 37, 10 + i)
+
+    merged = UsageHistograms.merged(worker.to_bytes() for worker in workers)
+    assert merged.report() == single.report()
+    for model in single.models():
+        for metric in ("cost", "prompt_tokens", "completion_tokens"):
+            assert merged.histogram(metric, model) == single.histogram(metric, model)
+    assert UsageHistograms.merged([]).models() == []
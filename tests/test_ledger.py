@@ -0,0 +1,120 @@
+import sys
+import tracemalloc
+from decimal import Decimal
+
+import pytest
+
+from ctoken.calculation import calculate_cost
+from ctoken.ledger import CostLedger, accumulate, to_picodollar_rates
+from ctoken.token_estimator import CostEstimateError
+from tests.helpers import Struct, fake_usage
+
+
+def test_picodollar_rates():
+    rates = {"input_price": 1.25, "cached_input_price": 0.0, "output_price": 0.005}
+    # Missing cached and cache-write prices fall back to the input price
+    assert to_picodollar_rates(rates) == (
+        1_250_000,
+        1_250_000,
+        5_000,
+        1_250_000,
+        1_250_000,
+    )
+
+    with pytest.raises(ValueError):
+        to_picodollar_rates(
+            {"input_price": 1e-7, "cached_input_price": 0, "output_price": 0}
+        )
+
+
+def test_totals_are_exact_over_many_records():
+    ledger = CostLedger()
+    float_total = 0.0
+    for _ in range(100_000):
+        ledger.add("gpt-4o-mini", 7, 3, 0)
+        float_total += calculate_cost(
+            {"prompt_tokens": 7, "completion_tokens": 3, "cached_tokens": 0},
+            {"input_price": 0.15, "cached_input_price": 0.075, "output_price": 0.6},
+        )["total_cost"]
+
+    # 100k * (7 * 0.15 + 3 * 0.6) / 1M
+    assert ledger.total() == Decimal("0.285")
+    assert ledger.report()["total_cost"] == "0.28500000"
+    assert float_total != 0.285
+    assert len(ledger) == 100_000
+
+
+def test_subtotals_and_responses():
+    ledger = CostLedger()
+    usage = fake_usage(1_000, 500, 200)
+    ledger.add_response(Struct(model="gpt-4o", usage=usage))
+    ledger.add_usage(
+        "gpt-4.1",
+        {"prompt_tokens": 2_000, "completion_tokens": 100, "cached_tokens": 0},
+    )
+
+    report = ledger.report()
+    gpt_4o = report["models"]["gpt-4o"]
+    # 800 * 2.5 + 200 * 1.25 + 500 * 10 per 1M
+    assert gpt_4o["prompt_cost_uncached"] == "0.00200000"
+    assert gpt_4o["prompt_cost_cached"] == "0.00025000"
+    assert gpt_4o["total_cost"] == "0.00725000"
+    assert report["models"]["gpt-4.1"]["total_cost"] == "0.00480000"
+    assert report["total_cost"] == "0.01205000"
+    assert report["requests"] == 2
+
+
+def test_merge_and_unknown_model():
+    a, b = CostLedger(), CostLedger()
+    a.add("gpt-4o", 1_000, 0)
+    b.add("gpt-4o", 1_000, 0)
+    a.merge(b)
+    assert a.subtotals()["gpt-4o"]["prompt_tokens"] == 2_000
+    assert a.total_picodollars() == 2_000 * 2_500_000
+
+    with pytest.raises(CostEstimateError):
+        a.add("non-existent-2099-01-01", 1, 1)
+
+
+def test_accumulate_matches_add_response():
+    chat_usage = fake_usage(1_000, 500, 200)
+    responses_usage = Struct(
+        input_tokens=300, output_tokens=20, input_tokens_details=None
+    )
+    responses = [
+        Struct(model="gpt-4o-2024-08-06", usage=chat_usage),
+        Struct(model="gpt-4.1-mini", usage=responses_usage),
+    ]
+
+    fast, reference = CostLedger(), CostLedger()
+    for response in responses:
+        accumulate(response, fast)
+        reference.add_response(response)
+    assert fast.report() == reference.report()
+
+    with pytest.raises(CostEstimateError):
+        accumulate(Struct(model="gpt-4o"), fast)
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 9), reason="tracemalloc.reset_peak requires Python 3.9"
+)
+def test_accumulate_allocates_no_intermediate_dicts():
+    usage = fake_usage(1_234, 567, 256)
+    response = Struct(model="gpt-4o-mini", usage=usage)
+    ledger = CostLedger()
+    # Warm the rate cache, the model row and the interpreter's specialization
+    for _ in range(10):
+        accumulate(response, ledger)
+
+    tracemalloc.start()
+    try:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        accumulate(response, ledger)
+        transient = tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+
+    # Only a few int objects; a single empty dict is already ~64 bytes
+    assert transient < 256
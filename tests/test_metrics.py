@@ -0,0 +1,100 @@
+import threading
+import urllib.request
+
+from ctoken.metrics import CostMetrics, start_http_server
+from tests.helpers import fake_response
+
+
+def _response():
+    return fake_response("gpt-4o", 1_000, 500, 200)
+
+
+def _samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_counters_and_histogram():
+    metrics = CostMetrics(latency_buckets=(0.1, 1.0))
+    metrics.observe_response(_response(), latency=0.05)
+    metrics.observe_response(_response(), latency=0.5)
+    metrics.observe("gpt-4.1", 2_000, 100, latency=3.0)
+    metrics.observe_latency("gpt-4.1", 0.01)
+
+    text = metrics.render()
+    assert "# TYPE ctoken_request_latency_seconds histogram" in text
+    samples = _samples(text)
+    assert samples['ctoken_requests_total{model="gpt-4o"}'] == 2
+    assert samples['ctoken_tokens_total{model="gpt-4o",type="cached"}'] == 400
+    assert samples['ctoken_cost_usd_total{model="gpt-4.1"}'] == 0.0048
+    bucket = 'ctoken_request_latency_seconds_bucket{model="gpt-4o",le="%s"}'
+    assert samples[bucket % "0.1"] == 1
+    assert samples[bucket % "1.0"] == 2
+    assert samples[bucket % "+Inf"] == 2
+    assert samples['ctoken_request_latency_seconds_count{model="gpt-4.1"}'] == 2
+    assert samples['ctoken_request_latency_seconds_sum{model="gpt-4.1"}'] == 3.01
+
+
+def test_threads_update_their_own_shards():
+    metrics = CostMetrics()
+    recorded = threading.Barrier(9)
+    counted = threading.Event()
+
+    def work():
+        for _ in range(1_000):
+            metrics.observe_response(_response(), latency=0.2)
+        recorded.wait()
+        counted.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    recorded.wait()
+    assert len(metrics._shards) == 8
+    counted.set()
+    for thread in threads:
+        thread.join()
+
+    # The shards of exited threads are folded into one retired shard
+    ledger, latency = metrics.snapshot()
+    assert len(ledger) == 8_000
+    assert sum(latency["gpt-4o"][:-1]) == 8_000
+    assert len(metrics._shards) == 0
+
+
+def test_short_lived_threads_leave_no_shards():
+    metrics = CostMetrics()
+    for _ in range(50):
+        threads = [
+            threading.Thread(target=metrics.observe_response, args=(_response(), 0.2))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(metrics._shards) <= 4
+
+    ledger, latency = metrics.snapshot()
+    assert len(ledger) == 200
+    assert sum(latency["gpt-4o"][:-1]) == 200
+
+
+def test_http_endpoint():
+    metrics = CostMetrics()
+    metrics.observe_response(_response())
+    server = start_http_server(metrics, port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as reply:
+            assert reply.headers["Content-Type"].startswith("text/plain")
+            body = reply.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert body == metrics.render()
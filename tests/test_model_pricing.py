@@ -11,6 +11,20 @@ from ctoken.pricing_data import (
     get_all_model_pricings,
     calculate_cost,
     calculate_total_cost,
+    resolve_rates,
+)
+from ctoken.data.pricing_data import PRICING_DATA
+from ctoken.data.pricing_index import ALIASES, PRICING_HASH, VERSIONS
+from ctoken.pricing_compiler import (
+    PricingCompileError,
+    build_index,
+    compile_rows,
+    read_rows,
+    table_hash,
+)
+
+PRICING_CSV = os.path.join(
+    os.path.dirname(__file__), "..", "data", "openai_text_tokens_pricing.csv"
 )
 
 
@@ -89,5 +103,55 @@ class TestModelPricing(unittest.TestCase):
         self.assertEqual(invalid_cost, 0)
 
 
+class TestPricingCompiler(unittest.TestCase):
+    def _row(self, model, version="", inp="$1.00", cached="-", out="$2.00"):
+        return {
+            "Model": model,
+            "Version": version,
+            "Input": inp,
+            "Cached input": cached,
+            "Output": out,
+        }
+
+    def test_bundled_index_matches_source(self):
+        table = compile_rows(read_rows(PRICING_CSV))
+        self.assertEqual(table, PRICING_DATA)
+        self.assertEqual(build_index(table), (ALIASES, VERSIONS))
+
+    def test_bundled_hash_matches_source(self):
+        # The runtime trusts the generated index instead of re-hashing the
+        # table on import; a hand-edited table must be recompiled
+        from ctoken.pricing_data import get_pricing_hash, get_pricing_index
+
+        self.assertEqual(table_hash(PRICING_DATA), PRICING_HASH)
+        self.assertEqual(get_pricing_hash(), PRICING_HASH)
+        self.assertEqual(get_pricing_index(PRICING_DATA), (ALIASES, VERSIONS))
+
+    def test_rejects_invalid_rows(self):
+        # Identical duplicates collapse
+        table = compile_rows([self._row("gpt-x"), self._row("gpt-x")])
+        self.assertEqual(len(table), 1)
+
+        invalid = [
+            [self._row("gpt-x"), self._row("gpt-x", out="$3.00")],
+            [self._row("gpt-x", version="2024-13-01")],
+            [self._row("gpt-x", inp="free")],
+            [self._row("gpt-x", version="2024-05-13"), self._row("gpt-x-2024-05-13")],
+            [],
+        ]
+        for rows in invalid:
+            with self.assertRaises(PricingCompileError):
+                compile_rows(rows)
+
+    def test_resolve_rates(self):
+        gpt_4o = PRICING_DATA[("gpt-4o", "latest")]
+        dated = PRICING_DATA[("gpt-4o-2024-05-13", "latest")]
+
+        self.assertIs(resolve_rates("gpt-4o", "2024-05-13"), dated)
+        self.assertIs(resolve_rates("GPT-4o"), gpt_4o)
+        self.assertIs(resolve_rates("gpt-4o", "2024-08-06"), gpt_4o)
+        self.assertIsNone(resolve_rates("non-existent-model"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+import ctoken
+from ctoken import pricing_data
+from ctoken.ledger import CostLedger
+from ctoken.price_sheets import PriceSheet, pricing_source
+from ctoken.pricing_compiler import PricingCompileError
+from ctoken.pricing_data import PRICE_SHEET_ENV, set_price_sheet
+from tests.helpers import fake_response
+
+
+def _response(model):
+    return fake_response(model, 1_000_000, 1_000_000)
+
+
+ORG_CSV = """Model,Version,Input,Cached input,Output
+acme-llama-70b,,$0.90,-,$0.90
+gpt-4o,,$2.00,$1.00,$8.00
+gpt-4o,2024-05-13,$4.00,-,$12.00
+"""
+
+
+@pytest.fixture(autouse=True)
+def _bundled_pricing(monkeypatch):
+    monkeypatch.delenv(PRICE_SHEET_ENV, raising=False)
+    yield
+    pricing_data._price_sheet = None
+    pricing_data._price_sheet_set = False
+    pricing_data.refresh_pricing()
+
+
+@pytest.fixture
+def org_sheet(tmp_path):
+    path = tmp_path / "org_prices.csv"
+    path.write_text(ORG_CSV)
+    return path
+
+
+def test_org_sheet_overrides_and_extends_bundled_prices(org_sheet):
+    bundled_4o = ctoken.ctoken(_response("gpt-4o")).total_cost
+    assert pricing_source("acme-llama-70b") is None
+
+    set_price_sheet(org_sheet)
+    # Custom models resolve through the merged index; negotiated rates win
+    assert ctoken.ctoken(_response("acme-llama-70b")).total_cost == 1.8
+    assert ctoken.ctoken(_response("gpt-4o-2024-08-06")).total_cost == 10.0
+    # ("gpt-4o", "2024-05-13") replaces the bundled "gpt-4o-2024-05-13" entry
+    assert ctoken.ctoken(_response("gpt-4o-2024-05-13")).total_cost == 16.0
+    assert ("gpt-4o-2024-05-13", "latest") not in pricing_data.load_pricing()
+    assert pricing_data.calculate_cost("acme-llama-70b", 1_000_000, 0) == 0.9
+
+    assert pricing_source("acme-llama-70b") == "org"
+    assert pricing_source("gpt-4o-2024-05-13") == "org"
+    assert pricing_source("gpt-4.1-mini") == "bundled"
+    aliases, _ = pricing_data.get_pricing_index()
+    assert aliases["acme-llama-70b"] == ("acme-llama-70b", "latest")
+
+    # A sheet file is read again on refresh
+    org_sheet.write_text(ORG_CSV.replace("$0.90,-,$0.90", "$1.00,-,$1.00"))
+    pricing_data.refresh_pricing()
+    assert CostLedger().price("acme-llama-70b", 1_000_000, 0) == (10**12, 0, 0)
+
+    set_price_sheet(None)
+    assert ctoken.ctoken(_response("gpt-4o")).total_cost == bundled_4o
+    assert pricing_source("acme-llama-70b") is None
+
+
+def test_json_sheets_and_environment(tmp_path, monkeypatch):
+    path = tmp_path / "org.json"
+    path.write_text(
+        json.dumps(
+            {"ft:gpt-4o-mini:acme::abc123": {"input_price": 0.3, "output_price": 1.2}}
+        )
+    )
+    monkeypatch.setenv(PRICE_SHEET_ENV, str(path))
+    pricing_data.refresh_pricing()
+
+    cost = ctoken.ctoken(_response("ft:gpt-4o-mini:acme::abc123"))
+    assert cost.total_cost == 1.5
+    assert pricing_source("ft:gpt-4o-mini:acme::abc123") == "org"
+
+    rows = [{"Model": "acme-embed", "Input": "$0.02", "Output": "-"}]
+    path.write_text(json.dumps(rows))
+    pricing_data.refresh_pricing()
+    assert ctoken.ctoken(_response("acme-embed")).total_cost == 0.02
+
+    # Invalid sheets are rejected before anything is replaced
+    with pytest.raises(PricingCompileError):
+        set_price_sheet({"acme-embed": {"input_price": -1, "output_price": 1}})
+    with pytest.raises(PricingCompileError):
+        set_price_sheet({"acme-embed": {"input_price": "cheap", "output_price": 1}})
+    assert pricing_source("acme-embed") == "org"
+
+
+def test_per_call_sheet_layers_over_org_prices(org_sheet):
+    set_price_sheet(org_sheet)
+    sheet = PriceSheet({"gpt-4o": {"input_price": 1.5, "output_price": 6.0}})
+
+    assert ctoken.ctoken(_response("gpt-4o"), pricing=sheet).total_cost == 7.5
+    assert ctoken.ctoken(_response("gpt-4o")).total_cost == 10.0
+    # Models the sheet does not price fall through to the lower layers
+    assert ctoken.ctoken(_response("acme-llama-70b"), pricing=sheet).total_cost == 1.8
+    assert pricing_source("gpt-4o", sheet) == "call"
+    assert pricing_source("acme-llama-70b", sheet) == "org"
+    assert pricing_source("gpt-4.1", sheet) == "bundled"
+
+    # Estimates use the same layers; the sheet's rates are 3/4 of the org's
+    messages = [{"role": "user", "content": "x" * 4_000}]
+    estimate = ctoken.estimate_api_cost("gpt-4o", messages=messages, pricing=sheet)
+    org_estimate = ctoken.estimate_api_cost("gpt-4o", messages=messages)
+    assert estimate == pytest.approx(0.75 * org_estimate)
+    _, total = ctoken.estimate_many("gpt-4o", ["x" * 4_000], pricing=sheet)
+    assert total == ctoken.estimate_api_cost(
+        "gpt-4o", prompt="x" * 4_000, pricing=sheet
+    )
+
+    # Mappings are accepted directly, and the sheet follows org changes
+    assert (
+        ctoken.ctoken(
+            _response("acme-llama-70b"),
+            pricing={"acme-llama-70b": {"input_price": 0.5, "output_price": 0.5}},
+        ).total_cost
+        == 1.0
+    )
+    set_price_sheet(None)
+    with pytest.raises(ValueError):
+        ctoken.ctoken(_response("acme-llama-70b"), pricing=sheet)
@@ -0,0 +1,203 @@
+import subprocess
+import sys
+from decimal import Decimal
+
+import pytest
+
+import ctoken
+from ctoken import engine, pricing_data, providers
+from ctoken.providers import Provider, register_provider, split_model
+from ctoken.response_parser import extract_usage, extract_usage_from_dict
+from tests.helpers import Struct
+
+
+@pytest.fixture
+def restore_providers():
+    registered = providers._providers
+    yield
+    providers._providers = registered
+    providers._routes = {}
+    ctoken.refresh_pricing()
+
+
+def test_shards_are_loaded_on_first_use():
+    code = (
+        "import sys, ctoken\n"
+        "assert 'ctoken.data.anthropic_pricing' not in sys.modules\n"
+        "ctoken.ctoken\n"
+        "from ctoken import engine\n"
+        "assert engine.model_rates('gpt-4o') is not None\n"
+        "assert 'ctoken.data.anthropic_pricing' not in sys.modules\n"
+        "assert engine.model_rates('claude-sonnet-4-5') is not None\n"
+        "assert 'ctoken.data.anthropic_pricing' in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+@pytest.mark.parametrize(
+    "model, provider, name, date",
+    [
+        (
+            "anthropic/claude-sonnet-4-20250514",
+            "anthropic",
+            "claude-sonnet-4",
+            "2025-05-14",
+        ),
+        ("anthropic:claude-3-haiku", "anthropic", "claude-3-haiku", "latest"),
+        ("claude-3-5-haiku-latest", "anthropic", "claude-3-5-haiku", "latest"),
+        ("openai/gpt-4o-2024-08-06", "openai", "gpt-4o", "2024-08-06"),
+        (
+            "ft:gpt-4o-mini:acme::abc123",
+            "openai",
+            "ft:gpt-4o-mini:acme::abc123",
+            "latest",
+        ),
+        ("codex-mini-latest", "openai", "codex-mini-latest", "latest"),
+    ],
+)
+def test_model_strings_route_to_their_shard(model, provider, name, date):
+    assert split_model(model)[0].name == provider
+    details = ctoken.extract_model_details(model)
+    assert details == {"model_name": name, "model_date": date}
+
+
+def test_claude_models_are_priced_by_the_anthropic_shard():
+    prefixed = engine.model_rates("anthropic/claude-sonnet-4-20250514")
+    assert (
+        prefixed
+        == engine.model_rates("claude-sonnet-4")
+        == (
+            3_000_000,
+            300_000,
+            15_000_000,
+            3_750_000,
+            6_000_000,
+        )
+    )
+    assert engine.model_rates("claude-3-haiku-20240307")[2] == 1_250_000
+    assert engine.model_rates("claude-no-such-model") is None
+    assert ctoken.pricing_source("claude-opus-4-1") == "bundled"
+    assert pricing_data.calculate_cost("claude-3-5-haiku", 1_000_000, 1_000_000) == 4.8
+
+    # Org sheets override models of every provider
+    ctoken.set_price_sheet({"claude-opus-4-1": {"input_price": 10, "output_price": 50}})
+    try:
+        assert engine.model_rates("anthropic/claude-opus-4-1-20250805")[2] == 50_000_000
+        assert ctoken.pricing_source("claude-opus-4-1") == "org"
+    finally:
+        ctoken.set_price_sheet(None)
+    assert engine.model_rates("claude-opus-4-1")[2] == 75_000_000
+
+
+def test_anthropic_usage_schema():
+    usage = Struct(
+        input_tokens=100,
+        output_tokens=50,
+        cache_read_input_tokens=1_000,
+        cache_creation_input_tokens=None,
+    )
+    response = Struct(model="claude-sonnet-4-5-20250929", usage=usage)
+    assert extract_usage(response) == {
+        "prompt_tokens": 1_100,
+        "completion_tokens": 50,
+        "cached_tokens": 1_000,
+    }
+    cost = ctoken.ctoken(response)
+    assert cost.total_cost == pytest.approx((100 * 3 + 1_000 * 0.3 + 50 * 15) / 1e6)
+
+    # An OpenAI Responses API object with the same fields has no cache reads
+    openai_response = Struct(model="gpt-4o", usage=usage)
+    assert extract_usage(openai_response)["prompt_tokens"] == 100
+
+    record = {
+        "model": "anthropic/claude-3-5-haiku",
+        "usage": {
+            "input_tokens": 10,
+            "output_tokens": 5,
+            "cache_creation_input_tokens": 20,
+            "cache_read_input_tokens": 30,
+        },
+    }
+    assert extract_usage_from_dict(record) == {
+        "prompt_tokens": 60,
+        "completion_tokens": 5,
+        "cached_tokens": 30,
+        "cache_write_tokens": 20,
+        "cache_write_1h_tokens": 0,
+    }
+    with pytest.raises(ValueError):
+        extract_usage_from_dict(record, schema="gemini")
+
+
+def test_register_provider(restore_providers):
+    calls = []
+
+    def acme_table():
+        calls.append(1)
+        return {("acme-large", "latest"): {"input_price": 1.0, "output_price": 2.0}}
+
+    register_provider(Provider("acme", acme_table, prefixes=("acme-",)))
+    assert providers.get_provider("ACME").name == "acme"
+    assert providers.list_providers()[0] == "openai"
+    assert not providers.get_provider("acme").loaded
+
+    assert engine.model_rates("acme/acme-large")[:3] == (
+        1_000_000,
+        1_000_000,
+        2_000_000,
+    )
+    assert engine.model_rates("acme-large-2025-01-01")[:3] == (
+        1_000_000,
+        1_000_000,
+        2_000_000,
+    )
+    assert engine.model_rates("acme-small") is None
+    assert providers.get_provider("acme").loaded
+
+    # Unknown prefixes are part of the model name
+    assert split_model("other/acme-large")[0].name == "openai"
+    with pytest.raises(ValueError):
+        Provider("acme", acme_table, date_format="unix")
+
+
+def test_anthropic_cache_writes_are_billed_at_the_write_rates():
+    usage = Struct(
+        input_tokens=100,
+        output_tokens=50,
+        cache_read_input_tokens=1_000,
+        cache_creation_input_tokens=1_000,
+        cache_creation=Struct(
+            ephemeral_5m_input_tokens=600, ephemeral_1h_input_tokens=400
+        ),
+    )
+    response = Struct(model="claude-sonnet-4-5", usage=usage)
+    assert extract_usage(response)["prompt_tokens"] == 2_100
+    assert extract_usage(response)["cache_write_tokens"] == 600
+    assert extract_usage(response)["cache_write_1h_tokens"] == 400
+
+    # 1.25x input for 5-minute writes, 2x for 1-hour writes
+    uncached = 100 * 3 + 600 * 3.75 + 400 * 6
+    cost = ctoken.ctoken(response)
+    assert cost.prompt_tokens == 2_100
+    assert cost.prompt_cost_uncached == pytest.approx(uncached / 1e6)
+    assert cost.total_cost == pytest.approx((uncached + 1_000 * 0.3 + 50 * 15) / 1e6)
+
+    ledger = ctoken.CostLedger()
+    ctoken.accumulate(response, ledger)
+    assert Decimal(ledger.report()["total_cost"]) == Decimal("0.006")
+
+
+def test_accumulate_reads_the_provider_usage_schema():
+    usage = Struct(
+        input_tokens=100,
+        output_tokens=50,
+        cache_read_input_tokens=1_000,
+        cache_creation_input_tokens=0,
+    )
+    ledger = ctoken.CostLedger()
+    ctoken.accumulate(Struct(model="claude-sonnet-4-5", usage=usage), ledger)
+    ctoken.accumulate(Struct(model="gpt-4o", usage=usage), ledger)
+    subtotals = ledger.subtotals()
+    assert subtotals["claude-sonnet-4-5"]["prompt_tokens"] == 1_100
+    assert subtotals["claude-sonnet-4-5"]["cached_tokens"] == 1_000
+    assert subtotals["gpt-4o"]["prompt_tokens"] == 100
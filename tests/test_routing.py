@@ -0,0 +1,118 @@
+import pytest
+
+from ctoken import engine, pricing_data, providers, routing
+from ctoken.providers import Provider, register_provider
+from ctoken.routing import ModelRouter, cheapest_model
+
+_PRICING = {
+    ("cheap-in", "latest"): {
+        "input_price": 0.10,
+        "cached_input_price": 0.05,
+        "output_price": 4.00,
+    },
+    ("cheap-out", "latest"): {
+        "input_price": 2.00,
+        "cached_input_price": 0.0,
+        "output_price": 0.40,
+    },
+    ("cache-friendly", "latest"): {
+        "input_price": 1.00,
+        "cached_input_price": 0.01,
+        "output_price": 1.00,
+    },
+}
+
+
+@pytest.fixture
+def pricing(monkeypatch):
+    table = dict(_PRICING)
+    monkeypatch.setattr(pricing_data, "load_pricing", lambda: table)
+    pricing_data.refresh_pricing()
+    yield table
+    # Drop routers built from the fake table before the next test runs
+    monkeypatch.undo()
+    routing._routers.clear()
+    pricing_data.refresh_pricing()
+
+
+def test_ranking_depends_on_token_mix(pricing):
+    assert ModelRouter(10_000, 10).cheapest() == "cheap-in"
+    assert ModelRouter(10, 10_000).cheapest() == "cheap-out"
+    cached = ModelRouter(10_000, 10, cached_tokens=10_000)
+    assert cached.cheapest() == "cache-friendly"
+
+
+def test_allow_list(pricing):
+    router = ModelRouter(10_000, 10)
+    allowed = frozenset({"cheap-out", "cache-friendly"})
+    assert router.cheapest(allowed) == "cache-friendly"
+    assert router.cheapest(["cheap-out"]) == "cheap-out"
+    assert router.cheapest(["unknown-model"]) is None
+    costs = [cost for _, cost in router.ranked()]
+    assert costs == sorted(costs)
+
+
+def test_rebuilds_after_refresh(pricing):
+    router = ModelRouter(1_000, 1_000)
+    assert router.cheapest(frozenset(name for name, _ in pricing)) == "cache-friendly"
+
+    pricing[("new-model", "latest")] = {
+        "input_price": 0.01,
+        "cached_input_price": 0.0,
+        "output_price": 0.01,
+    }
+    pricing_data.refresh_pricing()
+
+    assert router.cheapest() == "new-model"
+    assert cheapest_model(1_000, 1_000, allowed=frozenset({"new-model"})) == "new-model"
+
+
+def test_bundled_pricing_allow_list():
+    router = ModelRouter(2_000, 500)
+    allowed = frozenset({"gpt-4o", "gpt-4.1-mini", "o3"})
+    assert router.cheapest(allowed) == "gpt-4.1-mini"
+
+
+def test_every_provider_shard_is_ranked():
+    registered = providers._providers
+    register_provider(
+        Provider(
+            "acme",
+            lambda: {
+                ("large", "latest"): {"input_price": 0.001, "output_price": 0.001},
+                ("large", "2025-01-01"): {"input_price": 0.002, "output_price": 0.002},
+            },
+        )
+    )
+    try:
+        router = ModelRouter(2_000, 500)
+        ranked = dict(router.ranked())
+        assert "claude-sonnet-4-5" in ranked and "gpt-4o" in ranked
+        assert router.cheapest() == "acme/large"
+        assert router.cheapest(["acme/large-2025-01-01", "gpt-4o"]) == (
+            "acme/large-2025-01-01"
+        )
+        # Every ranked model string prices at its ranked cost
+        for model, cost in ranked.items():
+            rates = engine.model_rates(model)
+            assert engine.estimate_usd(rates, 2_000, 500) == pytest.approx(cost)
+    finally:
+        providers._providers = registered
+        providers._routes = {}
+        pricing_data.refresh_pricing()
+
+
+def test_unpublished_prices_are_not_free():
+    # Image models have no text output price in the bundled table
+    assert cheapest_model(500, 4_000) != "gpt-image-1-mini"
+    router = ModelRouter(100, 10_000)
+    for model, cost in router.ranked():
+        assert cost > 0
+        assert not model.startswith("gpt-image")
+
+
+def test_allow_list_memo_is_bounded(pricing):
+    router = ModelRouter(10_000, 10)
+    for i in range(routing._MAX_ALLOW_LISTS + 10):
+        router.cheapest([f"model-{i}", "cheap-out"])
+    assert len(router._state[2]) <= routing._MAX_ALLOW_LISTS
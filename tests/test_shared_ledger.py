@@ -0,0 +1,143 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from ctoken import engine
+from ctoken.calculation import format_usd
+from ctoken.ledger import _PICO, CostLedger
+from ctoken.shared_ledger import SharedLedger
+from ctoken.token_estimator import CostEstimateError
+
+_MODELS = ("gpt-4o", "gpt-4o-mini", "gpt-4.1", "o3", "o4-mini", "gpt-5")
+_RECORDS = 2_000
+
+
+def _work(ledger, worker):
+    # Every worker brings in a model of its own at runtime
+    models = _MODELS[:3] + (_MODELS[3 + worker % 3],)
+    for i in range(_RECORDS):
+        ledger.add(models[i % 4], 1_000, 100, 250)
+    ledger.close()
+
+
+_pool_ledger = None
+
+
+def _init_pool(ledger):
+    global _pool_ledger
+    _pool_ledger = ledger
+
+
+def _pool_task(_):
+    _pool_ledger.add("gpt-4o", 1_000, 100)
+    return multiprocessing.current_process().pid
+
+
+def _expected(workers):
+    ledger = CostLedger()
+    for worker in range(workers):
+        models = _MODELS[:3] + (_MODELS[3 + worker % 3],)
+        for i in range(_RECORDS):
+            ledger.add(models[i % 4], 1_000, 100, 250)
+    return ledger
+
+
+def _is_consistent(snapshot):
+    # Every worker records the same usage, so each subtotal must be a whole
+    # number of identical records: a torn update would break the ratios
+    for model, totals in snapshot.subtotals().items():
+        requests = totals["requests"]
+        record = sum(engine.price(engine.model_rates(model), 1_000, 100, 250))
+        if totals["prompt_tokens"] != requests * 1_000:
+            return False
+        if totals["total_cost"] != format_usd(requests * record * _PICO):
+            return False
+    return True
+
+
+def test_processes_update_one_ledger():
+    context = multiprocessing.get_context("spawn")
+    with SharedLedger(max_models=8, max_workers=8, mp_context=context) as ledger:
+        workers = [
+            context.Process(target=_work, args=(ledger, worker)) for worker in range(4)
+        ]
+        for process in workers:
+            process.start()
+
+        # Snapshots taken while workers write never contain torn records
+        reader = SharedLedger.attach(ledger.name)
+        partial = 0
+        while any(process.is_alive() for process in workers):
+            snapshot = reader.snapshot()
+            assert _is_consistent(snapshot)
+            partial += 0 < len(snapshot) < 4 * _RECORDS
+        assert partial
+        for process in workers:
+            process.join()
+            assert process.exitcode == 0
+
+        snapshot = reader.snapshot()
+        reader.close()
+        expected = _expected(4)
+        assert snapshot.report() == expected.report()
+        assert snapshot.total_picodollars() == expected.total_picodollars()
+
+
+def test_threads_share_a_stripe():
+    with SharedLedger(max_models=4, max_workers=1) as ledger:
+
+        def work():
+            for _ in range(1_000):
+                ledger.add("gpt-4o", 10, 5)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(ledger.snapshot()) == 4_000
+
+
+def test_capacity_and_read_only_errors():
+    with SharedLedger(max_models=1, max_workers=1) as ledger:
+        ledger.add("gpt-4o", 10, 5)
+        with pytest.raises(CostEstimateError):
+            ledger.add("o3", 10, 5)
+        with pytest.raises(CostEstimateError):
+            ledger.add("non-existent-model", 10, 5)
+
+        reader = SharedLedger.attach(ledger.name)
+        assert reader.snapshot().report() == ledger.snapshot().report()
+        with pytest.raises(ValueError):
+            reader.add("gpt-4o", 10, 5)
+        reader.close()
+
+
+def test_overflow_leaves_the_row_readable():
+    with SharedLedger(max_models=1, max_workers=1) as ledger:
+        ledger.add("gpt-4o", 10, 5)
+        with pytest.raises(CostEstimateError, match="overflow"):
+            ledger.add("gpt-4o", 2**62, 0)
+        with pytest.raises(CostEstimateError, match="overflow"):
+            ledger.add("gpt-4o", 0, 2**62)
+
+        snapshot = ledger.snapshot()
+        assert snapshot.report()["requests"] == 1
+        ledger.add("gpt-4o", 10, 5)
+        assert len(ledger.snapshot()) == 2
+
+
+def test_recycled_workers_take_over_exited_stripes():
+    context = multiprocessing.get_context("spawn")
+    with SharedLedger(max_models=1, max_workers=2, mp_context=context) as ledger:
+        with context.Pool(
+            1, initializer=_init_pool, initargs=(ledger,), maxtasksperchild=1
+        ) as pool:
+            pids = pool.map(_pool_task, range(4), chunksize=1)
+
+        assert len(set(pids)) == 4
+        snapshot = ledger.snapshot()
+        assert snapshot.report()["requests"] == 4
+        assert snapshot.report()["prompt_tokens"] == 4_000
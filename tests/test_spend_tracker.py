@@ -0,0 +1,90 @@
+import pytest
+
+from ctoken.ledger import CostLedger
+from ctoken.spend_tracker import SpendTracker, parse_window
+from tests.helpers import fake_response
+
+T0 = 1_700_000_000.0  # A whole number of minutes, hours and days
+
+
+def _cost(model, prompt_tokens, completion_tokens):
+    ledger = CostLedger()
+    ledger.add(model, prompt_tokens, completion_tokens)
+    return float(ledger.total())
+
+
+def test_windows_expire_old_spend():
+    tracker = SpendTracker(windows=("1m", "1h", "24h"))
+    one = _cost("gpt-4o", 1_000, 100)
+
+    tracker.record("gpt-4o", 1_000, 100, timestamp=T0)
+    tracker.record("gpt-4o", 1_000, 100, timestamp=T0 + 30)
+    assert tracker.spend("1m", now=T0 + 30) == pytest.approx(2 * one)
+
+    # The first record leaves the minute window, not the hour window
+    assert tracker.spend("1m", now=T0 + 61) == pytest.approx(one)
+    assert tracker.spend("1h", now=T0 + 61) == pytest.approx(2 * one)
+    assert tracker.spend("1m", now=T0 + 120) == 0
+    assert tracker.spend("24h", now=T0 + 3_600) == pytest.approx(2 * one)
+    assert tracker.spend("1h", now=T0 + 3_700) == 0
+
+    # A late record still counts in the windows it falls in
+    tracker.record("gpt-4o", 1_000, 100, timestamp=T0 + 7_000)
+    tracker.record("gpt-4o", 1_000, 100, timestamp=T0 + 3_000)
+    assert tracker.spend("1h", now=T0 + 7_000) == pytest.approx(one)
+    assert tracker.spend("24h", now=T0 + 7_000) == pytest.approx(4 * one)
+    assert tracker.spend("24h", now=T0 + 86_400 + 7_000) == 0
+
+
+def test_spend_per_model_and_key():
+    tracker = SpendTracker(windows=(60, "1h"))
+    tracker.record_response(fake_response(), key="search", timestamp=T0)
+    tracker.record_response(fake_response("gpt-4.1"), key="chat", timestamp=T0 + 1)
+    tracker.record_cost("gpt-4.1", {"total_cost": 0.25}, key="chat", timestamp=T0)
+
+    now = T0 + 2
+    gpt_4o = _cost("gpt-4o", 1_000, 100)
+    gpt_41 = _cost("gpt-4.1", 1_000, 100)
+    assert tracker.spend("1m", model="gpt-4o", now=now) == pytest.approx(gpt_4o)
+    assert tracker.spend("1m", key="search", now=now) == pytest.approx(gpt_4o)
+    assert tracker.spend("60s", key="chat", now=now) == pytest.approx(gpt_41 + 0.25)
+    assert tracker.spend("1m", now=now) == pytest.approx(gpt_4o + gpt_41 + 0.25)
+    assert tracker.rate("1h", key="chat", now=now) == pytest.approx(
+        (gpt_41 + 0.25) / 60
+    )
+    assert tracker.spend("1m", key="unknown", now=now) == 0
+    assert sorted(tracker.models()) == ["gpt-4.1", "gpt-4o"]
+    assert sorted(tracker.keys()) == ["chat", "search"]
+
+    with pytest.raises(ValueError):
+        tracker.spend("24h")
+    with pytest.raises(ValueError):
+        tracker.spend("1m", model="gpt-4o", key="chat")
+
+
+def test_budget_exhaustion_projection():
+    tracker = SpendTracker(windows=("1m", "1h"))
+    # $1 per minute for the last ten minutes
+    for minute in range(10):
+        tracker.record_cost("gpt-4o", 1.0, timestamp=T0 + minute * 60)
+
+    now = T0 + 599
+    assert tracker.rate("1m", now=now) == pytest.approx(1.0)
+    assert tracker.seconds_until_exhausted(15.0, window="1m", now=now) == pytest.approx(
+        300
+    )
+    assert tracker.seconds_until_exhausted(20.0, spent=0.0, window="1m", now=now) == (
+        pytest.approx(1_200)
+    )
+    assert tracker.seconds_until_exhausted(5.0, window="1h", now=now) == 0.0
+    assert tracker.seconds_until_exhausted(5.0, key="idle", now=now) is None
+
+
+def test_parse_window():
+    assert parse_window("90s") == 90
+    assert parse_window("1.5h") == 5_400
+    assert parse_window("1d") == 86_400
+    assert parse_window(30) == 30
+    for bad in ("1w", "", 0, -5):
+        with pytest.raises(ValueError):
+            parse_window(bad)
@@ -0,0 +1,103 @@
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from ctoken.ledger import CostLedger
+from ctoken.sqlite_ledger import SQLiteLedger
+from ctoken.token_estimator import CostEstimateError
+from tests.helpers import Struct, fake_usage
+
+_DAY_1 = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+_DAY_2 = datetime(2025, 3, 2, 12, tzinfo=timezone.utc)
+
+
+def test_totals_match_in_memory_ledger(tmp_path):
+    expected = CostLedger()
+    with SQLiteLedger(tmp_path / "ledger.sqlite3", batch_size=64) as ledger:
+        for i in range(1_000):
+            model = ("gpt-4o", "gpt-4o-mini", "o3")[i % 3]
+            ledger.record(model, 1_000 + i, 100, i % 200, _DAY_1.timestamp() + i)
+            expected.add(model, 1_000 + i, 100, i % 200)
+        ledger.flush()
+
+        totals = ledger.totals_by_model()
+        assert totals.report() == expected.report()
+        assert totals.total_picodollars() == expected.total_picodollars()
+
+
+def test_records_are_durable_across_instances(tmp_path):
+    path = tmp_path / "ledger.sqlite3"
+    usage = fake_usage(1_000, 500, 200)
+    response = Struct(model="gpt-4o", usage=usage, created=int(_DAY_2.timestamp()))
+
+    with SQLiteLedger(path) as ledger:
+        ledger.record("gpt-4o", 1_000, 500, 200, _DAY_1)
+        ledger.record_response(response)
+        ledger.record("o3", 10, 10, timestamp=_DAY_2)
+
+    with SQLiteLedger(path) as ledger:
+        days = ledger.totals_by_day()
+        assert list(days) == ["2025-03-01", "2025-03-02"]
+        assert len(days["2025-03-01"]) == 1
+        assert days["2025-03-02"].subtotals()["gpt-4o"] == (
+            days["2025-03-01"].subtotals()["gpt-4o"]
+        )
+        assert list(ledger.totals_by_day(model="o3")) == ["2025-03-02"]
+        assert len(ledger.totals_by_model(since=_DAY_2)) == 2
+        assert len(ledger.totals_by_model(until=_DAY_2)) == 1
+
+
+def _stalled_ledger(path, policy):
+    """Open a ledger whose writer is stuck on a database lock, queue full."""
+    ledger = SQLiteLedger(path, max_queue=2, policy=policy)
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+
+    ledger.record("gpt-4o", 1, 1)
+    # Wait for the writer to take the record and block on the lock
+    deadline = time.monotonic() + 5
+    while ledger._pending and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert ledger.record("gpt-4o", 2, 2) and ledger.record("gpt-4o", 3, 3)
+    return ledger, blocker
+
+
+@pytest.mark.parametrize("policy", ["block", "drop", "raise"])
+def test_backpressure_policies(tmp_path, policy):
+    ledger, blocker = _stalled_ledger(tmp_path / "ledger.sqlite3", policy)
+
+    if policy == "drop":
+        assert not ledger.record("gpt-4o", 4, 4)
+        assert ledger.dropped == 1
+    elif policy == "raise":
+        with pytest.raises(queue.Full):
+            ledger.record("gpt-4o", 4, 4)
+    else:
+        waiter = threading.Thread(target=ledger.record, args=("gpt-4o", 4, 4))
+        waiter.start()
+        waiter.join(0.05)
+        assert waiter.is_alive()
+
+    blocker.execute("COMMIT")
+    blocker.close()
+    if policy == "block":
+        waiter.join(5)
+    ledger.close()
+
+    with SQLiteLedger(tmp_path / "ledger.sqlite3") as reopened:
+        written = len(reopened.totals_by_model())
+    assert written == (4 if policy == "block" else 3)
+
+
+def test_unknown_models_fail_in_the_caller(tmp_path):
+    with SQLiteLedger(tmp_path / "ledger.sqlite3") as ledger:
+        with pytest.raises(CostEstimateError):
+            ledger.record("non-existent-model", 1, 1)
+        with pytest.raises(ValueError):
+            SQLiteLedger(tmp_path / "other.sqlite3", policy="spill")
+    with pytest.raises(ValueError):
+        ledger.record("gpt-4o", 1, 1)
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from ctoken import token_counter
+from ctoken.streaming import StreamMeter
+from ctoken.token_estimator import ctoken, estimate_openai_api_cost
+from tests.helpers import Struct, fake_usage
+
+
+def _chunk(content, model="gpt-4o", usage=None):
+    delta = Struct(content=content, tool_calls=None)
+    choices = [Struct(delta=delta)] if content is not None else []
+    return Struct(model=model, choices=choices, usage=usage)
+
+
+_MESSAGES = [{"role": "user", "content": "Write a poem about AI " * 10}]
+_WORDS = ["Silicon ", "dreams ", "in ", "quiet ", "code, "] * 40
+
+
+def test_usage_chunk_gives_exact_cost():
+    chunks = [_chunk(w) for w in _WORDS] + [_chunk(None, usage=fake_usage(55, 200))]
+    meter = StreamMeter(messages=_MESSAGES)
+    assert list(meter.wrap(iter(chunks))) == chunks
+
+    cost = meter.cost()
+    assert meter.has_usage and not cost.estimated
+    assert cost == ctoken(iter(chunks))
+
+
+def test_missing_usage_is_estimated_from_deltas():
+    chunks = [_chunk(w) for w in _WORDS]
+    meter = StreamMeter(messages=_MESSAGES)
+    for chunk in meter.wrap(iter(chunks)):
+        pass
+
+    cost = meter.cost()
+    assert cost.estimated and not meter.has_usage
+    assert cost["completion_tokens"] == len("".join(_WORDS)) // 4
+    # Prompt side matches the pre-flight estimate
+    expected = estimate_openai_api_cost("gpt-4o", _MESSAGES, max_tokens=0)
+    assert cost["prompt_cost_uncached"] == pytest.approx(expected)
+
+
+def test_cancelled_stream_keeps_partial_cost():
+    meter = StreamMeter("gpt-4o", prompt="Hello")
+    for i, _ in enumerate(meter.wrap(_chunk(w) for w in _WORDS)):
+        if i == 9:
+            break  # Client disconnected
+
+    assert meter.chunks == 10
+    assert meter.cost()["completion_tokens"] == len("".join(_WORDS[:10])) // 4
+
+
+def test_exact_counter_and_responses_events():
+    token_counter.set_token_counter(lambda text: len(text.split()))
+    try:
+        events = [
+            Struct(
+                type="response.created", response=Struct(model="gpt-4o", usage=None)
+            ),
+            Struct(type="response.output_text.delta", delta="one two "),
+            Struct(type="response.output_text.delta", delta="three"),
+        ]
+        meter = StreamMeter()
+        for event in events:
+            meter.update(event)
+        assert meter.model == "gpt-4o"
+        assert meter.completion_tokens == 3
+        assert meter.cost().estimated
+    finally:
+        token_counter.set_token_counter(None)
+
+
+def test_async_wrap():
+    async def stream():
+        for w in _WORDS:
+            yield _chunk(w)
+
+    async def run():
+        meter = StreamMeter(messages=_MESSAGES)
+        chunks = [c async for c in meter.awrap(stream())]
+        return meter, chunks
+
+    meter, chunks = asyncio.run(run())
+    assert len(chunks) == len(_WORDS)
+    assert meter.cost().estimated
+
+
+def test_stream_without_usage_still_raises_in_ctoken():
+    from ctoken.token_estimator import CostEstimateError
+
+    with pytest.raises(CostEstimateError):
+        ctoken(iter([_chunk(w) for w in _WORDS]))
@@ -0,0 +1,131 @@
+import sys
+import threading
+
+import pytest
+
+import ctoken
+from ctoken import engine, pricing_data
+from ctoken.ledger import CostLedger
+from ctoken.price_sheets import PriceSheet
+from ctoken.routing import ModelRouter
+from tests.helpers import fake_response
+
+THREADS = 8
+
+ORG = {
+    "gpt-4o": {"input_price": 2.0, "output_price": 8.0},
+    "acme-llm": {"input_price": 1.0, "output_price": 1.0},
+}
+
+
+def _response(model):
+    return fake_response(model, 1_000_000, 1_000_000)
+
+
+@pytest.fixture(autouse=True)
+def _fast_switching():
+    # Switch threads as often as possible to interleave the critical sections
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+    pricing_data._price_sheet = None
+    pricing_data._price_sheet_set = False
+    pricing_data.refresh_pricing()
+
+
+def _run(workers, *extra):
+    errors = []
+
+    def guarded(fn):
+        def target():
+            try:
+                fn()
+            except BaseException as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        return target
+
+    threads = [threading.Thread(target=guarded(fn)) for fn in (*workers, *extra)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def test_pricing_caches_stay_consistent_under_concurrent_refreshes():
+    bundled = engine.model_rates("gpt-4o")
+    org = (2_000_000, 2_000_000, 8_000_000, 2_000_000, 2_000_000)
+    sheet = PriceSheet({"gpt-4o-mini": {"input_price": 0.1, "output_price": 0.1}})
+    ledger = CostLedger()
+    router = ModelRouter(1_000, 1_000)
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            rates = engine.model_rates("gpt-4o")
+            assert rates in (bundled, org)
+            assert ctoken.ctoken(_response("gpt-4o")).total_cost in (12.5, 10.0)
+            assert sum(ledger.price("gpt-4o", 1, 1)) in (
+                bundled[0] + bundled[2],
+                10_000_000,
+            )
+            assert sheet.rates("gpt-4o") in (bundled, org)
+            assert sheet.rates("gpt-4o-mini") == (100_000,) * 5
+            assert router.cheapest() is not None
+            assert ctoken.pricing_source("gpt-4o") in ("bundled", "org")
+
+    def writer():
+        try:
+            for i in range(200):
+                ctoken.set_price_sheet(ORG if i % 2 == 0 else None)
+        finally:
+            done.set()
+
+    _run([reader] * THREADS, writer)
+
+    # Nothing cached during the flips outlives them
+    ctoken.set_price_sheet(ORG)
+    assert engine.model_rates("gpt-4o") == org
+    assert engine.model_rates("acme-llm")[:3] == (1_000_000, 1_000_000, 1_000_000)
+    assert ledger.price("gpt-4o", 1_000_000, 0)[0] == 2 * 10**12
+    assert sheet.rates("gpt-4o") == org
+    assert router.ranked() == ModelRouter(1_000, 1_000).ranked()
+    assert ctoken.pricing_source("acme-llm") == "org"
+
+
+def test_shared_ledger_loses_no_updates():
+    ledger = CostLedger()
+    per_thread = 5_000
+
+    def adder():
+        for _ in range(per_thread):
+            ledger.add("gpt-4o", 1_000, 100, 200)
+            ledger.add_response(_response("gpt-4.1"))
+
+    _run([adder] * THREADS)
+
+    requests = THREADS * per_thread
+    assert len(ledger) == 2 * requests
+    subtotals = ledger.subtotals()
+    assert subtotals["gpt-4o"]["prompt_tokens"] == 1_000 * requests
+    expected = ledger.price("gpt-4o", 1_000, 100, 200)
+    other = ledger.price("gpt-4.1", 1_000_000, 1_000_000)
+    assert ledger.total_picodollars() == requests * (sum(expected) + sum(other))
+
+    merged = CostLedger()
+    merged.merge(ledger)
+    assert merged.report() == ledger.report()
+
+
+def test_ledger_folds_the_rows_of_exited_threads():
+    ledger = CostLedger()
+    for _ in range(50):
+        _run([lambda: ledger.add("gpt-4o", 1_000, 100)] * 4)
+        assert len(ledger._shards) <= 4
+
+    ledger.add("gpt-4o", 1_000, 100)
+    assert len(ledger) == 201
+    assert ledger.total_picodollars() == 201 * sum(ledger.price("gpt-4o", 1_000, 100))
@@ -0,0 +1,87 @@
+import random
+import re
+
+import pytest
+
+from ctoken import token_counter
+from ctoken.token_counter import count_tokens, set_token_counter, split_text
+from ctoken.token_estimator import estimate_openai_api_cost
+
+# Simplified GPT-style pre-tokenizer: every match counts as one token
+_PRE_TOKENS = re.compile(r"'s|'t| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+[\r\n]*|\s+(?!\S)|\s+")
+
+
+def _fake_counter(text):
+    return len(_PRE_TOKENS.findall(text))
+
+
+@pytest.fixture(autouse=True)
+def reset_counter():
+    yield
+    set_token_counter(None)
+
+
+def _document(size, seed=0):
+    rng = random.Random(seed)
+    words = ["alpha", "beta's", "1234", "x.", "\n\n", "  ", "gamma,", "(delta)"]
+    parts = []
+    length = 0
+    while length < size:
+        parts.append(rng.choice(words) + rng.choice([" ", " ", "\n", ""]))
+        length += len(parts[-1])
+    return "".join(parts)
+
+
+def test_split_text_preserves_content():
+    text = _document(50_000)
+    pieces = split_text(text, chunk_size=4_000)
+    assert "".join(pieces) == text
+    assert len(pieces) > 5
+    assert split_text("short", chunk_size=4_000) == ["short"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunked_count_matches_single_pass(seed):
+    text = _document(200_000, seed)
+    assert count_tokens(text, _fake_counter, chunk_size=7_000) == _fake_counter(text)
+
+
+def test_pieces_are_cached_by_content(monkeypatch):
+    calls = []
+
+    def counting(text):
+        calls.append(len(text))
+        return _fake_counter(text)
+
+    text = _document(100_000)
+    first = count_tokens(text, counting, chunk_size=10_000)
+    pieces = len(calls)
+    assert count_tokens(text, counting, chunk_size=10_000) == first
+    assert len(calls) == pieces
+
+
+def test_estimation_uses_registered_counter():
+    prompt = _document(20_000)
+    heuristic = estimate_openai_api_cost("gpt-4o", prompt=prompt)
+
+    set_token_counter(_fake_counter)
+    exact = estimate_openai_api_cost("gpt-4o", prompt=prompt)
+    expected_tokens = int(_fake_counter(prompt) * 1.1)
+    assert exact == pytest.approx(0.0025 * expected_tokens / 1000)
+    assert exact != heuristic
+
+    with pytest.raises(ValueError):
+        set_token_counter(None)
+        count_tokens("no counter registered")
+
+
+def test_tiktoken_counter_requires_tiktoken():
+    try:
+        import tiktoken  # noqa: F401
+    except ImportError:
+        with pytest.raises(ImportError):
+            token_counter.tiktoken_counter()
+    else:
+        counter = token_counter.tiktoken_counter()
+        text = _document(600_000)
+        assert count_tokens(text, counter, chunk_size=50_000) == counter(text)